@@ -1,8 +1,9 @@
-from ollama import AsyncClient
-from ollama import Client
 import re # type: ignore
 import json
 
+from backend_server.llm_batcher import batcher
+from backend_server.context_window import ContextWindowPolicy
+
 
 with open("./config/config.json", "r", encoding="utf-8") as f:
     config = json.load(f)
@@ -10,9 +11,12 @@ MODEL_NAME = config.get("OLLAMA_CONFIG").get("MODEL_NAME")
 
 class DialogueManager:
     def __init__(self, prompt_path='prompt/system_prompt.txt'):
-        self.client = Client(host='http://localhost:11434')
+        # 经微批处理层合并、去重后再交给共享的 LLM 网关
+        self.client = batcher
         self.model = MODEL_NAME
         self.conversations = {}
+        # 多轮对话的上下文窗口策略
+        self.context_policy = ContextWindowPolicy()
         
         # 加载提示词文件内容
         with open(prompt_path, 'r', encoding='utf-8') as f:
@@ -32,13 +36,16 @@ class DialogueManager:
             'role': 'user',
             'content': message
         })
+        # 按策略裁剪历史，避免上下文无限增长
+        self.conversations[conversation_key] = await self.context_policy.apply(
+            self.conversations[conversation_key], self._summarize
+        )
         # try:
-        response = self.client.chat(
+        raw = await self.client.chat(
             model=self.model,
             messages=self.conversations[conversation_key],
             options={'temperature': 0.5}
         )
-        raw = response['message']['content']
         cleaned = self._clean_response(raw)
         self.conversations[conversation_key].append({
             'role': 'assistant',
@@ -46,27 +53,51 @@ class DialogueManager:
         })
         return cleaned
     
+    async def _complete(self, message: str, cache: bool = False) -> str:
+        """无状态的单次补全：只发送 system 提示词与本条消息，不记录历史"""
+        raw = await self.client.chat(
+            model=self.model,
+            messages=[
+                {'role': 'system', 'content': self.system_prompt},
+                {'role': 'user', 'content': message}
+            ],
+            options={'temperature': 0.5},
+            cache=cache
+        )
+        return self._clean_response(raw)
+    
+    async def _summarize(self, messages) -> str:
+        """summarize 策略使用：把被裁掉的历史压缩成一段摘要"""
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        return await self._complete(
+            f"Summarize the following conversation in at most 3 sentences:\n{transcript}"
+        )
+    
     def _clean_response(self, text: str) -> str:
         """清洗回复内容：移除<think>标签和多余空格"""
         cleaned = re.sub(r'<think>.*?</think>', '', text, flags=re.DOTALL)
         cleaned = re.sub(r'\s+', ' ', cleaned).strip()
         return cleaned
     
-    async def run_prompt(self, username, prompt):
-        response = await self._generate_response("assistent", username, prompt)
+    async def run_prompt(self, username, prompt, cache=False):
+        # 单次提示词不依赖历史，使用无状态补全
+        response = await self._complete(prompt, cache=cache)
         return response
     
 class LLMResponse:
     def __init__(self, prompt_path='prompt/system_prompt.txt'):
-        self.client = Client(host='http://localhost:11434')
-        self.model = 'llama3.1:8b'
+        # 经微批处理层合并、去重后再交给共享的 LLM 网关
+        self.client = batcher
+        self.model = MODEL_NAME
         self.conversations = {}
+        # 多轮对话的上下文窗口策略
+        self.context_policy = ContextWindowPolicy()
         
         # 加载提示词文件内容
         with open(prompt_path, 'r', encoding='utf-8') as f:
             self.system_prompt = f.read()
     
-    def _generate_response(self, bot_name: str, sender: str, message: str) -> str:
+    async def _generate_response(self, bot_name: str, sender: str, message: str) -> str:
         """生成并返回清洗后的回复，使用 bot_name 与 sender 构成唯一对话上下文"""
         conversation_key = f"{bot_name}_{sender}"
         
@@ -83,14 +114,16 @@ class LLMResponse:
             'content': message
         })
         
+        # 按策略裁剪历史，避免上下文无限增长
+        self.conversations[conversation_key] = await self.context_policy.apply(
+            self.conversations[conversation_key], self._summarize
+        )
         # try:
-        # 使用 asyncio.run 同步调用异步方法
-        response = self.client.chat(
+        raw = await self.client.chat(
             model=self.model,
             messages=self.conversations[conversation_key],
             options={'temperature': 0.5}
         )
-        raw = response['message']['content']
         cleaned = self._clean_response(raw)
         self.conversations[conversation_key].append({
             'role': 'assistant',
@@ -98,12 +131,46 @@ class LLMResponse:
         })
         return cleaned
     
+    async def _complete(self, message: str, cache: bool = False) -> str:
+        """无状态的单次补全：只发送 system 提示词与本条消息，不记录历史"""
+        raw = await self.client.chat(
+            model=self.model,
+            messages=[
+                {'role': 'system', 'content': self.system_prompt},
+                {'role': 'user', 'content': message}
+            ],
+            options={'temperature': 0.5},
+            cache=cache
+        )
+        return self._clean_response(raw)
+    
+    async def _summarize(self, messages) -> str:
+        """summarize 策略使用：把被裁掉的历史压缩成一段摘要"""
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        return await self._complete(
+            f"Summarize the following conversation in at most 3 sentences:\n{transcript}"
+        )
+    
     def _clean_response(self, text: str) -> str:
         """清洗回复内容：移除<think>标签和多余空格"""
         cleaned = re.sub(r'<think>.*?</think>', '', text, flags=re.DOTALL)
         cleaned = re.sub(r'\s+', ' ', cleaned).strip()
         return cleaned
     
-    def run_prompt(self, prompt):
-        response = self._generate_response("assistent", "user", prompt)
-        return response
\ No newline at end of file
+    async def run_prompt(self, prompt, cache=False):
+        # 单次提示词不依赖历史，使用无状态补全
+        response = await self._complete(prompt, cache=cache)
+        return response
+
+    async def trim_history(self, history: list) -> list:
+        """
+        按上下文窗口策略裁剪写进提示词的对话记录 [[说话人, 内容], ...]，
+        summarize 模式下被裁掉的部分折叠为一条 ["Summary", 摘要]
+        """
+        messages = [{'role': 'system', 'content': ''}] + [
+            {'role': 'user', 'content': f"{speaker}: {content}"} for speaker, content in history
+        ]
+        trimmed = (await self.context_policy.apply(messages, self._summarize))[1:]
+        kept = sum(1 for m in trimmed if m['role'] == 'user')
+        summaries = [["Summary", m['content']] for m in trimmed if m['role'] == 'system']
+        return summaries + (history[-kept:] if kept else [])
\ No newline at end of file
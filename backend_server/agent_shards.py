@@ -0,0 +1,460 @@
+# agent_shards.py
+import argparse
+import asyncio
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Callable, Dict, List, Optional, Tuple
+
+from backend_server import shard_transport
+from core.cognitive_modules.plan.schedule_index import ScheduleIndex, DAY_MINUTES
+from tools.profiler import profiler
+
+logger = logging.getLogger(__name__)
+
+with open('./config/config.json', 'r', encoding='utf-8') as f:
+    config = json.load(f)
+SHARD_CONFIG = config.get("SHARD_CONFIG", {})
+# worker 进程数，1 表示所有 Agent 在同一进程中运行（原行为）
+WORKERS = SHARD_CONFIG.get("WORKERS", 1)
+# worker 中有嵌入模型线程池与日志线程，默认 spawn 而不是 fork
+START_METHOD = SHARD_CONFIG.get("START_METHOD", "spawn")
+# pipe: 本机子进程；tcp: 长度前缀的 msgpack/json 帧，worker 可以在其他主机上
+TRANSPORT = SHARD_CONFIG.get("TRANSPORT", "pipe")
+# tcp 时协调进程的监听地址，端口 0 表示由系统分配（只适用于本机启动的 worker）
+HOST = SHARD_CONFIG.get("HOST", "127.0.0.1")
+PORT = SHARD_CONFIG.get("PORT", 0)
+# tcp 时是否在本机启动 worker；否则等待其他主机上的 worker 连接
+LAUNCH = SHARD_CONFIG.get("LAUNCH", True)
+CONNECT_TIMEOUT = SHARD_CONFIG.get("CONNECT_TIMEOUT", 60)
+# 一个 tick 最多等待 worker 多少秒，超时的 worker 视为掉队，null 表示一直等待
+STRAGGLER_TIMEOUT = SHARD_CONFIG.get("STRAGGLER_TIMEOUT")
+# close() 等待 worker 完成当前 tick 并回复统计的总秒数，超时的 worker 进程被终止
+CLOSE_TIMEOUT = SHARD_CONFIG.get("CLOSE_TIMEOUT", 30)
+# 所有 worker 合计同时在途的 LLM 请求数，按 worker 平分，与单进程时的网关信号量一致
+MAX_CONCURRENCY = config.get("OLLAMA_CONFIG", {}).get("MAX_CONCURRENCY", 4)
+
+
+def split_concurrency(total: int, workers: int) -> List[int]:
+    """把 LLM 并发上限分给各 worker，余数给前几个 worker，每个至少为 1"""
+    return [max(1, total // workers + (1 if index < total % workers else 0)) for index in range(workers)]
+
+
+def shard_path(path: str, index: int) -> str:
+    """./log/prompt_log.jsonl -> ./log/prompt_log.w1.jsonl，各 worker 写各自的日志文件"""
+    root, ext = os.path.splitext(path)
+    return f"{root}.w{index}{ext}"
+
+
+class AgentProxy:
+    """
+    其他进程中 Agent 的本地替身，缓存其最近一次屏障时的状态（对话标志、日程）。
+    - 在 worker 中代表其他分片的 Agent：对话另一方触发的状态变化
+      （receive_chat / yield_turn / absorb_conversation）先更新本地缓存并记入 outbox，
+      由协调进程在 tick 屏障处转交所属 worker，在下一个 tick 开始前执行
+    - 在协调进程中镜像各 Agent 的状态，供 GlobalTimer 安排唤醒
+    """
+    # 可以跨分片投递的方法，worker 拒绝执行其他任何方法名
+    DELIVERABLE = ("receive_chat", "yield_turn", "absorb_conversation")
+
+    def __init__(self, name: str, outbox: Optional[list] = None):
+        self.name = name
+        self.outbox = outbox if outbox is not None else []
+        self.isChatting = False
+        self.should_react = False
+        self.today_is_chatted = False
+        self.daily_plan = None
+        self.schedule_version = None
+
+    def receive_chat(self, speaker: str, chat: str, talking_about: Optional[str] = None) -> None:
+        self.isChatting = True
+        self.should_react = True
+        self.outbox.append([self.name, "receive_chat", [speaker, chat, talking_about]])
+
+    def yield_turn(self) -> None:
+        self.should_react = False
+        self.outbox.append([self.name, "yield_turn", []])
+
+    async def absorb_conversation(self, partner: str, chat: list, summary_chat: str) -> None:
+        self.isChatting = False
+        self.should_react = False
+        self.today_is_chatted = True
+        self.outbox.append([self.name, "absorb_conversation", [partner, list(chat), summary_chat]])
+
+    def update(self, status: dict) -> None:
+        """应用所属 worker 上报的状态；日程只在变化时随状态一起上报"""
+        self.isChatting = status["isChatting"]
+        self.should_react = status["should_react"]
+        self.today_is_chatted = status["today_is_chatted"]
+        if status.get("daily_plan") is not None:
+            self.daily_plan = status["daily_plan"]
+            self.schedule_version = ScheduleIndex(self.daily_plan)
+
+    def get_next_change(self, current_time: int):
+        return self.schedule_version.next_change(current_time) if self.schedule_version is not None else None
+
+
+def _agent_status(agents: dict, reported: dict) -> Dict[str, dict]:
+    """只返回上次上报之后有变化的 Agent 状态"""
+    status = {}
+    for name, agent in agents.items():
+        flags = (agent.isChatting, agent.should_react, agent.today_is_chatted)
+        version = agent.schedule_version
+        previous = reported.get(name)
+        if previous is not None and previous[0] == flags and previous[1] is version:
+            continue
+        status[name] = {"isChatting": flags[0], "should_react": flags[1], "today_is_chatted": flags[2]}
+        if previous is None or previous[1] is not version:
+            status[name]["daily_plan"] = agent.daily_plan
+        reported[name] = (flags, version)
+    return status
+
+
+def _make_bot_manager(name: str, world):
+    if world is not None:
+        from backend_server.headless_world import HeadlessBotManager
+        return HeadlessBotManager(name, world)
+    from backend_server.minecraft_bot_manager import AsyncBotManager
+    return AsyncBotManager(name, loop=asyncio.get_running_loop())
+
+
+async def serve_shard(conn, index: int, names: List[str], all_names: List[str],
+                      headless: bool = False, llm_backend: Optional[str] = None,
+                      llm_concurrency: Optional[int] = None) -> None:
+    """
+    worker 主循环：持有本分片 Agent 的 AgentsActionManager（含 MemoryService）与 bot 连接。
+    协调进程发送 ["tick", sim_time, due, global_events, deliveries, updates]，
+    worker 先更新其他分片 Agent 的缓存状态、执行投递给本分片的对话状态变化，再并发执行到期 Agent，
+    回复 ["done", sim_time, {name: events}, {name: status}, outbox]；收到 ["stop"] 后回复统计并退出。
+    conn 可以是 multiprocessing 的 Pipe，也可以是 shard_transport.TcpConnection。
+    llm_concurrency 为本 worker 网关的并发上限，即总上限分到本分片的份额。
+    """
+    from core.cognitive_modules.execute.agents_action_manager import AgentsActionManager
+    from backend_server.headless_world import HeadlessWorld
+    from backend_server.llm_gateway import gateway
+    from tools.log_writer import current_tick, prompt_log, schedule_log
+
+    for log in (prompt_log, schedule_log):
+        log.path = shard_path(log.path, index)
+    if llm_backend is not None:
+        gateway.set_backend(llm_backend)
+    if llm_concurrency is not None:
+        # 信号量在首次请求时才按该值创建
+        gateway.max_concurrency = llm_concurrency
+
+    world = HeadlessWorld() if headless else None
+    bot_managers = {name: _make_bot_manager(name, world) for name in names}
+    agents = {name: AgentsActionManager(name) for name in names}
+    outbox = []
+    # 其他分片的 Agent 以替身注册，execute_behavior 中的 get_instance 照常可用
+    proxies = {name: AgentProxy(name, outbox) for name in all_names if name not in agents}
+    AgentsActionManager.instances.update(proxies)
+
+    reported = {}
+    conn.send(["ready", _agent_status(agents, reported)])
+    loop = asyncio.get_running_loop()
+    while True:
+        message = await loop.run_in_executor(None, conn.recv)
+        if message[0] == "stop":
+            break
+        _, sim_time, due, global_events, deliveries, updates = message
+        current_tick.set(sim_time)
+        for name, status in updates.items():
+            proxies[name].update(status)
+        with profiler.span("shard.deliver", agent=""):
+            for target, method, args in deliveries:
+                if method not in AgentProxy.DELIVERABLE or target not in agents:
+                    logger.warning(f"Rejected shard delivery {method!r} to {target!r}")
+                    continue
+                result = getattr(agents[target], method)(*args)
+                if asyncio.iscoroutine(result):
+                    await result
+        results = await asyncio.gather(*(
+            agents[name].execute_behavior(bot_managers[name], sim_time % DAY_MINUTES, global_events)
+            for name in due
+        ))
+        messages, outbox[:] = list(outbox), []
+        conn.send(["done", sim_time, dict(zip(due, results)), _agent_status(agents, reported), messages])
+
+    prompt_log.close()
+    schedule_log.close()
+    conn.send(["stopped", {
+        "world": world.stats() if world is not None else {},
+        "llm_calls": gateway.stats()["calls"],
+        "profile": profiler.snapshot(),
+    }])
+
+
+def _run_worker(conn, index, names, all_names, headless, llm_backend, llm_concurrency, initializer) -> None:
+    try:
+        if initializer is not None:
+            initializer()
+        asyncio.run(serve_shard(conn, index, names, all_names, headless, llm_backend, llm_concurrency))
+    except Exception:
+        conn.send(["error", traceback.format_exc()])
+    finally:
+        conn.close()
+
+
+def _worker_main(conn, index: int, names: List[str], all_names: List[str], headless: bool,
+                 llm_backend: Optional[str], llm_concurrency: int,
+                 initializer: Optional[Callable[[], None]]) -> None:
+    """pipe 传输：分配信息由进程参数直接给出"""
+    _run_worker(conn, index, names, all_names, headless, llm_backend, llm_concurrency, initializer)
+
+
+def _tcp_worker_main(address: Tuple[str, int], initializer: Optional[Callable[[], None]] = None,
+                     timeout: float = CONNECT_TIMEOUT) -> None:
+    """tcp 传输：连接协调进程，握手后领取分片"""
+    conn = shard_transport.TcpConnection.connect(address, timeout=timeout)
+    conn.send(["hello", socket.gethostname(), os.getpid()])
+    _, index, names, all_names, headless, llm_backend, llm_concurrency = conn.recv()
+    _run_worker(conn, index, names, all_names, headless, llm_backend, llm_concurrency, initializer)
+
+
+class AgentShards:
+    """
+    把 Agent 按轮转分到多个 worker 进程，绕开 GIL（嵌入编码、相似度计算、正则解析、JS 桥）。
+    - 每个 worker 独占其 Agent 的记忆与 bot 连接
+    - transport="pipe" 时 worker 为本机子进程；"tcp" 时协调进程监听 address，
+      worker 由本机启动（launch=True）或在其他主机上运行 python -m backend_server.agent_shards --connect
+    - run_tick 向各 worker 发出本 tick 的全局事件后等待回复（每个 tick 一次屏障）；
+      超过 straggler_timeout 仍未回复的 worker 不阻塞这一跳，其结果在之后的 tick 中并入，
+      在此之前该 worker 上到期的 Agent 跳过执行
+    - 跨分片的对话状态变化经 AgentProxy 收集，随下一个 tick 投递；
+      各 Agent 状态的变化广播给其他 worker 的 AgentProxy 缓存
+    proxies 与 GlobalTimer.agents 的用法一致，传入 GlobalTimer(shards=...) 即可。
+    initializer 与 multiprocessing.Pool 的同名参数相同，在每个本机启动的 worker 中调用，须可 pickle。
+    max_concurrency 为所有 worker 合计的 LLM 并发上限，按 worker 平分。
+    """
+    TRANSPORTS = ("pipe", "tcp")
+
+    def __init__(self, agent_names: List[str], workers: int = WORKERS, headless: bool = False,
+                 llm_backend: Optional[str] = None, initializer: Optional[Callable[[], None]] = None,
+                 start_method: str = START_METHOD, transport: str = TRANSPORT,
+                 address: Tuple[str, int] = (HOST, PORT), launch: bool = LAUNCH,
+                 straggler_timeout: Optional[float] = STRAGGLER_TIMEOUT,
+                 connect_timeout: float = CONNECT_TIMEOUT, max_concurrency: int = MAX_CONCURRENCY):
+        if transport not in self.TRANSPORTS:
+            raise ValueError(f"Unknown shard transport: {transport}")
+        workers = max(1, min(workers, len(agent_names)))
+        self.owner = {name: i % workers for i, name in enumerate(agent_names)}
+        self.proxies = [AgentProxy(name) for name in agent_names]
+        self._proxies = {proxy.name: proxy for proxy in self.proxies}
+        self.straggler_timeout = straggler_timeout
+        self._deliveries: List[list] = [[] for _ in range(workers)]
+        self._updates: List[dict] = [{} for _ in range(workers)]
+        # 各 worker 尚未收到回复的 tick；阻塞的 recv 在专用线程中等待
+        self._inflight: List[Optional[object]] = [None] * workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shard-recv")
+        self._connections = []
+        self._processes = []
+        self._listener = None
+        self._closed = False
+
+        # 统计计数
+        self._ticks = 0
+        self._delivered = 0
+        self._straggler_ticks = 0
+        self._skipped_runs = 0
+        self._late_results = 0
+        self._worker_stats: List[dict] = []
+
+        assignments = [[name for name in agent_names if self.owner[name] == index] for index in range(workers)]
+        self.llm_concurrency = split_concurrency(max_concurrency, workers)
+        context = multiprocessing.get_context(start_method)
+        if transport == "pipe":
+            for index in range(workers):
+                parent, child = context.Pipe()
+                self._start_process(context, _worker_main, index, (
+                    child, index, assignments[index], agent_names, headless, llm_backend,
+                    self.llm_concurrency[index], initializer))
+                child.close()
+                self._connections.append(parent)
+        else:
+            self._listener = shard_transport.listen(address)
+            self.address = self._listener.getsockname()
+            if launch:
+                host = "127.0.0.1" if self.address[0] in ("", "0.0.0.0") else self.address[0]
+                for index in range(workers):
+                    self._start_process(context, _tcp_worker_main, index, ((host, self.address[1]), initializer))
+            else:
+                # 阻塞等待外部 worker，用 warning 保证未配置日志时也能看到
+                logger.warning(f"Waiting for {workers} shard workers on {self.address[0]}:{self.address[1]} ...")
+            for index in range(workers):
+                conn = shard_transport.accept(self._listener, timeout=connect_timeout)
+                self._receive(conn, "hello")
+                conn.send(["assign", index, assignments[index], agent_names, headless, llm_backend,
+                           self.llm_concurrency[index]])
+                self._connections.append(conn)
+        for conn in self._connections:
+            self._apply_status(-1, self._receive(conn, "ready")[0])
+
+    def _start_process(self, context, target, index: int, args: tuple) -> None:
+        process = context.Process(target=target, name=f"agent-shard-{index}", daemon=True, args=args)
+        process.start()
+        self._processes.append(process)
+
+    @property
+    def workers(self) -> int:
+        return len(self._connections)
+
+    @staticmethod
+    def _receive(conn, expected: str) -> list:
+        message = conn.recv()
+        if message[0] == "error":
+            raise RuntimeError(f"Agent shard worker failed:\n{message[1]}")
+        if message[0] != expected:
+            raise RuntimeError(f"Unexpected shard message {message[0]!r}, expected {expected!r}")
+        return message[1:]
+
+    def _apply_status(self, source: int, status: Dict[str, dict]) -> None:
+        """更新本进程的镜像，并排队广播给其他 worker（daily_plan 只在变化时出现，合并而不覆盖）"""
+        for name, agent_status in status.items():
+            self._proxies[name].update(agent_status)
+            for index, updates in enumerate(self._updates):
+                if index != source and index != self.owner[name]:
+                    updates.setdefault(name, {}).update(agent_status)
+
+    def _collect(self, results: Dict[str, list], current_time: int) -> None:
+        """并入已经到达的回复（包括之前 tick 掉队后迟到的回复）"""
+        for index, future in enumerate(self._inflight):
+            if future is None or not future.done():
+                continue
+            self._inflight[index] = None
+            sim_time, events, status, outbox = future.result()
+            if sim_time != current_time:
+                self._late_results += 1
+            results.update(events)
+            self._apply_status(index, status)
+            for message in outbox:
+                self._deliveries[self.owner[message[0]]].append(message)
+
+    async def run_tick(self, due_names: List[str], sim_time: int, global_events: list) -> Dict[str, list]:
+        """
+        执行一个 tick 中到期的 Agent，返回 {name: 新事件}。
+        结果中可能缺少掉队 worker 上的 Agent，也可能包含之前 tick 迟到的 Agent。
+        """
+        results = {}
+        self._collect(results, sim_time)
+        due = [[] for _ in self._connections]
+        for name in due_names:
+            due[self.owner[name]].append(name)
+        for index, conn in enumerate(self._connections):
+            if self._inflight[index] is not None:
+                # 仍在处理之前的 tick，本跳不再发送，避免掉队的 worker 积压
+                self._skipped_runs += len(due[index])
+                continue
+            if not (due[index] or self._deliveries[index] or self._updates[index]):
+                continue
+            conn.send(["tick", sim_time, due[index], global_events, self._deliveries[index], self._updates[index]])
+            self._delivered += len(self._deliveries[index])
+            self._deliveries[index], self._updates[index] = [], {}
+            self._inflight[index] = self._executor.submit(self._receive, conn, "done")
+
+        waiting = [asyncio.wrap_future(future) for future in self._inflight if future is not None]
+        if waiting:
+            with profiler.span("shard.barrier", agent=""):
+                await asyncio.wait(waiting, timeout=self.straggler_timeout)
+        self._collect(results, sim_time)
+        self._straggler_ticks += sum(future is not None for future in self._inflight)
+        self._ticks += 1
+        return results
+
+    def close(self, timeout: float = CLOSE_TIMEOUT) -> None:
+        """
+        等待掉队的 worker 完成后停止所有 worker，把其耗时统计并入本进程的 profiler。
+        全部等待合计不超过 timeout 秒，届时仍未回复的 worker 不再等待，本机进程被终止。
+        """
+        if self._closed:
+            return
+        self._closed = True
+        deadline = time.monotonic() + timeout
+
+        def remaining() -> float:
+            return max(0.0, deadline - time.monotonic())
+
+        stopping = []
+        for index, conn in enumerate(self._connections):
+            future = self._inflight[index]
+            try:
+                if future is not None and future.exception(timeout=remaining()) is not None:
+                    continue
+                conn.send(["stop"])
+            except (FutureTimeout, OSError):
+                continue
+            stopping.append(self._executor.submit(self._receive, conn, "stopped"))
+        for future in stopping:
+            try:
+                stats = future.result(timeout=remaining())[0]
+            except (FutureTimeout, OSError, EOFError, RuntimeError):
+                continue
+            profiler.merge(stats.pop("profile"))
+            self._worker_stats.append(stats)
+        unresponsive = len(self._connections) - len(self._worker_stats)
+        if unresponsive:
+            logger.warning(f"{unresponsive} shard workers did not stop within {timeout}s")
+
+        for process in self._processes:
+            process.join(remaining())
+            if process.is_alive():
+                process.terminate()
+                process.join(1)
+            if process.is_alive():
+                process.kill()
+                process.join()
+        # 关闭连接后，仍阻塞在 recv 的接收线程随之返回
+        for conn in self._connections:
+            conn.close()
+        if self._listener is not None:
+            self._listener.close()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        world = {}
+        for stats in self._worker_stats:
+            for key, value in stats["world"].items():
+                world[key] = world.get(key, 0) + value if key != "time" else value
+        return {
+            "workers": self.workers,
+            "ticks": self._ticks,
+            "deliveries": self._delivered,
+            "straggler_ticks": self._straggler_ticks,
+            "skipped_agent_runs": self._skipped_runs,
+            "late_results": self._late_results,
+            "llm_calls": sum(stats["llm_calls"] for stats in self._worker_stats),
+            "llm_concurrency": self.llm_concurrency,
+            "world": world,
+        }
+
+
+def _load_initializer(text: Optional[str]) -> Optional[Callable[[], None]]:
+    """module:function -> 可调用对象"""
+    if not text:
+        return None
+    module, _, attr = text.partition(":")
+    return getattr(importlib.import_module(module), attr)
+
+
+if __name__ == "__main__":
+    # 在每台主机的仓库根目录启动 worker，连接到协调进程（main.py --listen HOST:PORT）
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--connect", required=True, help="协调进程的 HOST:PORT")
+    parser.add_argument("--count", type=int, default=1, help="在本机启动的 worker 数")
+    parser.add_argument("--initializer", default=None, help="worker 启动时调用的 module:function")
+    args = parser.parse_args()
+    address = shard_transport.parse_address(args.connect)
+    initializer = _load_initializer(args.initializer)
+    context = multiprocessing.get_context(START_METHOD)
+    processes = [context.Process(target=_tcp_worker_main, args=(address, initializer))
+                 for _ in range(args.count)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
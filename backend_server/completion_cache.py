@@ -0,0 +1,190 @@
+# completion_cache.py
+import atexit
+import hashlib
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+with open("./config/config.json", "r", encoding="utf-8") as f:
+    config = json.load(f)
+CACHE_CONFIG = config.get("CACHE_CONFIG", {})
+CACHE_ENABLED = CACHE_CONFIG.get("ENABLED", True)
+CACHE_PATH = CACHE_CONFIG.get("PATH", "./cache/completions.sqlite")
+MEMORY_SIZE = CACHE_CONFIG.get("MEMORY_SIZE", 4096)
+QUEUE_SIZE = CACHE_CONFIG.get("QUEUE_SIZE", 10000)
+
+
+def _normalize(text: str) -> str:
+    """归一化提示词：合并连续空白，去掉首尾空白"""
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+class CompletionCache:
+    """
+    内容寻址的补全缓存，键为 (后端地址, 模型, 参数, 归一化后的消息) 的 sha256。
+    - 第一级：进程内 LRU
+    - 第二级：SQLite 文件，跨进程、跨运行复用
+    只缓存调用方显式声明为确定性的提示词。
+    写入先进入 LRU，再由后台线程批量提交到 SQLite，事件循环中不做写盘。
+    """
+    def __init__(self, path: str = CACHE_PATH, memory_size: int = MEMORY_SIZE,
+                 enabled: bool = CACHE_ENABLED, queue_size: int = QUEUE_SIZE):
+        self.path = path
+        self.memory_size = memory_size
+        self.enabled = enabled
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+        # 统计计数
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._written = 0
+        self._dropped = 0
+        self._errors = 0
+
+    @staticmethod
+    def make_key(model: str, options: Optional[dict], messages: List[Dict[str, str]],
+                 endpoint: str = "") -> str:
+        payload = json.dumps({
+            "endpoint": endpoint,
+            "model": model,
+            "options": options or {},
+            "messages": [[m['role'], _normalize(m['content'])] for m in messages],
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(self.path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS completions ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        db.commit()
+        return db
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        # 读连接，写入由后台线程使用自己的连接
+        if self._db is None:
+            self._db = self._connect()
+        return self._db
+
+    def get(self, key: str) -> Optional[str]:
+        value = self._memory.get(key)
+        if value is not None:
+            self._memory.move_to_end(key)
+            self._memory_hits += 1
+            return value
+        row = self.db.execute("SELECT value FROM completions WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self._remember(key, row[0])
+            self._disk_hits += 1
+            return row[0]
+        self._misses += 1
+        return None
+
+    def put(self, key: str, value: str) -> None:
+        """立即写入 LRU，落盘交给后台线程；队列已满时只丢弃落盘，本进程仍可命中"""
+        self._remember(key, value)
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((key, value, time.time()))
+        except queue.Full:
+            self._dropped += 1
+
+    def flush(self) -> None:
+        """阻塞直到已提交的写入全部落盘，只在事件循环之外或退出前使用"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        if self._thread is not None:
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _remember(self, key: str, value: str) -> None:
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self._memory_hits + self._disk_hits + self._misses
+        return {
+            "memory_hits": self._memory_hits,
+            "disk_hits": self._disk_hits,
+            "misses": self._misses,
+            "hit_rate": (self._memory_hits + self._disk_hits) / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "written": self._written,
+            "dropped": self._dropped,
+            "write_errors": self._errors,
+        }
+
+    # ---------------- 后台线程 ----------------
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="completion-cache-writer",
+                                                    daemon=True)
+                    self._thread.start()
+                    # 进程退出前提交队列中剩余的写入
+                    atexit.register(self.close)
+
+    def _run(self) -> None:
+        db = None
+        while True:
+            items = [self._queue.get()]
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [item for item in items if item is not None]
+            try:
+                if rows:
+                    if db is None:
+                        db = self._connect()
+                    # 一批写入只提交一次事务
+                    db.executemany(
+                        "INSERT OR REPLACE INTO completions (key, value, created) VALUES (?, ?, ?)", rows
+                    )
+                    db.commit()
+                    self._written += len(rows)
+            except (OSError, sqlite3.Error):
+                # 落盘失败不影响本进程内的命中，线程继续处理后续批次
+                self._errors += len(rows)
+                if db is not None:
+                    db.close()
+                    db = None
+            finally:
+                for _ in items:
+                    self._queue.task_done()
+            if None in items:
+                if db is not None:
+                    db.close()
+                return
+
+
+# 进程级共享实例
+completion_cache = CompletionCache()
@@ -0,0 +1,61 @@
+# context_window.py
+import json
+from typing import Awaitable, Callable, Dict, List, Optional
+
+with open("./config/config.json", "r", encoding="utf-8") as f:
+    config = json.load(f)
+CONTEXT_CONFIG = config.get("CONTEXT_CONFIG", {})
+
+Message = Dict[str, str]
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数（英文约 4 字符 / token），服务端未返回计数时使用"""
+    return max(1, len(text) // 4)
+
+
+def count_message_tokens(messages: List[Message]) -> int:
+    return sum(estimate_tokens(m['content']) for m in messages)
+
+
+class ContextWindowPolicy:
+    """
+    多轮对话的上下文窗口策略，messages[0] 为 system 提示词，始终保留。
+    - last_n:       只保留最近 max_turns 轮（一轮 = user + assistant）
+    - token_budget: 从最早的消息开始丢弃，直到估算 token 数不超过 max_tokens
+    - summarize:    超出 max_tokens 时，把要丢弃的消息交给 summarizer 压缩成一条摘要
+    最新一条 user 消息永远不会被丢弃。
+    """
+    MODES = ("last_n", "token_budget", "summarize")
+
+    def __init__(self, mode: str = CONTEXT_CONFIG.get("POLICY", "last_n"),
+                 max_turns: int = CONTEXT_CONFIG.get("MAX_TURNS", 6),
+                 max_tokens: int = CONTEXT_CONFIG.get("MAX_TOKENS", 2048)):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown context window policy: {mode}")
+        self.mode = mode
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+
+    async def apply(self, messages: List[Message],
+                    summarizer: Optional[Callable[[List[Message]], Awaitable[str]]] = None) -> List[Message]:
+        """返回裁剪后的消息列表（不修改传入的列表）"""
+        system, rest = messages[:1], messages[1:]
+        if self.mode == "last_n":
+            return system + rest[-(self.max_turns * 2 + 1):]
+
+        budget = self.max_tokens - count_message_tokens(system)
+        keep = len(rest)
+        used = 0
+        for i in range(len(rest) - 1, -1, -1):
+            used += estimate_tokens(rest[i]['content'])
+            if used > budget and i < len(rest) - 1:
+                break
+            keep = i
+        dropped, kept = rest[:keep], rest[keep:]
+        if not dropped:
+            return system + kept
+        if self.mode == "summarize" and summarizer is not None:
+            summary = await summarizer(dropped)
+            return system + [{'role': 'system', 'content': f"Summary of the earlier conversation: {summary}"}] + kept
+        return system + kept
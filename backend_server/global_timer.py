@@ -1,9 +1,30 @@
 # global_timer.py
 import asyncio
-from mcrcon import MCRcon
+import json
+import time
 
 from tools.global_methods import get_minecraft_time
 from core.cognitive_modules.execute.agents_action_manager import AgentsActionManager
+from backend_server.wake_queue import WakeQueue
+from backend_server.rcon_client import RconClient
+from tools.log_writer import current_tick
+from tools.profiler import profiler
+
+with open('./config/config.json', 'r', encoding='utf-8') as f:
+    config = json.load(f)
+TIMER_CONFIG = config.get("TIMER_CONFIG", {})
+# tick: 每一跳执行所有 Agent（原行为）；event: 只执行到期的 Agent
+SCHEDULER = TIMER_CONFIG.get("SCHEDULER", "event")
+TICK_MINUTES = TIMER_CONFIG.get("TICK_MINUTES", 5)
+WALL_SECONDS_PER_TICK = TIMER_CONFIG.get("WALL_SECONDS_PER_TICK", 5)
+# 没有 Agent 到期的时段不等待真实时间，直接跳到下一个到期时间
+FAST_FORWARD = TIMER_CONFIG.get("FAST_FORWARD", True)
+DAY_MINUTES = 1440
+
+
+def _is_passive_event(event) -> bool:
+    """睡眠事件不会引发其他 Agent 的反应（见 execute_behavior）"""
+    return event['object'] == "sleep" or event['description'] == "sleeping"
 
 
 class GlobalTimer:
@@ -11,12 +32,39 @@ class GlobalTimer:
     全局中枢计时器：每5分钟一跳，驱动所有 Agent 的行为执行。
     - 游戏时间从所有 Agent 最早起床时间前5分钟开始
     - 与 AsyncBotManager 一一对应。
+    - event 模式下维护各 Agent 的下次唤醒时间，只执行到期的 Agent：
+      日程活动切换、收到其他 Agent 的新事件、对话进行中、后台重新规划完成
+    - world 只需实现 command_batch(cmds) 与 close()，默认为 RconClient 长连接的真实服务器，
+      headless 模式传入 HeadlessWorld；每跳的世界指令合并为一个批次，在后台线程发送，
+      start() 返回或出错时关闭
+    - 传入 shards（AgentShards）时作为协调者：Agent 与 bot 连接在 worker 进程中，
+      self.agents 为其 AgentProxy，bot_managers 可为 None
     """
-    def __init__(self, agent_names, bot_managers):
-        assert len(agent_names) == len(bot_managers), \
-            "agent_names 与 bot_managers 数量必须一致"
-        self.bot_managers = bot_managers
-        self.agents = [AgentsActionManager(name) for name in agent_names]
+    SCHEDULERS = ("tick", "event")
+
+    def __init__(self, agent_names, bot_managers, scheduler: str = SCHEDULER,
+                 tick_minutes: int = TICK_MINUTES,
+                 wall_seconds_per_tick: float = WALL_SECONDS_PER_TICK,
+                 fast_forward: bool = FAST_FORWARD, world=None, shards=None):
+        if shards is None:
+            assert len(agent_names) == len(bot_managers), \
+                "agent_names 与 bot_managers 数量必须一致"
+        if scheduler not in self.SCHEDULERS:
+            raise ValueError(f"Unknown scheduler: {scheduler}")
+        self.shards = shards
+        if shards is not None:
+            self.agents = shards.proxies
+            self.bot_managers = [None] * len(self.agents)
+        else:
+            self.agents = [AgentsActionManager(name) for name in agent_names]
+            self.bot_managers = bot_managers
+        self.scheduler = scheduler
+        self.tick_minutes = tick_minutes
+        self.wall_seconds_per_tick = wall_seconds_per_tick
+        self.fast_forward = fast_forward
+        self.world = world if world is not None else RconClient()
+        # 下一跳随 time set 一起发送的世界指令（天气、公告等）
+        self.pending_commands = []
         
         # 计算初始时间 --------------------------------------------------
         # 获取所有 Agent 的起床时间（睡眠结束时间）
@@ -29,39 +77,173 @@ class GlobalTimer:
         start_time = max(earliest_wakeup + 240, 0)
         # 游戏时间初始化为开始时间（模1440处理跨天）
         self.current_time = start_time % 1440
+        # 单调递增的模拟时间（分钟），跨天不回绕
+        self.sim_time = self.current_time
         
         self.global_events = []  # 全局事件表
         self.new_events_buffer = []  # 用于暂存新事件
+        # 每个 Agent 最近一次产生的事件；未被执行的 Agent 的事件会一直保留
+        self.last_events = {agent.name: [] for agent in self.agents}
+        self.wake_queue = WakeQueue()
+        # 记录各 Agent 的日程索引，后台重新规划换入新日程后需立即唤醒
+        self._schedule_versions = {}
+
+        # 统计计数
+        self._ticks_executed = 0
+        self._ticks_skipped = 0
+        self._agent_runs = 0
+        self._agent_runs_skipped = 0
+        self._sim_minutes = 0
+        self._wall_start = None
         # print("已注册 Agents:", AgentsActionManager.instances.keys())
 
-    async def start(self):
+    def _next_boundary(self, agent, sim_time: int) -> int:
+        """agent 当前活动结束后的第一个 tick（绝对分钟数）"""
+        day_minute = sim_time % DAY_MINUTES
+        next_change = agent.get_next_change(day_minute)
+        if next_change is None:
+            next_change = DAY_MINUTES
+        delta = max(next_change - day_minute, 1)
+        # 对齐到 tick 网格
+        ticks = -(-delta // self.tick_minutes)
+        return sim_time + ticks * self.tick_minutes
+
+    def _wake_replanned(self, sim_time: int) -> None:
+        for agent in self.agents:
+            version = agent.schedule_version
+            if self._schedule_versions.get(agent.name) is not version:
+                self._schedule_versions[agent.name] = version
+                self.wake_queue.schedule(agent.name, sim_time)
+
+    def _schedule_after_run(self, due_names, new_events, sim_time: int) -> None:
+        next_tick = sim_time + self.tick_minutes
+        for agent in self.agents:
+            if agent.name in due_names:
+                self.wake_queue.schedule(agent.name, self._next_boundary(agent, sim_time))
+                if agent.isChatting or agent.should_react:
+                    self.wake_queue.schedule(agent.name, next_tick)
+        # 新事件（与发出者上一次的事件不同）唤醒其他可能做出反应的 Agent
+        for event in new_events:
+            if _is_passive_event(event):
+                continue
+            previous = self.last_events.get(event['subject'], [])
+            if any(e['description'] == event['description'] for e in previous):
+                continue
+            for agent in self.agents:
+                if agent.name != event['subject'] and not agent.today_is_chatted:
+                    self.wake_queue.schedule(agent.name, next_tick)
+
+    async def _run_agents(self, agents_with_bots, sim_time: int):
+        """
+        返回 {name: 新事件}，只包含本跳实际产生结果的 Agent。
+        分片运行时可能缺少掉队 worker 上的 Agent，也可能包含之前掉队、本跳才到达的 Agent。
+        """
+        if self.shards is not None:
+            # 各 worker 并行执行各自到期的 Agent，全部回复后才进入下一跳
+            results = await self.shards.run_tick(
+                [agent.name for agent, _ in agents_with_bots], sim_time, list(self.global_events)
+            )
+            for agent, _ in agents_with_bots:
+                if agent.name not in results:
+                    # 所在 worker 掉队，沿用上一次的事件，下一跳重试
+                    self.wake_queue.schedule(agent.name, sim_time + self.tick_minutes)
+            return results
+        # 并行执行 Agent 行为，并等待全部完成
+        tasks = [
+            agent.execute_behavior(
+                bot_manager, 
+                sim_time % DAY_MINUTES,
+                list(self.global_events)  # 传递当前事件的副本
+            )
+            for agent, bot_manager in agents_with_bots
+        ]
+        results = await asyncio.gather(*tasks)
+        return {agent.name: events for (agent, _), events in zip(agents_with_bots, results)}
+
+    async def start(self, max_minutes=None):
+        """
+        运行计时器。
+        :param max_minutes: 模拟多少分钟后返回，None 表示一直运行
+        """
         print("++++++++++++++++++ Time Start ++++++++++++++++++")
-        while True:
-            hour = self.current_time // 60
-            minute = self.current_time % 60
-            minecraft_time = get_minecraft_time(self.current_time)
-            print("-----------------------------------------------")
-            print(f"[Time: {hour:02d}:{minute:02d}]")
-            with MCRcon("127.0.0.1", "123456") as mcr:
-                mcr.command(f"time set {minecraft_time}")
-            # 并行执行所有 Agent 行为，并等待全部完成
-            tasks = [
-                agent.execute_behavior(
-                    bot_manager, 
-                    self.current_time,
-                    list(self.global_events)  # 传递当前事件的副本
-                )
-                for agent, bot_manager in zip(self.agents, self.bot_managers)
-            ]
-            
-            # 收集所有Agent生成的新事件
-            agent_results = await asyncio.gather(*tasks)
-            self.new_events_buffer = [event for sublist in agent_results for event in sublist]
+        self._wall_start = time.perf_counter()
+        end_time = None if max_minutes is None else self.sim_time + max_minutes
+        for agent in self.agents:
+            self.wake_queue.schedule(agent.name, self.sim_time)
+
+        try:
+            while end_time is None or self.sim_time < end_time:
+                if self.scheduler == "event":
+                    self._wake_replanned(self.sim_time)
+                    next_time = self.wake_queue.next_time()
+                    if next_time is not None and next_time > self.sim_time:
+                        # 跳过没有 Agent 到期的时段
+                        target = next_time if end_time is None else min(next_time, end_time)
+                        skipped = (target - self.sim_time) // self.tick_minutes
+                        self._ticks_skipped += skipped
+                        self._agent_runs_skipped += skipped * len(self.agents)
+                        if not self.fast_forward:
+                            await asyncio.sleep(self.wall_seconds_per_tick * skipped)
+                        self._advance(target - self.sim_time)
+                        continue
+                    due_names = set(self.wake_queue.pop_due(self.sim_time))
+                else:
+                    due_names = {agent.name for agent in self.agents}
+
+                hour = self.current_time // 60
+                minute = self.current_time % 60
+                minecraft_time = get_minecraft_time(self.current_time)
+                print("-----------------------------------------------")
+                print(f"[Time: {hour:02d}:{minute:02d}] agents due: {len(due_names)}/{len(self.agents)}, "
+                      f"{self.stats()['sim_minutes_per_wall_second']:.1f} sim-min/s")
+                due = [(agent, bot_manager) for agent, bot_manager in zip(self.agents, self.bot_managers)
+                       if agent.name in due_names]
+                # 本 tick 内各调用点写日志时带上模拟时间
+                current_tick.set(self.sim_time)
+                async with profiler.span("tick", agent=""):
+                    commands, self.pending_commands = [f"time set {minecraft_time}"] + self.pending_commands, []
+                    with profiler.span("world.command_batch"):
+                        self.world.command_batch(commands)
+                    agent_results = await self._run_agents(due, self.sim_time)
+                # 收集所有Agent生成的新事件（含掉队 worker 迟到的结果）
+                self.new_events_buffer = [event for sublist in agent_results.values() for event in sublist]
+                self._ticks_executed += 1
+                self._agent_runs += len(due)
+                self._agent_runs_skipped += len(self.agents) - len(due)
+
+                if self.scheduler == "event":
+                    self._schedule_after_run(set(agent_results), self.new_events_buffer, self.sim_time)
+                for name, events in agent_results.items():
+                    self.last_events[name] = events
             
-            # 更新全局事件表
-            await asyncio.sleep(5)
-            self.global_events = self.new_events_buffer
-            self.current_time = (self.current_time + 5) % 1440
+                # 更新全局事件表：未执行的 Agent 沿用其最近一次的事件
+                await asyncio.sleep(self.wall_seconds_per_tick)
+                self.global_events = [event for events in self.last_events.values() for event in events]
+                self._advance(self.tick_minutes)
+        finally:
+            # 发送完已排队的世界指令后断开 RCON 长连接
+            self.world.close()
+
+    def queue_command(self, cmd: str) -> None:
+        """预约一条世界指令，在下一次执行的 tick 与 time set 一起批量发送"""
+        self.pending_commands.append(cmd)
+
+    def _advance(self, minutes: int) -> None:
+        self.sim_time += minutes
+        self._sim_minutes += minutes
+        self.current_time = self.sim_time % DAY_MINUTES
+
+    def stats(self):
+        wall = time.perf_counter() - self._wall_start if self._wall_start is not None else 0.0
+        return {
+            "sim_minutes": self._sim_minutes,
+            "wall_seconds": wall,
+            "sim_minutes_per_wall_second": self._sim_minutes / wall if wall > 0 else 0.0,
+            "ticks_executed": self._ticks_executed,
+            "ticks_skipped": self._ticks_skipped,
+            "agent_runs": self._agent_runs,
+            "agent_runs_skipped": self._agent_runs_skipped,
+        }
 
 
 # import asyncio
@@ -0,0 +1,117 @@
+# headless_world.py
+import re
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+
+
+class GoalNear:
+    """与 mineflayer-pathfinder 的 goals.GoalNear 参数一致"""
+    def __init__(self, x, y, z, range_goal):
+        self.x, self.y, self.z = x, y, z
+        self.range = range_goal
+
+
+class Movements:
+    def __init__(self, bot):
+        self.bot = bot
+
+
+# 代替 require('mineflayer-pathfinder') 的进程内实现
+pathfinder = SimpleNamespace(
+    pathfinder="headless-pathfinder-plugin",
+    Movements=Movements,
+    goals=SimpleNamespace(GoalNear=GoalNear),
+)
+
+
+class HeadlessPathfinder:
+    """设定目标后立即到达，不模拟寻路过程"""
+    def __init__(self, bot: "HeadlessBot"):
+        self.bot = bot
+        self.movements = None
+        self.goal = None
+
+    def setMovements(self, movements) -> None:
+        self.movements = movements
+
+    def setGoal(self, goal) -> None:
+        self.goal = goal
+        if goal is not None:
+            self.bot.entity.position = SimpleNamespace(x=goal.x, y=goal.y, z=goal.z)
+            self.bot.world.goals_set += 1
+
+
+class HeadlessBot:
+    """实现 Agent 用到的 mineflayer bot 接口：chat、loadPlugin、pathfinder、lookAt"""
+    def __init__(self, username: str, world: "HeadlessWorld"):
+        self.username = username
+        self.world = world
+        self.entity = SimpleNamespace(position=SimpleNamespace(x=0, y=0, z=0))
+        self.pathfinder = HeadlessPathfinder(self)
+        self.players = world.players
+
+    def loadPlugin(self, plugin) -> None:
+        pass
+
+    def chat(self, message: str) -> None:
+        self.world.chat_log.append((self.world.time, self.username, message))
+
+    def lookAt(self, position) -> None:
+        pass
+
+
+class HeadlessWorld:
+    """
+    进程内的 Minecraft 世界替身，不需要服务器、mineflayer 或 RCON。
+    - command() / command_batch() 支持 GlobalTimer 使用的 "time set <ticks>"
+    - 记录聊天与移动，便于回放与回归比对
+    """
+    TIME_SET = re.compile(r"^\s*time set (\d+)\s*$")
+
+    def __init__(self):
+        self.time = 0
+        self.players: Dict[str, SimpleNamespace] = {}
+        self.chat_log: List[Tuple[int, str, str]] = []
+        self.commands = 0
+        self.goals_set = 0
+
+    def create_bot(self, username: str) -> HeadlessBot:
+        bot = HeadlessBot(username, self)
+        self.players[username] = SimpleNamespace(entity=bot.entity)
+        return bot
+
+    def command(self, cmd: str) -> str:
+        self.commands += 1
+        match = self.TIME_SET.match(cmd)
+        if match:
+            self.time = int(match.group(1))
+            return f"Set the time to {self.time}"
+        return f"Unknown command: {cmd}"
+
+    def command_batch(self, cmds: List[str]) -> List[str]:
+        return [self.command(cmd) for cmd in cmds]
+
+    def close(self) -> None:
+        """与 RconClient 接口一致，没有需要释放的连接"""
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "commands": self.commands,
+            "chats": len(self.chat_log),
+            "goals_set": self.goals_set,
+            "time": self.time,
+        }
+
+
+class HeadlessBotManager:
+    """与 AsyncBotManager 接口一致的替身，bot 挂在 HeadlessWorld 上"""
+    def __init__(self, name: str, world: HeadlessWorld):
+        self.name = name
+        self.world = world
+        self.pathfinder = pathfinder
+        self.bot = world.create_bot(name.split(" ")[0])
+        self.entity = None
+
+    def position(self) -> Optional[Tuple[float, float, float]]:
+        pos = self.bot.entity.position
+        return pos.x, pos.y, pos.z
@@ -0,0 +1,230 @@
+# llm_backends.py
+import ast
+import asyncio
+import glob
+import gzip
+import json
+import random
+import re
+from typing import Dict, List, Optional
+
+from backend_server.context_window import count_message_tokens
+
+with open("./config/config.json", "r", encoding="utf-8") as f:
+    config = json.load(f)
+LLM_CONFIG = config.get("LLM_CONFIG", {})
+BACKEND = LLM_CONFIG.get("BACKEND", "ollama")
+OLLAMA_HOST = config.get("OLLAMA_CONFIG", {}).get("HOST", "http://localhost:11434")
+OPENAI_CONFIG = LLM_CONFIG.get("OPENAI", {})
+REPLAY_CONFIG = LLM_CONFIG.get("REPLAY", {})
+
+Message = Dict[str, str]
+
+
+def _response(content: str, prompt_tokens: Optional[int]) -> dict:
+    """统一的回复格式，与 ollama 的 ChatResponse 字段一致"""
+    return {'message': {'role': 'assistant', 'content': content}, 'prompt_eval_count': prompt_tokens}
+
+
+class OllamaBackend:
+    """本地 ollama 服务，ollama 包在首次使用时才导入"""
+    def __init__(self, host: str = OLLAMA_HOST):
+        from ollama import AsyncClient
+        # 写入补全缓存键，不同服务上的补全互不复用
+        self.endpoint = f"ollama:{host}"
+        self.client = AsyncClient(host=host)
+
+    async def chat(self, model: str, messages: List[Message], options: Optional[dict] = None):
+        return await self.client.chat(model=model, messages=messages, options=options or {})
+
+
+class OpenAICompatibleBackend:
+    """任意兼容 OpenAI /chat/completions 接口的 HTTP 服务（vLLM、llama.cpp server、LM Studio 等）"""
+    # ollama 选项名 -> OpenAI 参数名
+    OPTION_NAMES = {"temperature": "temperature", "top_p": "top_p", "num_predict": "max_tokens", "seed": "seed", "stop": "stop"}
+
+    def __init__(self, base_url: str = OPENAI_CONFIG.get("BASE_URL", "http://localhost:8000/v1"),
+                 api_key: str = OPENAI_CONFIG.get("API_KEY", ""),
+                 timeout: float = OPENAI_CONFIG.get("TIMEOUT", 120)):
+        import httpx
+        self.endpoint = f"openai:{base_url.rstrip('/')}"
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.client = httpx.AsyncClient(base_url=base_url.rstrip("/"), headers=headers, timeout=timeout)
+
+    async def chat(self, model: str, messages: List[Message], options: Optional[dict] = None):
+        payload = {"model": model, "messages": messages}
+        for name, value in (options or {}).items():
+            if name in self.OPTION_NAMES:
+                payload[self.OPTION_NAMES[name]] = value
+        response = await self.client.post("/chat/completions", json=payload)
+        response.raise_for_status()
+        data = response.json()
+        usage = data.get("usage") or {}
+        return _response(data["choices"][0]["message"]["content"], usage.get("prompt_tokens"))
+
+
+class ReplayBackend:
+    """
+    离线、可复现的替身后端，不需要任何推理服务：
+    - 优先回放日志中记录的补全：LogWriter 写入的 JSONL（含轮转后的 .gz）直接按提示词查表；
+      旧的 prompt_log*.txt 按 print(prompt); print(response) 写入，回复已被清洗为单行，
+      因此提示词之后的一行即为当时的回复
+    - 没有记录的提示词按提示词类型合成一个格式正确的回复
+    - 每次调用等待 latency ± jitter 秒，模拟推理耗时
+    回复是合成的，endpoint 为 None，网关不为其读写补全缓存。
+    """
+    endpoint = None
+
+    def __init__(self, traces: Optional[List[str]] = None,
+                 latency: float = REPLAY_CONFIG.get("LATENCY", 0.0),
+                 jitter: float = REPLAY_CONFIG.get("JITTER", 0.0),
+                 seed: int = REPLAY_CONFIG.get("SEED", 0)):
+        patterns = traces if traces is not None else REPLAY_CONFIG.get("TRACES", ["./log/prompt_log*.txt", "./log/prompt_log*.jsonl*"])
+        self.paths = sorted({path for pattern in patterns for path in glob.glob(pattern)})
+        self.latency = latency
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._texts: Optional[List[str]] = None
+        self._records: Dict[str, str] = {}
+        self._memo: Dict[str, Optional[str]] = {}
+
+        # 统计计数
+        self.replayed = 0
+        self.synthesized = 0
+
+    @property
+    def texts(self) -> List[str]:
+        if self._texts is None:
+            self._texts = []
+            for path in self.paths:
+                if ".jsonl" in path:
+                    self._load_records(path)
+                    continue
+                with open(path, "r", encoding="utf-8", errors="replace") as f:
+                    self._texts.append(f.read())
+        return self._texts
+
+    def _load_records(self, path: str) -> None:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                # HASH_ONLY 模式的记录没有原文，无法回放
+                if isinstance(record.get("prompt"), str) and isinstance(record.get("response"), str):
+                    self._records.setdefault(record["prompt"], record["response"])
+
+    def lookup(self, prompt: str) -> Optional[str]:
+        """在日志中查找同一提示词的记录，返回当时的回复"""
+        if prompt not in self._memo:
+            texts = self.texts  # 首次查找时加载全部日志
+            found = self._records.get(prompt)
+            needle = prompt + "\n"
+            for text in texts if found is None else []:
+                index = text.find(needle)
+                if index != -1:
+                    start = index + len(needle)
+                    end = text.find("\n", start)
+                    found = text[start:end if end != -1 else len(text)].strip() or None
+                    if found is not None:
+                        break
+            self._memo[prompt] = found
+        return self._memo[prompt]
+
+    async def chat(self, model: str, messages: List[Message], options: Optional[dict] = None):
+        prompt = messages[-1]['content']
+        content = self.lookup(prompt)
+        if content is None:
+            self.synthesized += 1
+            content = synthesize_response(prompt)
+        else:
+            self.replayed += 1
+        delay = self.latency + self._random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return _response(content, count_message_tokens(messages))
+
+    def stats(self) -> Dict[str, int]:
+        return {"replayed": self.replayed, "synthesized": self.synthesized}
+
+
+_ACTIVITIES = ["working at the desk", "reading a book", "having lunch at the cafe",
+               "walking in the park", "writing notes", "cooking dinner"]
+
+
+def _destination_options(prompt: str) -> List[str]:
+    match = re.search(r"destineations:\s*(\[.*\])", prompt)
+    try:
+        return ast.literal_eval(match.group(1)) if match else []
+    except (ValueError, SyntaxError):
+        return []
+
+
+def _pick_destination(options: List[str], action: str) -> str:
+    for option in options:
+        if option.lower() in action.lower():
+            return option
+    return options[0] if options else "cafe"
+
+
+def synthesize_response(prompt: str) -> str:
+    """按提示词类型合成确定性的回复，保证各解析函数都能得到格式正确的输入"""
+    if "rate the importance" in prompt:
+        return "5"
+    if "wake up hour" in prompt:
+        return "7"
+    if '"importance"' in prompt:
+        # 合并感知调用：三元组、目的地与重要性一次给出
+        match = re.search(r"Input: (.+?) is (.*)\nOutput:\s*$", prompt)
+        name, action = match.groups() if match else ("Agent", "")
+        options = _destination_options(prompt)
+        return json.dumps({"subject": name, "predicate": "is", "object": "activity",
+                           "destination": _pick_destination(options, action), "importance": 3})
+    if "Return ONLY a JSON object" in prompt:
+        entries = [{"hour": f"{hour % 12 or 12:02d}:00 {'AM' if hour < 12 else 'PM'}",
+                    "activity": _ACTIVITIES[hour % len(_ACTIVITIES)]} for hour in range(7, 24)]
+        return json.dumps({"schedule": entries})
+    if "broad-strokes" in prompt:
+        return "['wake up and complete the morning routine at 7:00 am', 'work at the desk', 'have lunch at the cafe', 'walk in the park']"
+    match = re.search(r"total duration in minutes (\d+)", prompt)
+    if match:
+        duration = int(match.group(1))
+        return (f"1) getting ready (duration in minutes: 5, minutes left: {duration - 5}) "
+                f"2) doing the main task (duration in minutes: {duration - 5}, minutes left: 0)")
+    match = re.search(r"What would .*? do in (\d+):00", prompt)
+    if match:
+        return _ACTIVITIES[int(match.group(1)) % len(_ACTIVITIES)]
+    if "(subject, predicate, object)" in prompt:
+        match = re.search(r"Output: \(([^,\n]+),\s*$", prompt)
+        name = match.group(1) if match else "Agent"
+        return f"({name}, is, activity)"
+    if "(subject, object)" in prompt:
+        match = re.search(r"Output: \(([^,\n]+),\s*$", prompt)
+        name = match.group(1) if match else "Agent"
+        return f"({name}, activity)"
+    if "destination" in prompt:
+        action = re.search(r"current action: (.*)", prompt)
+        return f"[{_pick_destination(_destination_options(prompt), action.group(1) if action else '')}]"
+    if "said:\n" in prompt:
+        return '"Hi! How is your day going?"'
+    if "Yes" in prompt and "No" in prompt:
+        return "No"
+    if "Summarize" in prompt:
+        return "They talked briefly about their plans for the day."
+    return "Okay."
+
+
+BACKENDS = {
+    "ollama": OllamaBackend,
+    "openai": OpenAICompatibleBackend,
+    "replay": ReplayBackend,
+}
+
+
+def create_backend(backend: str = BACKEND, **kwargs):
+    """按名称创建 LLM 后端，可选 ollama / openai / replay"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend: {backend}")
+    return BACKENDS[backend](**kwargs)
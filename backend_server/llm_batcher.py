@@ -0,0 +1,133 @@
+# llm_batcher.py
+import asyncio
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+
+from backend_server.completion_cache import CompletionCache
+from backend_server.llm_gateway import LLMGateway, gateway
+from tools.profiler import profiler
+
+with open("./config/config.json", "r", encoding="utf-8") as f:
+    config = json.load(f)
+BATCH_CONFIG = config.get("BATCH_CONFIG", {})
+BATCH_ENABLED = BATCH_CONFIG.get("ENABLED", True)
+# 收集窗口（秒），0 表示不等待、立即下发，只与在途的相同请求共享结果
+BATCH_WINDOW = BATCH_CONFIG.get("WINDOW", 0.0)
+MAX_BATCH_SIZE = BATCH_CONFIG.get("MAX_BATCH_SIZE", 32)
+
+Message = Dict[str, str]
+
+
+class MicroBatcher:
+    """
+    认知模块与 LLMGateway 之间的微批处理层，接口与 LLMGateway.chat 相同。
+    - 同一时间窗口内各 Agent 发出的请求收集为一个批次，window 为 0 时立即下发
+    - 只对 cache=True（声明为输入的纯函数）的请求去重：批次内以及正在执行中的相同提示词只请求一次，
+      结果分发给所有调用方；cache=False 的请求按温度采样，每个调用方各自请求
+    - 批次中的不同请求并发下发，由网关的信号量映射到推理服务的并行槽位
+      （ollama 的 OLLAMA_NUM_PARALLEL、llama.cpp 的 --parallel 等）
+    """
+    def __init__(self, client: LLMGateway = gateway, window: float = BATCH_WINDOW,
+                 max_batch_size: int = MAX_BATCH_SIZE, enabled: bool = BATCH_ENABLED):
+        self.client = client
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.enabled = enabled
+
+        # 等待合并的请求：key -> (请求参数, future, 入队时间)
+        self._pending: Dict[str, Tuple[tuple, asyncio.Future, float]] = {}
+        # 已下发、尚未返回的请求，新的相同请求直接共享结果
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._flush_handle = None
+
+        # 统计计数
+        self._requests = 0
+        self._deduplicated = 0
+        self._dispatched = 0
+        self._passthrough = 0
+        self._batches = 0
+        self._max_batch = 0
+        self._wait_seconds = 0.0
+
+    async def chat(self, model: str, messages: List[Message],
+                   options: Optional[dict] = None, cache: bool = False) -> str:
+        # 按调用方计时，包含合并等待与去重共享的时间
+        async with profiler.span("llm"):
+            return await self._chat(model, messages, options, cache)
+
+    async def _chat(self, model: str, messages: List[Message],
+                    options: Optional[dict] = None, cache: bool = False) -> str:
+        if not self.enabled:
+            return await self.client.chat(model=model, messages=messages, options=options, cache=cache)
+
+        self._requests += 1
+        if not cache:
+            # 采样得到的补全（对话、反应、重新规划）不能在调用方之间共享
+            self._passthrough += 1
+            return await self.client.chat(model=model, messages=messages, options=options, cache=cache)
+
+        key = CompletionCache.make_key(model, options, messages)
+        future = self._in_flight.get(key)
+        if future is None and key in self._pending:
+            future = self._pending[key][1]
+        if future is not None:
+            self._deduplicated += 1
+            # shield：某个调用方被取消时不影响共享同一结果的其他调用方
+            return await asyncio.shield(future)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending[key] = ((model, messages, options, cache), future, time.perf_counter())
+        if self.window <= 0 or len(self._pending) >= self.max_batch_size:
+            if self._flush_handle is not None:
+                self._flush_handle.cancel()
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+        return await asyncio.shield(future)
+
+    def _flush(self) -> None:
+        self._flush_handle = None
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return
+        self._batches += 1
+        self._max_batch = max(self._max_batch, len(batch))
+        now = time.perf_counter()
+        for key, (request, future, queued_at) in batch.items():
+            self._wait_seconds += now - queued_at
+            self._in_flight[key] = future
+            self._dispatched += 1
+            asyncio.ensure_future(self._dispatch(key, request, future))
+
+    async def _dispatch(self, key: str, request: tuple, future: asyncio.Future) -> None:
+        model, messages, options, cache = request
+        try:
+            result = await self.client.chat(model=model, messages=messages, options=options, cache=cache)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+            # 没有调用方等待时避免 "exception was never retrieved" 警告
+            future.exception()
+        else:
+            if not future.done():
+                future.set_result(result)
+        finally:
+            self._in_flight.pop(key, None)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "requests": self._requests,
+            "deduplicated": self._deduplicated,
+            "dispatched": self._dispatched,
+            "passthrough": self._passthrough,
+            "batches": self._batches,
+            "max_batch": self._max_batch,
+            "avg_batch": self._dispatched / self._batches if self._batches else 0.0,
+            "avg_wait": self._wait_seconds / self._dispatched if self._dispatched else 0.0,
+        }
+
+
+# 进程级共享实例
+batcher = MicroBatcher()
@@ -0,0 +1,112 @@
+# llm_gateway.py
+import asyncio
+import json
+import time
+from typing import Dict, List, Optional
+
+from backend_server.context_window import count_message_tokens
+from backend_server.llm_backends import BACKEND, create_backend
+from backend_server.completion_cache import CompletionCache, completion_cache
+
+with open("./config/config.json", "r", encoding="utf-8") as f:
+    config = json.load(f)
+OLLAMA_CONFIG = config.get("OLLAMA_CONFIG", {})
+MAX_CONCURRENCY = OLLAMA_CONFIG.get("MAX_CONCURRENCY", 4)
+
+
+class LLMGateway:
+    """
+    所有认知模块共用的异步 LLM 入口。
+    - 后端由 LLM_CONFIG.BACKEND 选择（ollama / openai / replay），请求不会阻塞事件循环
+    - 信号量限制同时在途的请求数，避免压垮推理服务
+    """
+    def __init__(self, backend: str = BACKEND, max_concurrency: int = MAX_CONCURRENCY,
+                 cache: CompletionCache = completion_cache, **backend_options):
+        self.backend = backend
+        self.backend_options = backend_options
+        self._client = None
+        self.cache = cache
+        self.max_concurrency = max_concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        # 统计计数
+        self._calls = 0
+        self._in_flight = 0
+        self._max_in_flight = 0
+        self._latency_total = 0.0
+        self._prompt_tokens_total = 0
+        self._prompt_tokens_max = 0
+        self.last_prompt_tokens = 0
+
+    @property
+    def client(self):
+        # 首次请求时才创建后端，未使用的后端不需要安装其依赖
+        if self._client is None:
+            self._client = create_backend(self.backend, **self.backend_options)
+        return self._client
+
+    def set_backend(self, backend: str, **backend_options) -> None:
+        """运行时切换后端，例如命令行指定 --llm-backend replay"""
+        self.backend = backend
+        self.backend_options = backend_options
+        self._client = None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # 在首次使用时创建，保证绑定到运行中的事件循环
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def chat(self, model: str, messages: List[Dict[str, str]],
+                   options: Optional[dict] = None, cache: bool = False) -> str:
+        """
+        发送一次对话请求，返回原始回复文本。
+        cache=True 表示该提示词是输入的纯函数，可直接复用之前的补全结果。
+        """
+        key = None
+        # replay 后端的回复是合成的，不能写入缓存供真实后端复用
+        if cache and self.cache.enabled and self.client.endpoint is not None:
+            key = self.cache.make_key(model, options, messages, self.client.endpoint)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        async with self.semaphore:
+            self._in_flight += 1
+            self._max_in_flight = max(self._max_in_flight, self._in_flight)
+            start = time.perf_counter()
+            try:
+                response = await self.client.chat(
+                    model=model,
+                    messages=messages,
+                    options=options or {}
+                )
+            finally:
+                self._in_flight -= 1
+                self._latency_total += time.perf_counter() - start
+                self._calls += 1
+        # 优先使用服务端返回的 token 计数
+        prompt_tokens = response.get('prompt_eval_count') or count_message_tokens(messages)
+        self.last_prompt_tokens = prompt_tokens
+        self._prompt_tokens_total += prompt_tokens
+        self._prompt_tokens_max = max(self._prompt_tokens_max, prompt_tokens)
+        content = response['message']['content']
+        if key is not None:
+            self.cache.put(key, content)
+        return content
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "calls": self._calls,
+            "in_flight": self._in_flight,
+            "max_in_flight": self._max_in_flight,
+            "avg_latency": self._latency_total / self._calls if self._calls else 0.0,
+            "prompt_tokens_total": self._prompt_tokens_total,
+            "avg_prompt_tokens": self._prompt_tokens_total / self._calls if self._calls else 0.0,
+            "max_prompt_tokens": self._prompt_tokens_max,
+        }
+
+
+# 进程级共享实例
+gateway = LLMGateway()
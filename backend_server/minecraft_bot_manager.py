@@ -28,6 +28,7 @@ class AsyncBotManager:
         self.host = host
         self.port = port
         self.loop = loop or asyncio.get_event_loop()
+        self.pathfinder = pathfinder
         self.bot = mineflayer.createBot({
             'host': self.host,
             'port': self.port,
@@ -0,0 +1,262 @@
+# rcon_client.py
+import asyncio
+import json
+import logging
+import queue
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+with open("./config/config.json", "r", encoding="utf-8") as f:
+    config = json.load(f)
+RCON_CONFIG = config.get("RCON_CONFIG", {})
+RCON_HOST = RCON_CONFIG.get("HOST", "127.0.0.1")
+RCON_PORT = RCON_CONFIG.get("PORT", 25575)
+RCON_PASSWORD = RCON_CONFIG.get("PASSWORD", "123456")
+RCON_TIMEOUT = RCON_CONFIG.get("TIMEOUT", 5)
+BACKOFF_BASE = RCON_CONFIG.get("BACKOFF_BASE", 0.5)
+BACKOFF_MAX = RCON_CONFIG.get("BACKOFF_MAX", 30)
+MAX_RETRIES = RCON_CONFIG.get("MAX_RETRIES", 3)
+# 同一批次中只保留最后一条的指令前缀，例如连续多次 time set 只需发送最新的一次
+COALESCE_PREFIXES = tuple(RCON_CONFIG.get("COALESCE_PREFIXES", ["time set", "weather"]))
+
+# RCON 协议包类型
+SERVERDATA_AUTH = 3
+SERVERDATA_EXECCOMMAND = 2
+# 服务器对未知类型的包以相同 id 回复一个包。收到指令的第一个回复包后再发一个该类型的哨兵包，
+# 哨兵的回复到达即说明该指令回复的所有分包都已收到
+SERVERDATA_RESPONSE_VALUE = 0
+
+
+class RconError(Exception):
+    pass
+
+
+class RconClient:
+    """
+    长连接的 RCON 客户端，所有网络 I/O 都在后台线程中完成：
+    - command / command_batch 只把指令放入队列，立即返回 Future，不阻塞事件循环
+    - 后台线程一次取出队列中所有指令，合并可覆盖的指令后在同一连接上依次发送
+    - 连接上始终只有一个包在途：原版服务器每次读取只接受恰好一个包，多个包粘在一起会直接断开连接
+    - 连接断开时按指数退避重连，只重发尚未收到完整回复的指令，超过重试次数后 Future 以异常结束
+    协议直接基于 socket 实现：mcrcon 依赖 SIGALRM 做超时，只能在主线程使用。
+    """
+    def __init__(self, host: str = RCON_HOST, port: int = RCON_PORT,
+                 password: str = RCON_PASSWORD, timeout: float = RCON_TIMEOUT,
+                 backoff_base: float = BACKOFF_BASE, backoff_max: float = BACKOFF_MAX,
+                 max_retries: int = MAX_RETRIES, coalesce_prefixes=COALESCE_PREFIXES):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_retries = max_retries
+        self.coalesce_prefixes = tuple(coalesce_prefixes)
+
+        self._queue: "queue.Queue[Optional[List[Tuple[str, Future]]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._sock: Optional[socket.socket] = None
+        self._request_id = 0
+
+        # 统计计数
+        self._sent = 0
+        self._failed = 0
+        self._coalesced = 0
+        self._batches = 0
+        self._reconnects = 0
+        self._latencies = deque(maxlen=1024)
+
+    # ---------------- 对外接口 ----------------
+    def command(self, cmd: str) -> Future:
+        """异步提交一条指令，返回 concurrent.futures.Future，结果为服务器回复"""
+        return self.command_batch([cmd])[0]
+
+    def command_batch(self, cmds: List[str]) -> List[Future]:
+        """一次提交多条指令，按顺序在同一连接上发送"""
+        self._ensure_started()
+        batch = [(cmd, Future()) for cmd in cmds]
+        if batch:
+            self._queue.put(batch)
+        return [future for _, future in batch]
+
+    async def command_async(self, cmd: str) -> str:
+        return await asyncio.wrap_future(self.command(cmd))
+
+    def close(self, timeout: Optional[float] = RCON_TIMEOUT) -> None:
+        """发送完队列中剩余的指令后关闭连接，服务器无响应时最多等待 timeout 秒"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> Dict[str, float]:
+        latencies = sorted(self._latencies)
+        return {
+            "sent": self._sent,
+            "failed": self._failed,
+            "coalesced": self._coalesced,
+            "batches": self._batches,
+            "reconnects": self._reconnects,
+            "queue_depth": self._queue.qsize(),
+            "avg_latency_ms": sum(latencies) / len(latencies) * 1e3 if latencies else 0.0,
+            "p95_latency_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1e3 if latencies else 0.0,
+            "max_latency_ms": latencies[-1] * 1e3 if latencies else 0.0,
+        }
+
+    # ---------------- 后台线程 ----------------
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="rcon-client", daemon=True)
+                    self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            stop = item is None
+            batch = [] if stop else list(item)
+            # 一次取空队列，合并为一个批次
+            while not stop:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                else:
+                    batch.extend(item)
+            if batch:
+                self._process(batch)
+            if stop:
+                self._disconnect()
+                return
+
+    def _coalesce(self, batch: List[Tuple[str, Future]]):
+        """返回 (实际发送的指令, 每条指令对应的 Future 列表)"""
+        last_index = {}
+        for i, (cmd, _) in enumerate(batch):
+            for prefix in self.coalesce_prefixes:
+                if cmd.startswith(prefix):
+                    last_index[prefix] = i
+        to_send: List[Tuple[str, List[Future]]] = []
+        superseded: Dict[str, List[Future]] = {}
+        for i, (cmd, future) in enumerate(batch):
+            prefix = next((p for p in self.coalesce_prefixes if cmd.startswith(p)), None)
+            if prefix is not None and last_index[prefix] != i:
+                # 被同批次中更新的同类指令覆盖，结果与最新一条相同
+                superseded.setdefault(prefix, []).append(future)
+                self._coalesced += 1
+                continue
+            futures = [future] + (superseded.pop(prefix, []) if prefix is not None else [])
+            to_send.append((cmd, futures))
+        return to_send
+
+    def _process(self, batch: List[Tuple[str, Future]]) -> None:
+        to_send = deque(self._coalesce(batch))
+        self._batches += 1
+        for attempt in range(self.max_retries + 1):
+            try:
+                if self._sock is None:
+                    self._connect()
+                # 每收到一条完整回复就结束对应的 Future，出错时队列中只剩未确认的指令
+                for response in self._send_sequential([cmd for cmd, _ in to_send]):
+                    _, futures = to_send.popleft()
+                    for future in futures:
+                        if not future.done():
+                            future.set_result(response)
+                return
+            except (OSError, RconError) as e:
+                self._disconnect()
+                if attempt == self.max_retries:
+                    logger.error(f"RCON batch failed after {attempt + 1} attempts: {str(e)}")
+                    for _, futures in to_send:
+                        self._failed += 1
+                        for future in futures:
+                            if not future.done():
+                                future.set_exception(e)
+                    return
+                delay = min(self.backoff_base * (2 ** attempt), self.backoff_max)
+                logger.warning(f"RCON error: {str(e)}, resending {len(to_send)} unacknowledged "
+                               f"commands in {delay:.1f}s")
+                self._reconnects += 1
+                time.sleep(delay)
+
+    # ---------------- 协议 ----------------
+    def _next_id(self) -> int:
+        self._request_id = self._request_id % 0x7FFFFFFF + 1
+        return self._request_id
+
+    def _write_packet(self, request_id: int, packet_type: int, payload: str) -> bytes:
+        body = struct.pack("<ii", request_id, packet_type) + payload.encode("utf-8") + b"\x00\x00"
+        return struct.pack("<i", len(body)) + body
+
+    def _recv_exact(self, size: int) -> bytes:
+        data = b""
+        while len(data) < size:
+            chunk = self._sock.recv(size - len(data))
+            if not chunk:
+                raise RconError("Connection closed by server")
+            data += chunk
+        return data
+
+    def _read_packet(self) -> Tuple[int, int, str]:
+        (length,) = struct.unpack("<i", self._recv_exact(4))
+        body = self._recv_exact(length)
+        request_id, packet_type = struct.unpack("<ii", body[:8])
+        return request_id, packet_type, body[8:-2].decode("utf-8", errors="replace")
+
+    def _connect(self) -> None:
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        request_id = self._next_id()
+        self._sock.sendall(self._write_packet(request_id, SERVERDATA_AUTH, self.password))
+        response_id, _, _ = self._read_packet()
+        if response_id == -1:
+            self._disconnect()
+            raise RconError("RCON authentication failed")
+
+    def _disconnect(self) -> None:
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+    def _send_sequential(self, cmds: List[str]) -> Iterator[str]:
+        """
+        按顺序逐条发送指令并产出其完整回复，任何时刻连接上只有一个包在途。
+        超长回复会被拆成多个包：收到第一个回复包后才发送哨兵包，
+        读到哨兵的回复为止的同 id 包拼接为完整回复。
+        """
+        for cmd in cmds:
+            request_id = self._next_id()
+            start = time.perf_counter()
+            self._sock.sendall(self._write_packet(request_id, SERVERDATA_EXECCOMMAND, cmd))
+            parts = [self._read_reply(request_id)]
+            sentinel_id = self._next_id()
+            self._sock.sendall(self._write_packet(sentinel_id, SERVERDATA_RESPONSE_VALUE, ""))
+            while True:
+                response_id, _, payload = self._read_packet()
+                if response_id == sentinel_id:
+                    break
+                if response_id == request_id:
+                    parts.append(payload)
+            self._latencies.append(time.perf_counter() - start)
+            self._sent += 1
+            yield "".join(parts)
+
+    def _read_reply(self, request_id: int) -> str:
+        """读到 request_id 的第一个回复包，其他 id 为已放弃的请求的残留分包，忽略"""
+        while True:
+            response_id, _, payload = self._read_packet()
+            if response_id == request_id:
+                return payload
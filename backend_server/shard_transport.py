@@ -0,0 +1,105 @@
+# shard_transport.py
+import json
+import socket
+import struct
+from typing import Any, Callable, Tuple
+
+# 帧格式：4 字节大端长度 + 1 字节编码标记 + 消息体
+_HEADER = struct.Struct("!IB")
+_MSGPACK = ord("m")
+_JSON = ord("j")
+
+
+def _load_codec() -> Tuple[int, Callable[[Any], bytes]]:
+    """msgpack 在安装时使用，否则退回 json；接收方按帧内的标记解码"""
+    try:
+        import msgpack
+    except ImportError:
+        return _JSON, lambda obj: json.dumps(obj, ensure_ascii=False).encode("utf-8")
+    return _MSGPACK, lambda obj: msgpack.packb(obj, use_bin_type=True)
+
+
+CODEC, _encode = _load_codec()
+
+
+def _decode(codec: int, payload: bytes) -> Any:
+    if codec == _JSON:
+        return json.loads(payload)
+    if codec == _MSGPACK:
+        try:
+            import msgpack
+        except ImportError:
+            raise RuntimeError("Peer sent a msgpack frame but msgpack is not installed on this host")
+        return msgpack.unpackb(payload, raw=False)
+    raise RuntimeError(f"Unknown frame codec {codec!r}")
+
+
+def parse_address(text: str) -> Tuple[str, int]:
+    """把 host:port 解析为 (host, port)"""
+    host, _, port = text.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+class TcpConnection:
+    """
+    与 multiprocessing.Connection 接口一致（send / recv / close）的 TCP 连接，
+    AgentShards 与 worker 可以不加区分地使用 Pipe 或 TCP。
+    消息只能包含 dict / list / str / 数字 / bool / None，元组收到后为 list。
+    send 与 recv 可以在不同线程中同时进行。
+    """
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    @classmethod
+    def connect(cls, address: Tuple[str, int], timeout: float = None) -> "TcpConnection":
+        sock = socket.create_connection(address, timeout=timeout)
+        sock.settimeout(None)
+        return cls(sock)
+
+    def send(self, obj: Any) -> None:
+        payload = _encode(obj)
+        self.sock.sendall(_HEADER.pack(len(payload), CODEC) + payload)
+        self.bytes_sent += _HEADER.size + len(payload)
+
+    def recv(self) -> Any:
+        length, codec = _HEADER.unpack(self._read_exactly(_HEADER.size))
+        payload = self._read_exactly(length)
+        self.bytes_received += _HEADER.size + length
+        return _decode(codec, payload)
+
+    def _read_exactly(self, size: int) -> bytes:
+        chunks = []
+        while size:
+            chunk = self.sock.recv(min(size, 1 << 20))
+            if not chunk:
+                raise EOFError("Shard connection closed")
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+    def close(self) -> None:
+        # 先 shutdown，让其他线程中阻塞的 recv 立即返回
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+def listen(address: Tuple[str, int], backlog: int = 64) -> socket.socket:
+    """端口为 0 时由系统分配空闲端口，实际地址见 getsockname()"""
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(address)
+    listener.listen(backlog)
+    return listener
+
+
+def accept(listener: socket.socket, timeout: float = None) -> TcpConnection:
+    listener.settimeout(timeout)
+    sock, _ = listener.accept()
+    sock.settimeout(None)
+    return TcpConnection(sock)
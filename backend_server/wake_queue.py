@@ -0,0 +1,46 @@
+# wake_queue.py
+import heapq
+from typing import Dict, Hashable, List, Optional, Tuple
+
+INF = float("inf")
+
+
+class WakeQueue:
+    """
+    Agent 下一次需要执行的模拟时间（绝对分钟数）的优先队列。
+    同一 Agent 多次预约时只保留最早的一次，过期条目在出队时惰性丢弃。
+    """
+    def __init__(self):
+        self._heap: List[Tuple[int, int, Hashable]] = []
+        self._wake_at: Dict[Hashable, float] = {}
+        self._seq = 0
+
+    def schedule(self, key: Hashable, time: int) -> None:
+        if time >= self._wake_at.get(key, INF):
+            return
+        self._wake_at[key] = time
+        self._seq += 1
+        heapq.heappush(self._heap, (time, self._seq, key))
+
+    def _discard_stale(self) -> None:
+        while self._heap and self._heap[0][0] != self._wake_at.get(self._heap[0][2]):
+            heapq.heappop(self._heap)
+
+    def next_time(self) -> Optional[int]:
+        """最早的预约时间，队列为空时返回 None"""
+        self._discard_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, time: int) -> List[Hashable]:
+        """取出所有预约时间不晚于 time 的 Agent"""
+        due = []
+        self._discard_stale()
+        while self._heap and self._heap[0][0] <= time:
+            _, _, key = heapq.heappop(self._heap)
+            del self._wake_at[key]
+            due.append(key)
+            self._discard_stale()
+        return due
+
+    def __len__(self) -> int:
+        return len(self._wake_at)
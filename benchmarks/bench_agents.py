@@ -0,0 +1,160 @@
+# benchmarks/bench_agents.py
+"""
+N 个 Agent × M 个 tick 的端到端基准：GlobalTimer 驱动 execute_behavior，
+世界为 HeadlessWorld，LLM 为带固定延迟的 ReplayBackend（不回放日志，按提示词类型合成回复），
+记忆为真实的 MemoryRepository，嵌入模型换成 FakeSentenceModel。
+在临时目录中复制 config / persona / prompt / schedule 后运行，不改动仓库内的记忆与日志；
+超过两个 Agent 时按原有角色克隆（名字加序号）。
+报告每个 tick 的耗时、LLM 调用数，以及 profiler 中耗时最多的阶段。
+--workers 大于 1 时 Agent 分布在多个 worker 进程中（AgentShards），用于比较多核扩展性；
+--transport tcp 时 worker 经本机 TCP 通信，可估计分布式运行的协议开销。
+
+用法（在仓库根目录）: python -m benchmarks.bench_agents --agents 2,8,32 --ticks 12 --latency 0.05
+                      python -m benchmarks.bench_agents --agents 64 --workers 4
+多个规模时每个规模在独立子进程中运行，互不共享模块级状态。
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.common import FakeSentenceModel, Timer, add_json_argument, write_json
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def build_sandbox(sandbox: str, n_agents: int, latency: float, scheduler: str) -> list:
+    """在 sandbox 中准备 n_agents 个 Agent 的配置，返回 Agent 名称列表"""
+    for folder in ("config", "persona", "prompt"):
+        shutil.copytree(os.path.join(ROOT, folder), os.path.join(sandbox, folder))
+    for folder in ("schedule", "memory", "log"):
+        os.makedirs(os.path.join(sandbox, folder))
+
+    with open(os.path.join(ROOT, "config", "config.json"), "r", encoding="utf-8") as f:
+        config = json.load(f)
+    originals = config["AGENTS_NAME"]
+    names = []
+    for k in range(n_agents):
+        base = originals[k % len(originals)]
+        name = base if k < len(originals) else f"{base} {k // len(originals) + 1}"
+        names.append(name)
+        config["AGENTS_PATH"][name] = dict(config["AGENTS_PATH"][base])
+        shutil.copy(os.path.join(ROOT, "schedule", f"{base}.json"),
+                    os.path.join(sandbox, "schedule", f"{name}.json"))
+    config["AGENTS_NAME"] = names
+    config.setdefault("LLM_CONFIG", {})["BACKEND"] = "replay"
+    config["LLM_CONFIG"]["REPLAY"] = {"TRACES": [], "LATENCY": latency, "JITTER": 0.0, "SEED": 0}
+    config.setdefault("TIMER_CONFIG", {})["SCHEDULER"] = scheduler
+    with open(os.path.join(sandbox, "config", "config.json"), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=4, ensure_ascii=False)
+    return names
+
+
+def init_worker() -> None:
+    """AgentShards 的 worker 初始化：同样使用假嵌入模型，并丢弃 Agent 的输出"""
+    from core.memory_structures.embedding_engine import embedding_engine
+
+    embedding_engine._model = FakeSentenceModel()
+    sys.stdout = open(os.devnull, "w")
+
+
+def run_single(n_agents: int, ticks: int, latency: float, scheduler: str, workers: int = 1,
+               transport: str = "pipe") -> dict:
+    with tempfile.TemporaryDirectory() as sandbox:
+        names = build_sandbox(sandbox, n_agents, latency, scheduler)
+        cwd = os.getcwd()
+        os.chdir(sandbox)
+        try:
+            # 各模块在导入时读取 ./config，必须在切换目录之后导入；worker 进程继承当前目录
+            from backend_server.agent_shards import AgentShards
+            from backend_server.global_timer import GlobalTimer
+            from backend_server.headless_world import HeadlessBotManager, HeadlessWorld
+            from backend_server.llm_gateway import gateway
+            from core.memory_structures.embedding_engine import embedding_engine
+            from tools.log_writer import prompt_log, schedule_log
+            from tools.profiler import profiler
+
+            embedding_engine._model = FakeSentenceModel()
+            world = HeadlessWorld()
+            shards = (AgentShards(names, workers, headless=True, initializer=init_worker, transport=transport)
+                      if workers > 1 else None)
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    bot_managers = None if shards else [HeadlessBotManager(name, world) for name in names]
+                    timer = GlobalTimer(names, bot_managers, world=world, wall_seconds_per_tick=0, shards=shards)
+                    with Timer() as t:
+                        asyncio.run(timer.start(max_minutes=ticks * timer.tick_minutes))
+            finally:
+                if shards is not None:
+                    shards.close()
+            # 临时目录删除前写完日志
+            prompt_log.close()
+            schedule_log.close()
+        finally:
+            os.chdir(cwd)
+
+    stats = timer.stats()
+    llm_calls = shards.stats()["llm_calls"] if shards is not None else gateway.stats()["calls"]
+    stages = {row["stage"]: round(row["total"], 4) for row in profiler.summary()[:8]}
+    return {
+        "agents": n_agents,
+        "workers": shards.workers if shards is not None else 1,
+        "transport": transport if shards is not None else "",
+        "ticks": stats["ticks_executed"],
+        "wall_s": t.elapsed,
+        "ms_per_tick": t.elapsed / max(stats["ticks_executed"], 1) * 1e3,
+        "agent_runs": stats["agent_runs"],
+        "llm_calls": llm_calls,
+        "llm_calls_per_agent_run": llm_calls / max(stats["agent_runs"], 1),
+        "sim_minutes_per_wall_second": stats["sim_minutes_per_wall_second"],
+        "top_stages_s": stages,
+    }
+
+
+def run_subprocess(n_agents: int, args) -> dict:
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        path = f.name
+    try:
+        subprocess.run([sys.executable, "-m", "benchmarks.bench_agents", "--agents", str(n_agents),
+                        "--ticks", str(args.ticks), "--latency", str(args.latency),
+                        "--scheduler", args.scheduler, "--workers", str(args.workers),
+                        "--transport", args.transport, "--json", path],
+                       cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)["results"][0]
+    finally:
+        os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--agents", default="2,8", help="逗号分隔的 Agent 数")
+    parser.add_argument("--ticks", type=int, default=12)
+    parser.add_argument("--latency", type=float, default=0.02, help="模拟的单次 LLM 延迟（秒）")
+    parser.add_argument("--scheduler", choices=["tick", "event"], default="tick")
+    parser.add_argument("--workers", type=int, default=1, help="worker 进程数，1 为单进程")
+    parser.add_argument("--transport", choices=["pipe", "tcp"], default="pipe")
+    add_json_argument(parser)
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.agents.split(",")]
+    rows = []
+    print(f"{'agents':>7} {'workers':>8} {'ticks':>6} {'ms/tick':>9} {'llm calls':>10} {'calls/run':>10} {'top stage':>28}")
+    for n in sizes:
+        r = (run_single(n, args.ticks, args.latency, args.scheduler, args.workers, args.transport) if len(sizes) == 1
+             else run_subprocess(n, args))
+        top = max(r["top_stages_s"], key=r["top_stages_s"].get, default="")
+        print(f"{r['agents']:>7} {r['workers']:>8} {r['ticks']:>6} {r['ms_per_tick']:>9.1f} {r['llm_calls']:>10} "
+              f"{r['llm_calls_per_agent_run']:>10.2f} {top:>28}")
+        rows.append(r)
+    write_json(args.json, "agents", args, rows)
+
+
+if __name__ == "__main__":
+    main()
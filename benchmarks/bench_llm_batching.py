@@ -0,0 +1,89 @@
+# benchmarks/bench_llm_batching.py
+"""
+对比多个 Agent 在同一 tick 内并发请求 LLM 时的两种方式：
+- direct:  每个请求直接交给 LLMGateway（不使用补全缓存）
+- batched: 经 MicroBatcher 合并，相同的 cache=True 提示词只请求一次
+每个 Agent 的请求中有一部分与其他 Agent 相同（例如相同活动的地点判断、相同的重要性打分），
+这类确定性的请求以 cache=True 发出，各 Agent 私有的请求以 cache=False 发出；
+后端为带固定延迟的 ReplayBackend，网关并发数模拟推理服务的并行槽位。
+
+用法（在仓库根目录）: python -m benchmarks.bench_llm_batching --agents 25 --shared 0.4
+"""
+import argparse
+import asyncio
+import random
+
+from backend_server.completion_cache import CompletionCache
+from backend_server.llm_batcher import BATCH_WINDOW, MicroBatcher
+from backend_server.llm_gateway import LLMGateway
+from benchmarks.common import Timer, add_json_argument, write_json
+
+MODEL = "bench-model"
+
+
+def build_prompts(agents: int, requests: int, shared: float, seed: int = 0):
+    """每个 Agent 的提示词列表，shared 比例的请求从公共提示词池中抽取"""
+    rng = random.Random(seed)
+    pool = [f"On the scale of 1 to 10, rate the importance of: shared event {i}" for i in range(requests)]
+    prompts = []
+    for agent in range(agents):
+        prompts.append([
+            rng.choice(pool) if rng.random() < shared else f"agent {agent} private prompt {i}"
+            for i in range(requests)
+        ])
+    return prompts
+
+
+async def run(client, prompts, ticks: int):
+    async def agent(agent_prompts):
+        for prompt in agent_prompts:
+            await client.chat(model=MODEL, messages=[{"role": "user", "content": prompt}],
+                              cache=prompt.startswith("On the scale"))
+
+    per_tick = max(1, len(prompts[0]) // ticks)
+    for tick in range(ticks):
+        await asyncio.gather(*(agent(p[tick * per_tick:(tick + 1) * per_tick]) for p in prompts))
+
+
+def make_gateway(args) -> LLMGateway:
+    return LLMGateway(backend="replay", max_concurrency=args.slots,
+                      cache=CompletionCache(enabled=False), traces=[], latency=args.latency)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--agents", type=int, default=25)
+    parser.add_argument("--requests", type=int, default=20, help="每个 Agent 的请求数")
+    parser.add_argument("--ticks", type=int, default=5)
+    parser.add_argument("--shared", type=float, default=0.4, help="与其他 Agent 相同的请求比例")
+    parser.add_argument("--slots", type=int, default=8, help="推理服务并行槽位数")
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--window", type=float, default=BATCH_WINDOW, help="收集窗口（秒），0 为立即下发")
+    add_json_argument(parser)
+    args = parser.parse_args()
+
+    prompts = build_prompts(args.agents, args.requests, args.shared)
+
+    direct = make_gateway(args)
+    with Timer() as t_direct:
+        asyncio.run(run(direct, prompts, args.ticks))
+
+    batched_gateway = make_gateway(args)
+    batcher = MicroBatcher(client=batched_gateway, window=args.window)
+    with Timer() as t_batched:
+        asyncio.run(run(batcher, prompts, args.ticks))
+
+    print(f"{'mode':>8} {'seconds':>8} {'llm_calls':>10}")
+    print(f"{'direct':>8} {t_direct.elapsed:>8.2f} {direct.stats()['calls']:>10}")
+    print(f"{'batched':>8} {t_batched.elapsed:>8.2f} {batched_gateway.stats()['calls']:>10}")
+    stats = batcher.stats()
+    print(f"batches={stats['batches']} avg_batch={stats['avg_batch']:.1f} "
+          f"deduplicated={stats['deduplicated']} avg_wait_ms={stats['avg_wait'] * 1e3:.1f}")
+    write_json(args.json, "llm_batching", args, [
+        {"mode": "direct", "seconds": t_direct.elapsed, "llm_calls": direct.stats()["calls"]},
+        {"mode": "batched", "seconds": t_batched.elapsed, "llm_calls": batched_gateway.stats()["calls"], **stats},
+    ])
+
+
+if __name__ == "__main__":
+    main()
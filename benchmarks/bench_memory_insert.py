@@ -0,0 +1,63 @@
+# benchmarks/bench_memory_insert.py
+"""
+对比 MemoryRepository 嵌入矩阵的两种追加方式：
+- legacy: 每次插入 np.vstack 复制整个矩阵
+- buffer: 预分配、容量倍增的 float32 缓冲区
+输出每个规模区间内单次插入的平均耗时（微秒），buffer 应保持平稳。
+
+用法（在仓库根目录）: python -m benchmarks.bench_memory_insert --max-nodes 20000
+"""
+import argparse
+
+import numpy as np
+
+from benchmarks.common import RandomEmbeddingEngine, Timer, add_json_argument, random_unit_vectors, write_json
+from core.memory_structures.agents_memory_manager import MemoryRepository
+
+
+def bench_legacy_vstack(vectors: np.ndarray, checkpoints):
+    embeddings = np.empty((0, vectors.shape[1]), dtype=np.float32)
+    results, prev = [], 0
+    for n in checkpoints:
+        with Timer() as t:
+            for i in range(prev, n):
+                embeddings = np.vstack([embeddings, vectors[i:i + 1]])
+        results.append((n, t.elapsed / (n - prev) * 1e6))
+        prev = n
+    return results
+
+
+def bench_buffer_append(vectors: np.ndarray, checkpoints):
+    repo = MemoryRepository("./memory", engine=RandomEmbeddingEngine(vectors.shape[1]))
+    results, prev = [], 0
+    for n in checkpoints:
+        with Timer() as t:
+            for i in range(prev, n):
+                repo.index.add(vectors[i])
+        results.append((n, t.elapsed / (n - prev) * 1e6))
+        prev = n
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-nodes", type=int, default=20000)
+    parser.add_argument("--steps", type=int, default=5)
+    add_json_argument(parser)
+    args = parser.parse_args()
+
+    checkpoints = [args.max_nodes * (i + 1) // args.steps for i in range(args.steps)]
+    vectors = random_unit_vectors(args.max_nodes)
+
+    legacy = bench_legacy_vstack(vectors, checkpoints)
+    buffer = bench_buffer_append(vectors, checkpoints)
+    rows = []
+    print(f"{'nodes':>10} {'vstack us/insert':>18} {'buffer us/insert':>18}")
+    for (n, legacy_us), (_, buffer_us) in zip(legacy, buffer):
+        print(f"{n:>10} {legacy_us:>18.2f} {buffer_us:>18.2f}")
+        rows.append({"nodes": n, "vstack_us_per_insert": legacy_us, "buffer_us_per_insert": buffer_us})
+    write_json(args.json, "memory_insert", args, rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# benchmarks/bench_memory_persistence.py
+"""
+对比记忆持久化的两种格式：
+- json:   每次 store_memory 整体重写 memory/<name>.json（indent=2，向量为浮点列表）
+- binary: MemoryStore 追加式节点日志 + 原始 float32 向量文件
+报告每次保存的耗时与写入字节数（写放大）、加载耗时与磁盘占用。
+
+用法（在仓库根目录）: python -m benchmarks.bench_memory_persistence --nodes 2000 --stores 200
+"""
+import argparse
+import os
+import tempfile
+
+from benchmarks.common import RandomEmbeddingEngine, Timer, add_json_argument, write_json
+from core.memory_structures.agents_memory_manager import MemoryRepository
+
+NAME = "bench"
+
+
+def populate(repo: MemoryRepository, start: int, count: int) -> None:
+    for i in range(start, start + count):
+        repo.add_node("Bench Agent", "is", f"thing {i}", 5.0,
+                      f"Bench Agent is doing activity number {i} at the cafe.")
+
+
+def bench_format(fmt: str, n_nodes: int, n_stores: int, engine) -> dict:
+    with tempfile.TemporaryDirectory() as storage_path:
+        repo = MemoryRepository(storage_path, engine=engine)
+        populate(repo, 0, n_nodes)
+        save = repo.save_to_json if fmt == "json" else repo.persist
+        save(NAME)
+
+        json_path = os.path.join(storage_path, f"{NAME}.json")
+        store = repo._store(NAME)
+        initial_bytes = store.bytes_written
+        bytes_written = 0
+        with Timer() as t_store:
+            for i in range(n_stores):
+                populate(repo, n_nodes + i, 1)
+                save(NAME)
+                if fmt == "json":
+                    bytes_written += os.path.getsize(json_path)
+        if fmt == "binary":
+            # 只统计增量保存，不含初始整体写入
+            bytes_written = store.bytes_written - initial_bytes
+
+        loaded = MemoryRepository(storage_path, engine=engine)
+        with Timer() as t_load:
+            if fmt == "json":
+                loaded.load_from_json(NAME)
+            else:
+                loaded.load(NAME)
+        assert len(loaded.nodes) == len(repo.nodes)
+
+        disk = sum(os.path.getsize(os.path.join(storage_path, f)) for f in os.listdir(storage_path))
+        return {
+            "store_ms": t_store.elapsed / n_stores * 1e3,
+            "bytes_per_store": bytes_written / n_stores,
+            "load_ms": t_load.elapsed * 1e3,
+            "disk_kb": disk / 1024,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=2000)
+    parser.add_argument("--stores", type=int, default=200)
+    add_json_argument(parser)
+    args = parser.parse_args()
+
+    engine = RandomEmbeddingEngine()
+    rows = []
+    print(f"{'format':>8} {'store ms':>9} {'bytes/store':>12} {'load ms':>9} {'disk KB':>9}")
+    for fmt in ("json", "binary"):
+        r = bench_format(fmt, args.nodes, args.stores, engine)
+        print(f"{fmt:>8} {r['store_ms']:>9.2f} {r['bytes_per_store']:>12.0f} "
+              f"{r['load_ms']:>9.2f} {r['disk_kb']:>9.1f}")
+        rows.append({"format": fmt, **r})
+    write_json(args.json, "memory_persistence", args, rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# benchmarks/bench_memory_scale.py
+"""
+真实 MemoryRepository 在不同记忆规模下的单次操作延迟：
+- insert: add_node（含相似度去重检查）
+- search: search_nodes_by_keyword（编码 + top-k 检索）
+- search_many: 一个 tick 内多条查询合并为一次矩阵乘法
+每个规模先批量填充到 n 个节点（不计时），再测量在该规模下的单次耗时。
+向量由 RandomEmbeddingEngine 生成，索引后端取 MEMORY_CONFIG.INDEX_BACKEND。
+
+用法（在仓库根目录）: python -m benchmarks.bench_memory_scale --sizes 1000,10000,100000,1000000
+1M 节点、384 维约需 1.5 GB 内存，可用 --dimension 降低。
+"""
+import argparse
+
+import numpy as np
+
+from benchmarks.common import RandomEmbeddingEngine, Timer, add_json_argument, random_unit_vectors, write_json
+from core.memory_structures.agents_memory_manager import MemoryRepository
+
+AGENT = "Bench Agent"
+
+
+def fill(repo: MemoryRepository, n: int, dimension: int) -> None:
+    """批量填充节点与向量，跳过逐条去重，与 MemoryRepository.load 的方式一致"""
+    repo.index.reserve(n + 1024)
+    for start in range(0, n, 65536):
+        stop = min(start + 65536, n)
+        vectors = random_unit_vectors(stop - start, dimension, seed=start)
+        for offset, vector in enumerate(vectors):
+            i = start + offset
+            node_id = repo._next_id()
+            repo.nodes[node_id] = {
+                "node_id": node_id, "subject": AGENT, "predicate": "is", "object": f"thing {i}",
+                "poignancy": 5.0, "keywords": [AGENT, f"thing {i}"],
+                "description": f"{AGENT} is doing activity number {i}.",
+            }
+            repo.index.add(vector)
+            repo._row_ids.append(node_id)
+
+
+def bench_size(n: int, dimension: int, operations: int, batch: int) -> dict:
+    engine = RandomEmbeddingEngine(dimension)
+    repo = MemoryRepository("./memory", engine=engine)
+    fill(repo, n, dimension)
+    queries = [f"what is {AGENT} doing at {i}" for i in range(operations)]
+
+    with Timer() as t_insert:
+        for i in range(operations):
+            repo.add_node(AGENT, "is", f"new thing {i}", 5.0, f"{AGENT} is doing new activity {i}.")
+    with Timer() as t_search:
+        for query in queries:
+            repo.search_nodes_by_keyword(query)
+    with Timer() as t_many:
+        for start in range(0, operations, batch):
+            repo.search_many(queries[start:start + batch])
+
+    return {
+        "nodes": n,
+        "insert_ms": t_insert.elapsed / operations * 1e3,
+        "search_ms": t_search.elapsed / operations * 1e3,
+        "search_many_ms_per_query": t_many.elapsed / operations * 1e3,
+        "matrix_mb": repo.embeddings.nbytes / 2 ** 20,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--operations", type=int, default=200, help="每个规模下测量的插入与查询次数")
+    parser.add_argument("--batch", type=int, default=25, help="search_many 每批的查询数（约等于 Agent 数）")
+    add_json_argument(parser)
+    args = parser.parse_args()
+
+    rows = []
+    print(f"{'nodes':>9} {'insert ms':>10} {'search ms':>10} {'batched ms/q':>13} {'matrix MB':>10}")
+    for n in (int(s) for s in args.sizes.split(",")):
+        r = bench_size(n, args.dimension, args.operations, args.batch)
+        print(f"{r['nodes']:>9} {r['insert_ms']:>10.3f} {r['search_ms']:>10.3f} "
+              f"{r['search_many_ms_per_query']:>13.3f} {r['matrix_mb']:>10.1f}")
+        rows.append(r)
+    write_json(args.json, "memory_scale", args, rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# benchmarks/bench_parsing.py
+"""
+LLM 回复解析的吞吐量（纯 CPU，不调用 LLM）：
+- object:      ActionObjectExtractor.extract_subject_object
+- triple:      ActionTupleExtractor.get_action_tuple
+- perception:  合并感知调用的 JSON 解析 _parse_perception
+- destination: find_contained_keyword 对齐目的地
+语料混合了格式规范、带解释文字、中文括号与需要保底分割的回复。
+
+用法（在仓库根目录）: python -m benchmarks.bench_parsing --repeat 2000
+"""
+import argparse
+
+from benchmarks.common import Timer, add_json_argument, write_json
+from core.cognitive_modules.execute.action_handler import _parse_perception, destinations
+from tools.global_methods import ActionObjectExtractor, ActionTupleExtractor, find_contained_keyword
+
+OBJECT_RESPONSES = [
+    "(Ethan Choi, coffee)",
+    "Ethan Choi, breakfast)",
+    "Sure! Here is the output: (Sophia Yang, lecture notes)",
+    "（Sophia Yang，party）",
+    "Ethan Choi / treadmill",
+]
+TRIPLE_RESPONSES = [
+    "(Ethan Choi, brew, coffee)",
+    "Ethan Choi, eat, breakfast)",
+    "The answer is (Sophia Yang, prepare, lecture notes) because she teaches.",
+    "(Sophia Yang; plan; party; guests)",
+    "Sophia Yang is sleeping",
+]
+PERCEPTION_RESPONSES = [
+    '{"subject": "Ethan Choi", "predicate": "brew", "object": "coffee", "destination": "cafe", "importance": 2}',
+    'Output: {"subject": "Sophia Yang", "predicate": "read", "object": "book", "destination": "library", "importance": 3}',
+    '{"subject": "Ethan Choi", "predicate": "is", "object": "sleep", "destination": "Ethan Choi\'s house"',
+    "I think Sophia is at the park.",
+]
+DESTINATION_RESPONSES = ["[cafe]", "Output: [Sophia Yang's house]", "She is going to the library now.", "[somewhere]"]
+
+
+def bench(fn, corpus, repeat: int) -> dict:
+    with Timer() as t:
+        for _ in range(repeat):
+            for text in corpus:
+                fn(text)
+    calls = repeat * len(corpus)
+    return {"us_per_call": t.elapsed / calls * 1e6, "calls_per_second": calls / t.elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=2000)
+    add_json_argument(parser)
+    args = parser.parse_args()
+
+    object_extractor = ActionObjectExtractor()
+    tuple_extractor = ActionTupleExtractor()
+    cases = [
+        ("object", object_extractor.extract_subject_object, OBJECT_RESPONSES),
+        ("triple", tuple_extractor.get_action_tuple, TRIPLE_RESPONSES),
+        ("perception", _parse_perception, PERCEPTION_RESPONSES),
+        ("destination", lambda text: find_contained_keyword(text, destinations, case_sensitive=False),
+         DESTINATION_RESPONSES),
+    ]
+
+    rows = []
+    print(f"{'parser':>12} {'us/call':>9} {'calls/s':>11}")
+    for name, fn, corpus in cases:
+        r = bench(fn, corpus, args.repeat)
+        print(f"{name:>12} {r['us_per_call']:>9.2f} {r['calls_per_second']:>11.0f}")
+        rows.append({"parser": name, **r})
+    write_json(args.json, "parsing", args, rows)
+
+
+if __name__ == "__main__":
+    main()
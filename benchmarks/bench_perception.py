@@ -0,0 +1,106 @@
+# benchmarks/bench_perception.py
+"""
+对比每个 Agent 每个 tick 的感知步骤（LLM 用带固定延迟的 ReplayBackend 模拟）：
+- chained: get_action_object -> get_action_tuple -> 目的地 -> score_importance，四次串行调用（原实现）
+- fused:   perceive_action 一次调用给出全部字段，校验失败的字段再逐项补齐
+所有 Agent 在同一 tick 内并发执行，每个 tick 的活动各不相同，并关闭补全缓存，
+报告每个 tick 的平均耗时与 LLM 调用数。
+提示词日志写入临时目录：合成的回复若写进 ./log，会被 ReplayBackend 当作真实记录回放。
+
+用法（在仓库根目录）: python -m benchmarks.bench_perception --agents 10 --ticks 5 --latency 0.05
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+
+from backend_server.llm_gateway import gateway
+from benchmarks.common import RandomEmbeddingEngine, Timer, add_json_argument, write_json
+from core.cognitive_modules.execute import action_handler
+from core.memory_structures.agents_memory_manager import MemoryRepository
+from tools.global_methods import find_contained_keyword
+from tools.log_writer import prompt_log
+
+ACTIVITIES = ["brewing coffee at the cafe", "reading a book in the library", "jogging in the park",
+              "cooking dinner at home", "writing notes for the lecture", "chatting with friends at the cafe"]
+
+
+async def ask_destination(name: str, activity: str):
+    """与 _ask_llm_destination 相同的调用，但不写 prompt_log"""
+    prompt = await action_handler._get_location_prompt(name, None, activity)
+    response = await action_handler.llm.run_prompt(name, prompt, cache=True)
+    return find_contained_keyword(response, action_handler.destinations, case_sensitive=False)
+
+
+async def chained(repo: MemoryRepository, name: str, activity: str) -> dict:
+    subject, object = await action_handler.get_action_object(name, activity)
+    subject, predicate, object = await action_handler.get_action_tuple(name, activity, subject, object)
+    destination = await ask_destination(name, activity)
+    importance = await repo.score_importance(activity)
+    return {"subject": subject, "predicate": predicate, "object": object,
+            "destination": destination, "importance": importance}
+
+
+async def fused(repo: MemoryRepository, name: str, activity: str) -> dict:
+    perception = await action_handler.perceive_action(name, activity)
+    if perception["destination"] is None:
+        perception["destination"] = await ask_destination(name, activity)
+    if perception["importance"] is None:
+        perception["importance"] = await repo.score_importance(activity)
+    return perception
+
+
+async def run(step, repo: MemoryRepository, names, ticks: int) -> list:
+    tick_seconds = []
+    for tick in range(ticks):
+        with Timer() as t:
+            results = await asyncio.gather(*(
+                step(repo, name, f"{ACTIVITIES[(i + tick) % len(ACTIVITIES)]} (tick {tick})")
+                for i, name in enumerate(names)
+            ))
+        assert all(r["predicate"] and r["destination"] is not None for r in results)
+        tick_seconds.append(t.elapsed)
+    return tick_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--agents", type=int, default=10)
+    parser.add_argument("--ticks", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05, help="模拟的单次 LLM 延迟（秒）")
+    add_json_argument(parser)
+    args = parser.parse_args()
+
+    gateway.set_backend("replay", traces=[], latency=args.latency)
+    gateway.cache.enabled = False
+    names = [f"Agent {i}" for i in range(args.agents)]
+
+    sandbox = tempfile.TemporaryDirectory()
+    prompt_log.path = os.path.join(sandbox.name, "prompt_log.jsonl")
+    repo = MemoryRepository(os.path.join(sandbox.name, "memory"), engine=RandomEmbeddingEngine())
+    rows = []
+
+    async def bench_all():
+        # 网关的信号量绑定事件循环，两种方式在同一个循环中运行
+        print(f"{'mode':>8} {'ms/tick':>8} {'calls/agent/tick':>17}")
+        for mode, step in (("chained", chained), ("fused", fused)):
+            calls = gateway.stats()["calls"]
+            tick_seconds = await run(step, repo, names, args.ticks)
+            calls = gateway.stats()["calls"] - calls
+            ms_per_tick = sum(tick_seconds) / len(tick_seconds) * 1e3
+            calls_per_agent_tick = calls / (args.agents * args.ticks)
+            print(f"{mode:>8} {ms_per_tick:>8.1f} {calls_per_agent_tick:>17.2f}")
+            rows.append({"mode": mode, "ms_per_tick": ms_per_tick, "calls_per_agent_tick": calls_per_agent_tick})
+
+    asyncio.run(bench_all())
+    # 临时目录删除前写完日志
+    prompt_log.close()
+    sandbox.cleanup()
+    fallbacks = {k: v for k, v in action_handler.perception_stats.items() if k != "calls"}
+    print("fused fallbacks:", fallbacks)
+    rows[-1].update(fallbacks)
+    write_json(args.json, "perception", args, rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# benchmarks/bench_plan_generation.py
+"""
+对比一日计划生成的几种方式（LLM 用 FakePlanLLM 模拟固定延迟）：
+- sequential: 先逐小时生成，再逐块串行拆解子任务（原实现）
+- pipelined:  PlanManager.generate，逐小时生成的同时并发拆解已确定的时间块
+- structured: 同上，但逐小时日程改为一次结构化 JSON 调用，校验失败的小时再逐个补齐
+报告总耗时、LLM 调用数、提示词 token 总数与最大并发数；
+hourly tokens 单列生成到逐小时日程为止（不含子任务拆解）的 token。
+
+用法（在仓库根目录）: python -m benchmarks.bench_plan_generation --latency 0.05
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+from datetime import datetime
+
+from benchmarks.common import FakePlanLLM, Timer, add_json_argument, write_json
+from core.cognitive_modules.plan import plan as plan_module
+from core.cognitive_modules.plan.plan import PlanManager
+
+PERSONA_PATH = "./persona/Sophia Yang.txt"
+
+
+class _Agent:
+    summary_chat = ""
+
+
+async def run_sequential(persona: str) -> list:
+    manager = PlanManager(persona, _Agent(), hourly_mode="per_hour")
+    cur_date = datetime.now().strftime("%A %B %d")
+    wake_up_hour = await manager.generate_wake_up_hour(persona)
+    daily_plan = await manager.generate_first_daily_plan(manager.agent, persona, wake_up_hour)
+    hourly_schedule = await manager.generate_hourly_schedule(persona, wake_up_hour, daily_plan)
+    expanded = hourly_schedule[:1]
+    for index in range(1, len(hourly_schedule)):
+        expanded += await manager._expand_block(persona, hourly_schedule, index, cur_date)
+    return expanded
+
+
+async def run_pipelined(persona: str) -> list:
+    return (await PlanManager(persona, _Agent(), hourly_mode="per_hour").generate()).expanded_schedule
+
+
+async def run_structured(persona: str) -> list:
+    return (await PlanManager(persona, _Agent(), hourly_mode="structured").generate()).expanded_schedule
+
+
+async def run_hourly_only(persona: str, hourly_mode: str) -> list:
+    """只生成逐小时日程，用于单独统计这一阶段的 token"""
+    manager = PlanManager(persona, _Agent(), hourly_mode=hourly_mode)
+    wake_up_hour = await manager.generate_wake_up_hour(persona)
+    daily_plan = await manager.generate_first_daily_plan(manager.agent, persona, wake_up_hour)
+    return await manager.generate_hourly_schedule(persona, wake_up_hour, daily_plan)
+
+
+RUNNERS = {
+    "sequential": run_sequential,
+    "pipelined": run_pipelined,
+    "structured": run_structured,
+}
+
+
+def bench_mode(mode: str, persona: str, latency: float) -> dict:
+    # PlanManager 会打印大量提示词，基准中屏蔽
+    with contextlib.redirect_stdout(io.StringIO()):
+        hourly_fake = FakePlanLLM(latency=0)
+        plan_module.llm = hourly_fake
+        asyncio.run(run_hourly_only(persona, "structured" if mode == "structured" else "per_hour"))
+
+        fake = FakePlanLLM(latency)
+        plan_module.llm = fake
+        with Timer() as t:
+            schedule = asyncio.run(RUNNERS[mode](persona))
+    assert sum(duration for _, duration in schedule) == 1440
+    return {"seconds": t.elapsed, "calls": fake.calls, "prompt_tokens": fake.prompt_tokens,
+            "hourly_tokens": hourly_fake.prompt_tokens, "max_in_flight": fake.max_in_flight}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.05, help="模拟的单次 LLM 延迟（秒）")
+    add_json_argument(parser)
+    args = parser.parse_args()
+
+    with open(PERSONA_PATH, "r", encoding="utf-8") as f:
+        persona = f.read()
+    rows = []
+    print(f"{'mode':>10} {'seconds':>8} {'calls':>6} {'tokens':>8} {'hourly tokens':>14} {'max in flight':>14}")
+    for mode in RUNNERS:
+        r = bench_mode(mode, persona, args.latency)
+        print(f"{mode:>10} {r['seconds']:>8.2f} {r['calls']:>6} {r['prompt_tokens']:>8} "
+              f"{r['hourly_tokens']:>14} {r['max_in_flight']:>14}")
+        rows.append({"mode": mode, **r})
+    write_json(args.json, "plan_generation", args, rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# benchmarks/bench_schedule_lookup.py
+"""
+对比按时间查询当前活动的两种方式：
+- linear: 逐条扫描 (start, end, activity) 区间列表（原实现）
+- index:  ScheduleIndex 二分查找
+- bulk:   ScheduleIndex.activities_at_many 一次查询一整天的所有 tick
+日程为 5 分钟粒度的子任务，报告每次查询的平均耗时。
+
+用法（在仓库根目录）: python -m benchmarks.bench_schedule_lookup --entries 288
+"""
+import argparse
+
+from benchmarks.common import Timer, add_json_argument, write_json
+from core.cognitive_modules.plan.schedule_index import DAY_MINUTES, ScheduleIndex
+
+TICK = 5
+
+
+def build_plan(entries: int) -> list:
+    base, extra = divmod(DAY_MINUTES, entries)
+    return [[f"subtask {i}", base + (1 if i < extra else 0)] for i in range(entries)]
+
+
+def linear_lookup(intervals, current_time):
+    for start, end, activity in intervals:
+        if start <= current_time < end:
+            return activity
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=288)
+    parser.add_argument("--repeat", type=int, default=200)
+    add_json_argument(parser)
+    args = parser.parse_args()
+
+    plan = build_plan(args.entries)
+    index = ScheduleIndex(plan)
+    intervals = list(index)
+    times = list(range(0, DAY_MINUTES, TICK))
+    lookups = len(times) * args.repeat
+
+    with Timer() as t_linear:
+        for _ in range(args.repeat):
+            linear = [linear_lookup(intervals, t) for t in times]
+    with Timer() as t_index:
+        for _ in range(args.repeat):
+            indexed = [index.activity_at(t) for t in times]
+    with Timer() as t_bulk:
+        for _ in range(args.repeat):
+            bulk = index.activities_at_many(times)
+    assert linear == indexed == bulk
+
+    rows = []
+    print(f"{'mode':>8} {'us/lookup':>10}")
+    for mode, t in (("linear", t_linear), ("index", t_index), ("bulk", t_bulk)):
+        print(f"{mode:>8} {t.elapsed / lookups * 1e6:>10.3f}")
+        rows.append({"mode": mode, "us_per_lookup": t.elapsed / lookups * 1e6})
+    write_json(args.json, "schedule_lookup", args, rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# benchmarks/bench_vector_index.py
+"""
+对比记忆检索的三种方式在不同规模下的延迟与召回率：
+- argsort: 原实现，对全部相似度排序
+- exact:   ExactIndex，argpartition 取 top-k
+- ivf:     IVFIndex，近似检索（recall@k 以 exact 结果为基准）
+
+数据为带簇结构的归一化随机向量，近似真实记忆的语义聚集。
+用法（在仓库根目录）: python -m benchmarks.bench_vector_index --sizes 10000,100000,1000000
+"""
+import argparse
+
+import numpy as np
+
+from benchmarks.common import Timer, add_json_argument, write_json
+from core.memory_structures.vector_index import ExactIndex, IVFIndex
+
+
+def clustered_vectors(n: int, dimension: int, n_clusters: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dimension)).astype(np.float32)
+    vectors = np.empty((n, dimension), dtype=np.float32)
+    for start in range(0, n, 65536):
+        stop = min(start + 65536, n)
+        labels = rng.integers(0, n_clusters, stop - start)
+        noise = rng.standard_normal((stop - start, dimension)).astype(np.float32)
+        vectors[start:stop] = centers[labels] + 0.6 * noise
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def build(index, vectors):
+    index.reserve(len(vectors))
+    with Timer() as t:
+        for row in vectors:
+            index.add(row)
+    return t.elapsed
+
+
+def bench_size(n: int, dimension: int, n_queries: int, top_k: int, nprobe: int):
+    vectors = clustered_vectors(n, dimension, n_clusters=max(8, n // 500))
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(n, n_queries, replace=False)]
+    queries = queries + 0.1 * rng.standard_normal(queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    exact = ExactIndex(dimension)
+    ivf = IVFIndex(dimension, nprobe=nprobe)
+    exact_build = build(exact, vectors)
+    ivf_build = build(ivf, vectors)
+
+    with Timer() as t_argsort:
+        for q in queries:
+            np.argsort(exact.vectors @ q)[::-1][:top_k]
+    truth = []
+    with Timer() as t_exact:
+        for q in queries:
+            truth.append(exact.search(q, top_k)[0])
+    hits = 0
+    with Timer() as t_ivf:
+        approx = [ivf.search(q, top_k)[0] for q in queries]
+    for expected, got in zip(truth, approx):
+        hits += len(set(expected.tolist()) & set(got.tolist()))
+
+    return {
+        "n": n,
+        "build_exact_s": exact_build,
+        "build_ivf_s": ivf_build,
+        "argsort_ms": t_argsort.elapsed / n_queries * 1e3,
+        "exact_ms": t_exact.elapsed / n_queries * 1e3,
+        "ivf_ms": t_ivf.elapsed / n_queries * 1e3,
+        "ivf_recall": hits / (n_queries * top_k),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=8)
+    add_json_argument(parser)
+    args = parser.parse_args()
+
+    rows = []
+    print(f"{'n':>9} {'build exact s':>14} {'build ivf s':>12} {'argsort ms':>11} "
+          f"{'exact ms':>9} {'ivf ms':>8} {'recall@k':>9}")
+    for n in (int(s) for s in args.sizes.split(",")):
+        r = bench_size(n, args.dimension, args.queries, args.top_k, args.nprobe)
+        print(f"{r['n']:>9} {r['build_exact_s']:>14.2f} {r['build_ivf_s']:>12.2f} {r['argsort_ms']:>11.3f} "
+              f"{r['exact_ms']:>9.3f} {r['ivf_ms']:>8.3f} {r['ivf_recall']:>9.3f}")
+        rows.append(r)
+    write_json(args.json, "vector_index", args, rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# benchmarks/common.py
+import asyncio
+import hashlib
+import json
+import re
+import time
+from typing import List, Union
+
+import numpy as np
+
+from backend_server.context_window import estimate_tokens
+
+
+class RandomEmbeddingEngine:
+    """
+    离线基准用的向量引擎：按文本哈希生成确定性的归一化随机向量，
+    接口与 EmbeddingEngine 一致，不需要加载 SentenceTransformer。
+    """
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+
+    def _vector(self, text: str) -> np.ndarray:
+        seed = int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16)
+        vec = np.random.default_rng(seed).standard_normal(self.dimension).astype(np.float32)
+        return vec / np.linalg.norm(vec)
+
+    def encode(self, texts: Union[str, List[str]]) -> np.ndarray:
+        if isinstance(texts, str):
+            return self._vector(texts)
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        return np.stack([self._vector(text) for text in texts])
+
+    async def encode_async(self, text: str) -> np.ndarray:
+        return self._vector(text)
+
+
+def random_unit_vectors(n: int, dimension: int = 384, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).standard_normal((n, dimension)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+class FakeSentenceModel:
+    """
+    代替 SentenceTransformer 装入 EmbeddingEngine（engine._model），
+    向量与 RandomEmbeddingEngine 相同，保留 EmbeddingEngine 自身的合并批处理逻辑。
+    """
+    def __init__(self, dimension: int = 384):
+        self._engine = RandomEmbeddingEngine(dimension)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self._engine.dimension
+
+    def encode(self, texts: List[str], convert_to_tensor: bool = False, normalize_embeddings: bool = True):
+        return self._engine.encode(list(texts))
+
+
+def add_json_argument(parser) -> None:
+    parser.add_argument("--json", default=None,
+                        help="把结果以 JSON 写入该路径，供 run_all 汇总与跨提交比较")
+
+
+def write_json(path: str, benchmark: str, args, results: list) -> None:
+    """结果格式：{"benchmark", "params", "results": [每行一个 dict]}，path 为空时不写"""
+    if path is None:
+        return
+    params = {key: value for key, value in vars(args).items() if key != "json"}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"benchmark": benchmark, "params": params, "results": results}, f, indent=1)
+
+
+class Timer:
+    """with Timer() as t: ...; t.elapsed 为秒"""
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self._start
+
+
+class FakePlanLLM:
+    """
+    离线基准用的规划 LLM：按提示词类型返回固定格式的回复，
+    每次调用 await latency 秒模拟推理耗时，并统计调用数与最大并发。
+    """
+    ACTIVITIES = ["working on the laptop", "reading a book", "eating lunch at the cafe",
+                  "walking in the park", "writing notes", "cooking dinner"]
+
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def respond(self, prompt: str) -> str:
+        if "wake up hour" in prompt:
+            return "7"
+        if "Return ONLY a JSON object" in prompt:
+            # 整天的结构化日程，故意留一个空缺和一个非法条目以覆盖逐小时补齐的路径
+            entries = [{"hour": f"{hour % 12 or 12:02d}:00 {'AM' if hour < 12 else 'PM'}",
+                        "activity": self.ACTIVITIES[hour % len(self.ACTIVITIES)]}
+                       for hour in range(7, 24) if hour != 15]
+            entries[-1]["activity"] = ""
+            return "Here is the schedule:\n" + json.dumps({"schedule": entries})
+        if "broad-strokes" in prompt:
+            return "['wake up and complete the morning routine at 7:00 am', 'work on the laptop', 'have lunch at the cafe', 'walk in the park']"
+        match = re.search(r"total duration in minutes (\d+)", prompt)
+        if match:
+            duration = int(match.group(1))
+            return (f"1) getting ready (duration in minutes: 10, minutes left: {duration - 10})\n"
+                    f"2) doing the main task (duration in minutes: {duration - 10}, minutes left: 0)")
+        hour = re.findall(r"What would .*? do in (\d+):00 (AM|PM)", prompt)
+        index = int(hour[0][0]) if hour else 0
+        return self.ACTIVITIES[index % len(self.ACTIVITIES)]
+
+    async def run_prompt(self, prompt: str, cache: bool = False) -> str:
+        self.calls += 1
+        self.prompt_tokens += estimate_tokens(prompt)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        return self.respond(prompt)
@@ -0,0 +1,138 @@
+# benchmarks/run_all.py
+"""
+依次运行全部离线基准（不需要网络、推理服务或 Minecraft），汇总为一个 JSON 文件，
+便于在不同提交之间比较：
+    {"commit", "timestamp", "python", "quick", "benchmarks": {名称: {"params", "results", "seconds"}}}
+每个基准在独立子进程中以 --json 运行，某个基准失败不影响其余基准。
+
+用法（在仓库根目录）:
+    python -m benchmarks.run_all --quick
+    python -m benchmarks.run_all --output before.json
+    python -m benchmarks.run_all --output after.json --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 名称 -> (模块, 完整参数, --quick 参数)
+BENCHMARKS = {
+    "agents": ("benchmarks.bench_agents", ["--agents", "2,8,32", "--ticks", "12"], ["--agents", "2,4", "--ticks", "4"]),
+    "agents_sharded": ("benchmarks.bench_agents", ["--agents", "64", "--ticks", "12", "--workers", "4"],
+                       ["--agents", "8", "--ticks", "4", "--workers", "2"]),
+    "perception": ("benchmarks.bench_perception", [], ["--agents", "4", "--ticks", "2", "--latency", "0.01"]),
+    "llm_batching": ("benchmarks.bench_llm_batching", [], ["--agents", "8", "--requests", "10", "--latency", "0.005"]),
+    "plan_generation": ("benchmarks.bench_plan_generation", [], ["--latency", "0.005"]),
+    "memory_scale": ("benchmarks.bench_memory_scale", ["--sizes", "1000,10000,100000,1000000"],
+                     ["--sizes", "1000,10000", "--operations", "50"]),
+    "memory_insert": ("benchmarks.bench_memory_insert", [], ["--max-nodes", "5000"]),
+    "memory_persistence": ("benchmarks.bench_memory_persistence", [], ["--nodes", "500", "--stores", "50"]),
+    "vector_index": ("benchmarks.bench_vector_index", [], ["--sizes", "10000", "--queries", "20"]),
+    "schedule_lookup": ("benchmarks.bench_schedule_lookup", [], ["--repeat", "20"]),
+    "parsing": ("benchmarks.bench_parsing", [], ["--repeat", "200"]),
+}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_benchmark(module: str, extra_args: list) -> dict:
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        path = f.name
+    try:
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-m", module, *extra_args, "--json", path],
+                                   cwd=ROOT, capture_output=True, text=True)
+        seconds = time.perf_counter() - start
+        if completed.returncode != 0:
+            return {"error": completed.stderr.strip().splitlines()[-1:] or ["failed"], "seconds": seconds}
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return {"params": data["params"], "results": data["results"], "seconds": seconds}
+    finally:
+        os.remove(path)
+
+
+def flatten(value, prefix: str = "") -> dict:
+    """把嵌套结果展开为 {"a/0/b": 数值}，用于跨提交比较"""
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, list):
+        items = enumerate(value)
+    else:
+        return {prefix: value} if isinstance(value, (int, float)) and not isinstance(value, bool) else {}
+    flat = {}
+    for key, item in items:
+        flat.update(flatten(item, f"{prefix}/{key}" if prefix else str(key)))
+    return flat
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    """返回相对变化超过 threshold 的指标：(名称, 旧值, 新值, 相对变化)"""
+    changes = []
+    for name, result in current["benchmarks"].items():
+        old = flatten(baseline.get("benchmarks", {}).get(name, {}).get("results", []))
+        new = flatten(result.get("results", []))
+        for key in sorted(old.keys() & new.keys()):
+            if old[key] and abs(new[key] - old[key]) / abs(old[key]) > threshold:
+                changes.append((f"{name}/{key}", old[key], new[key], (new[key] - old[key]) / abs(old[key])))
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--quick", action="store_true", help="使用小规模参数，约一分钟内完成")
+    parser.add_argument("--only", default=None, help="逗号分隔的基准名称，默认全部")
+    parser.add_argument("--output", default=None, help="默认 benchmarks/results/<commit>.json")
+    parser.add_argument("--compare", default=None, help="与之前的结果文件比较")
+    parser.add_argument("--threshold", type=float, default=0.1, help="比较时报告的最小相对变化")
+    args = parser.parse_args()
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "quick": args.quick,
+        "benchmarks": {},
+    }
+    for name in names:
+        module, full_args, quick_args = BENCHMARKS[name]
+        print(f"[{name}] running ...", flush=True)
+        result = run_benchmark(module, quick_args if args.quick else full_args)
+        status = f"error: {result['error'][0]}" if "error" in result else "ok"
+        print(f"[{name}] {status} ({result['seconds']:.1f}s)")
+        report["benchmarks"][name] = result
+
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        changes = compare(baseline, report, args.threshold)
+        print(f"{len(changes)} metrics changed by more than {args.threshold:.0%} against {baseline.get('commit')}:")
+        for key, old, new, ratio in changes:
+            print(f"  {key:<60} {old:>12.4g} -> {new:<12.4g} ({ratio:+.0%})")
+    if any("error" in result for result in report["benchmarks"].values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,16 @@ import re
 from tools.global_methods import find_contained_keyword
 from backend_server.LLM_chater import DialogueManager
 from tools.global_methods import ActionObjectExtractor, ActionTupleExtractor
+from core.cognitive_modules.execute.location_resolver import LocationResolver
+from tools.log_writer import prompt_log
 object_extractor = ActionObjectExtractor()
 tuple_extractor = ActionTupleExtractor()
 llm = DialogueManager()
 
+with open("./config/config.json", "r", encoding="utf-8") as f:
+    config = json.load(f)
+FUSED_PERCEPTION = config.get("PERCEPTION_CONFIG", {}).get("FUSED", True)
+
 with open("./config/map.json", "r") as f:
     world_points = json.load(f)
 
@@ -30,17 +36,22 @@ async def _get_location_prompt(name, old_destination, curr_action):
         )
     return prompt
 
-async def get_agent_location(name, old_destination, old_location, curr_action):
+async def _ask_llm_destination(name, old_destination, curr_action):
     prompt = await _get_location_prompt(name, old_destination, curr_action)
-    response = await llm.run_prompt(name, prompt)
-    print(prompt, file=open("./log/prompt_log.txt", "a"))
-    print(response, file=open("./log/prompt_log.txt", "a"))
-    new_destination = find_contained_keyword(response, destinations, case_sensitive=False)
-    new_location = []
-    for destination, location in world_points.get("location"):
-        if destination == new_destination:
-            new_location = location
-            break
+    response = await prompt_log.call("action_handler.destination", prompt,
+                                     llm.run_prompt(name, prompt, cache=True), agent=name)
+    return find_contained_keyword(response, destinations, case_sensitive=False)
+
+# 先走缓存、规则与向量分类，置信度不足时才调用 LLM
+location_resolver = LocationResolver(fallback=_ask_llm_destination)
+
+async def get_agent_location(name, old_destination, old_location, curr_action, destination=None):
+    # destination 为合并感知调用已给出的目的地，有效时不再单独解析
+    if destination in location_resolver.coordinates:
+        new_destination = destination
+    else:
+        new_destination = await location_resolver.resolve(name, old_destination, curr_action)
+    new_location = location_resolver.get_coordinates(new_destination)
     if new_destination is not None and new_location is not None:
         return new_destination, new_location
     else:
@@ -81,7 +92,7 @@ async def _get_object_prompt(name, curr_act):
 
 async def get_action_object(name, curr_act):
     prompt = await _get_object_prompt(name, curr_act)
-    response = await llm.run_prompt(name, prompt)
+    response = await llm.run_prompt(name, prompt, cache=True)
     subject, object = object_extractor.extract_subject_object(response)
     return subject, object
 
@@ -116,7 +127,93 @@ async def _get_tuple_prompt(name, curr_act, subject, object):
 
 async def get_action_tuple(name, curr_act, subject, object):
     prompt = await _get_tuple_prompt(name, curr_act, subject, object)
-    response = await llm.run_prompt(name, prompt)
+    response = await llm.run_prompt(name, prompt, cache=True)
     subject, predicate, object = tuple_extractor.get_action_tuple(response)
     return subject, predicate, object
-    
\ No newline at end of file
+
+
+async def _get_perception_prompt(name, curr_act):
+    prompt = (
+        f"Task: Turn {name}'s current action into one JSON object.\n"
+        f"The JSON object has the keys:\n"
+        f"\"subject\": who is doing the action.\n"
+        f"\"predicate\": the verb of the action, use \"is\" for states such as sleeping.\n"
+        f"\"object\": what the action is about.\n"
+        f"\"destination\": where the action happens, one of the list of the destineations:{destinations}\n"
+        f"\"importance\": on the scale of 1 to 10, where 1 is not important at all"
+        f" (e.g., brushing teeth) and 10 is extremely important (e.g., a break up), an integer.\n"
+        f"Here's the example output for each input:\n"
+        f"---\n"
+        f"Input: Joon Park is brewing coffee.\n"
+        f"Output: {{\"subject\": \"Joon Park\", \"predicate\": \"brew\", \"object\": \"coffee\", \"destination\": \"cafe\", \"importance\": 2}}\n"
+        f"---\n"
+        f"Input: Jane Cook is sleeping.\n"
+        f"Output: {{\"subject\": \"Jane Cook\", \"predicate\": \"is\", \"object\": \"sleep\", \"destination\": \"Jane Cook's house\", \"importance\": 1}}\n"
+        f"---\n"
+        f"Now output {name}'s current action, any part of output should not be None. Output the JSON object only.\n"
+        f"Input: {name} is {curr_act}\n"
+        f"Output:"
+    )
+    return prompt
+
+def _parse_perception(response):
+    start, end = response.find("{"), response.rfind("}")
+    if start == -1 or end <= start:
+        return {}
+    try:
+        data = json.loads(response[start:end + 1])
+    except json.JSONDecodeError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+def _clean_field(value):
+    value = str(value).strip() if value is not None else ""
+    return "" if value.lower() in ("none", "null") else value
+
+# 合并感知调用的统计：调用次数与各字段退回原方式的次数
+perception_stats = {"calls": 0, "triple_fallbacks": 0, "destination_fallbacks": 0, "importance_fallbacks": 0}
+
+async def perceive_action(name, curr_act):
+    """
+    一次 LLM 调用同时得到 subject、predicate、object、destination 与 importance，
+    代替 get_action_object -> get_action_tuple -> get_agent_location -> score_importance 四次串行调用。
+    各字段在本地校验，无效时分别退回原来的方式：
+    - 三元组经 ActionTupleExtractor 规范化，不完整时调用 get_action_object / get_action_tuple
+    - 目的地经 find_contained_keyword 对齐到 map.json，无法对齐时为 None，由 LocationResolver 解析
+    - 重要性须为 1-10，否则为 None，由 store_memory 单独打分
+    """
+    prompt = await _get_perception_prompt(name, curr_act)
+    response = await prompt_log.call("action_handler.perception", prompt,
+                                     llm.run_prompt(name, prompt, cache=True), agent=name)
+    perception_stats["calls"] += 1
+    data = _parse_perception(response)
+
+    fields = [_clean_field(data.get(key)) for key in ("subject", "predicate", "object")]
+    triple = tuple_extractor.get_action_tuple(f"({', '.join(fields)})") if all(fields) else None
+    if triple is None or not all(triple):
+        perception_stats["triple_fallbacks"] += 1
+        subject, object = await get_action_object(name, curr_act)
+        triple = await get_action_tuple(name, curr_act, subject, object)
+    subject, predicate, object = triple
+
+    destination = find_contained_keyword(_clean_field(data.get("destination")), destinations, case_sensitive=False)
+    if destination is None:
+        perception_stats["destination_fallbacks"] += 1
+
+    try:
+        importance = float(data.get("importance"))
+    except (TypeError, ValueError):
+        importance = None
+    if importance is None or not 1 <= importance <= 10:
+        perception_stats["importance_fallbacks"] += 1
+        importance = None
+
+    return {"subject": subject, "predicate": predicate, "object": object,
+            "destination": destination, "importance": importance}
+
+async def perceive_action_chained(name, curr_act):
+    """原来的逐项方式，只抽取三元组；目的地与重要性留给 get_agent_location 与 store_memory"""
+    subject, object = await get_action_object(name, curr_act)
+    subject, predicate, object = await get_action_tuple(name, curr_act, subject, object)
+    return {"subject": subject, "predicate": predicate, "object": object,
+            "destination": None, "importance": None}
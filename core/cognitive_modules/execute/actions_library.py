@@ -1,19 +1,32 @@
 # action.py
 import json
 import asyncio
-from javascript import require
 
-pathfinder = require('mineflayer-pathfinder')
-Vec3 = require("vec3").Vec3
+from tools.profiler import profiler
 
 with open('./config/config.json', 'r', encoding='utf-8') as f:
     config = json.load(f)
 RANGE_GOAL = config.get("RANGE_GOAL")
 
+_pathfinder = None
+
+def _require_pathfinder():
+    """首次使用时才加载 mineflayer-pathfinder，headless 模式下不需要 javascript 桥"""
+    global _pathfinder
+    if _pathfinder is None:
+        from javascript import require
+        _pathfinder = require('mineflayer-pathfinder')
+    return _pathfinder
+
+def _get_pathfinder(bot_manager):
+    # bot 管理器自带 pathfinder 实现（如 HeadlessBotManager）时优先使用
+    return getattr(bot_manager, "pathfinder", None) or _require_pathfinder()
+
 async def act_reading(bot, destination):
     """
     bot 执行 "reading" 动作：根据 location 从配置中读取坐标，并控制 bot 移动到该位置。
     """
+    pathfinder = _require_pathfinder()
     bot.loadPlugin(pathfinder.pathfinder)
     location = config.get("LOCATION", {}).get(destination,{})
     print(f"📍 [{bot.username}] 正在前往 {destination} 读书")
@@ -24,16 +37,19 @@ async def go_to_destination(bot_manager, destination, location):
     """
     bot 执行 "go_to_destination" 动作：根据 location 坐标，控制 bot 移动到该位置。
     """
-    bot_manager.bot.loadPlugin(pathfinder.pathfinder)
-    movements = pathfinder.Movements(bot_manager.bot)
-    bot_manager.bot.pathfinder.setMovements(movements)
-    print(f"[{bot_manager.name}] 正在移动到 {destination} ，坐标 {location}")
-    bot_manager.bot.pathfinder.setGoal(pathfinder.goals.GoalNear(location[0], location[1], location[2], RANGE_GOAL))
+    with profiler.span("bridge.go_to_destination"):
+        pathfinder = _get_pathfinder(bot_manager)
+        bot_manager.bot.loadPlugin(pathfinder.pathfinder)
+        movements = pathfinder.Movements(bot_manager.bot)
+        bot_manager.bot.pathfinder.setMovements(movements)
+        print(f"[{bot_manager.name}] 正在移动到 {destination} ，坐标 {location}")
+        bot_manager.bot.pathfinder.setGoal(pathfinder.goals.GoalNear(location[0], location[1], location[2], RANGE_GOAL))
 
 async def act_follow(bot, name):
     """
     bot 执行 "follow" 动作：跟随目标（对象名称字符串）。
     """
+    pathfinder = _require_pathfinder()
     bot.loadPlugin(pathfinder.pathfinder)
     movements = pathfinder.Movements(bot)
     player = bot.players[name]
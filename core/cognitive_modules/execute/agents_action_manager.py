@@ -1,20 +1,30 @@
 # agents_action_manager.py
+import asyncio
 import json
 import random
+from typing import Optional
 
 from tools.fileloader import fileLoader
-from core.cognitive_modules.execute.action_handler import get_agent_location, get_action_object, get_action_tuple
+from core.cognitive_modules.execute.action_handler import (
+    FUSED_PERCEPTION, get_agent_location, perceive_action, perceive_action_chained
+)
 from core.cognitive_modules.execute.actions_library import go_to_destination
 from core.memory_structures.agents_memory_manager import MemoryService
 from core.cognitive_modules.reaction.agent_react_manager import ReflectService
 from core.cognitive_modules.execute.agents_chat_manager import ReaciToChat
 from core.cognitive_modules.plan.plan import PlanManager
+from core.cognitive_modules.plan.schedule_index import ScheduleIndex, DAY_MINUTES
 from tools.metaClass import Meta
 from tools.global_methods import *
+from tools.log_writer import schedule_log
+from tools.profiler import profiler
 from schedule import schedule
 
 with open('./config/config.json', 'r', encoding='utf-8') as f:
     config = json.load(f)
+PREFETCH_TRIPLES = config.get("AGENT_CONFIG", {}).get("PREFETCH_TRIPLES", True)
+# 每次只预取当前活动之后的若干个不同活动，避免预取请求挤占本 tick 自身的 LLM 调用
+PREFETCH_AHEAD = config.get("AGENT_CONFIG", {}).get("PREFETCH_AHEAD", 2)
     
 
 class AgentsActionManager(metaclass=Meta):
@@ -28,7 +38,7 @@ class AgentsActionManager(metaclass=Meta):
         self.name = name
         # 加载角色设定和记忆
         self.persona = fileLoader(config['AGENTS_PATH'][name]['prompt_path'])
-        self.memory = MemoryService()
+        self.memory = MemoryService(name)
         self.reflect = ReflectService()
         self.isChatting = False
         self.should_react = False
@@ -36,6 +46,13 @@ class AgentsActionManager(metaclass=Meta):
         self.isTalkingAbout = ""
         self.chat = []
         self.summary_chat = ""
+        # (Agent 名, 活动) -> 感知结果（三元组、目的地、重要性）的抽取任务，随日程重建而失效
+        self._perception_cache = {}
+        # 最近一次执行的游戏内时间，换入新日程时从这里开始预取
+        self._prefetch_time = 0
+        # 后台重新规划的任务，以及生成过程中流式产出的部分日程
+        self._replan_task = None
+        self.pending_schedule = []
         
 
         # 加载日常计划并预处理
@@ -53,39 +70,186 @@ class AgentsActionManager(metaclass=Meta):
         self.schedule = {"schedule": self.daily_plan}
         with open(f"./schedule/{self.name}.json", "w", encoding='utf-8')as f:
             f.write(json.dumps(self.schedule, indent=1))
-        print(self.daily_plan, file=open("./log/schedule_log01.txt", "a"))
+        schedule_log.write({"agent": self.name, "event": "schedule_loaded", "schedule": self.daily_plan})
 
     def get_instance(self, target_name):
         # 通过类属性访问其他实例
         return AgentsActionManager.instances.get(target_name)
     
     def _build_schedule_cache(self):
-        """将 schedule 转换为时间区间后缓存"""
-        total = 0
-        intervals = []
-        for activity, duration in self.daily_plan:
-            intervals.append((total, total + duration, activity))
-            total += duration
-        assert total == 1440, f"{self.name} 日程总时长应为1440分钟，当前为{total}"
-        self._schedule_cache[self.name] = intervals
+        """将 schedule 转换为有序区间索引后缓存"""
+        index = ScheduleIndex(self.daily_plan)
+        assert index.total == DAY_MINUTES, f"{self.name} 日程总时长应为1440分钟，当前为{index.total}"
+        self._schedule_cache[self.name] = index
+        # 日程变化后旧的感知结果不再适用；进行中的任务不取消，由仍在等待的调用方自行完成
+        self._perception_cache = {}
+
+    def request_replan(self):
+        """
+        在后台按当前 persona 重新生成日程，生成期间 Agent 继续执行旧日程，
+        完成后一次性替换。重复请求时取消尚未完成的旧任务，以最新 persona 为准。
+        """
+        if self._replan_task is not None and not self._replan_task.done():
+            self._replan_task.cancel()
+        self._replan_task = asyncio.ensure_future(self._replan())
+        return self._replan_task
+
+    async def _replan(self):
+        try:
+            async with profiler.span("plan.generate", agent=self.name):
+                plan = await PlanManager(self.persona, self).generate(on_partial=self._on_partial_schedule)
+            self.apply_schedule(plan.expanded_schedule)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            schedule_log.write({"agent": self.name, "event": "replan_failed", "error": str(e)})
+        finally:
+            self.pending_schedule = []
+
+    def _on_partial_schedule(self, partial):
+        self.pending_schedule = partial
+
+    def apply_schedule(self, daily_plan) -> bool:
+        """
+        原子地换入新日程（中间没有 await，不会与 tick 交错）。
+        总时长不为 1440 分钟的日程会被拒绝，保留旧日程。
+        """
+        total = sum(duration for _, duration in daily_plan)
+        if total != DAY_MINUTES:
+            schedule_log.write({"agent": self.name, "event": "schedule_rejected", "minutes": total})
+            return False
+        self.daily_plan = daily_plan
+        self.schedule = {"schedule": self.daily_plan}
+        self._build_schedule_cache()
+        self.prefetch_activity_triples(self._prefetch_time)
+        with open(f"./schedule/{self.name}.json", "w", encoding='utf-8')as f:
+            f.write(json.dumps(self.schedule, indent=1))
+        schedule_log.write({"agent": self.name, "event": "schedule_applied", "schedule": self.daily_plan})
+        return True
+
+    async def perceive(self, name: str, activity: str) -> dict:
+        """
+        返回 {subject, predicate, object, destination, importance}。
+        FUSED_PERCEPTION 开启时一次合并调用得到全部字段，否则只逐项抽取三元组，
+        destination 与 importance 为 None，由 get_agent_location 与 store_memory 补齐。
+        """
+        # 后台预取的任务不在 execute_behavior 中，显式记到本 Agent
+        async with profiler.span("perception", agent=self.name):
+            if FUSED_PERCEPTION:
+                return await perceive_action(name, activity)
+            return await perceive_action_chained(name, activity)
+
+    async def get_activity_perception(self, activity: str, name: Optional[str] = None) -> dict:
+        """
+        返回 name（默认为自身）的活动的感知结果，观察到的其他 Agent 的事件也经由这里。
+        同一 (name, 活动) 只抽取一次，并发请求共享同一个任务。
+        """
+        key = (name or self.name, activity)
+        task = self._perception_cache.get(key)
+        if task is None or (task.done() and (task.cancelled() or task.exception() is not None)):
+            task = asyncio.ensure_future(self.perceive(*key))
+            self._perception_cache[key] = task
+        return await asyncio.shield(task)
+
+    def prefetch_activity_triples(self, current_time: int):
+        """
+        在后台为 current_time 之后的 PREFETCH_AHEAD 个不同活动预先抽取感知结果，
+        每次执行时随时间向后滑动，需在事件循环中调用
+        """
+        self._prefetch_time = current_time
+        index = self._schedule_cache.get(self.name)
+        if not PREFETCH_TRIPLES or index is None:
+            return
+        position = index.locate(current_time)
+        if position < 0:
+            return
+        current_act = index.activities[position]
+        upcoming = dict.fromkeys(a for a in index.activities[position + 1:] if a != current_act)
+        for activity in list(upcoming)[:PREFETCH_AHEAD]:
+            key = (self.name, activity)
+            if key not in self._perception_cache:
+                self._perception_cache[key] = asyncio.ensure_future(self.perceive(*key))
+
+    # ---------------- 由对话另一方触发的状态变化 ----------------
+    # 对方只通过以下方法修改本 Agent；分片运行时对方可能是其他进程中 Agent 的 AgentProxy
+
+    def receive_chat(self, speaker: str, chat: str, talking_about: Optional[str] = None) -> None:
+        """对方说了一句话，轮到本 Agent 回应"""
+        self.isChatting = True
+        self.should_react = True
+        if talking_about is not None:
+            self.isTalkingAbout = talking_about
+        self.chat.append([speaker, chat])
+
+    def yield_turn(self) -> None:
+        """话轮交给对方，本 Agent 暂不发言"""
+        self.should_react = False
+
+    async def absorb_conversation(self, partner: str, chat: list, summary_chat: str) -> None:
+        """对话结束：重置对话状态，记住对话摘要，并决定是否据此修改日程"""
+        self.isChatting = False
+        self.should_react = False
+        self.isTalkingAbout = ""
+        self.today_is_chatted = True
+        self.summary_chat = summary_chat
+        await self.memory.store_memory(
+            self.name, summary_chat,
+            self.name, "Talks to", partner
+        )
+        if await self.reflect.decide_to_alter_plan(self, chat, summary_chat):
+            self.persona = replace_persona_currently(self.persona, summary_chat)
+            self.request_replan()
+        self.chat = []
+
+    @property
+    def schedule_version(self):
+        """当前日程的索引对象，日程被替换后换为新对象"""
+        return self._schedule_cache.get(self.name)
 
     def get_current_activity(self, current_time: int) -> str:
         """
         返回指定游戏内时间的活动。
         :param current_time: 游戏内分钟数 0-1439
         """
-        for start, end, activity in self._schedule_cache.get(self.name, []):
-            if start <= current_time < end:
-                return activity
-        return None
+        index = self._schedule_cache.get(self.name)
+        return index.activity_at(current_time) if index is not None else None
+
+    def get_next_change(self, current_time: int):
+        """返回当前活动结束（下一次活动变化）的游戏内分钟数"""
+        index = self._schedule_cache.get(self.name)
+        return index.next_change(current_time) if index is not None else None
+
+    @classmethod
+    def activities_at(cls, current_time: int) -> dict:
+        """
+        一次查询所有 Agent 在某一时刻的活动。
+        返回 {name: (activity, next_change)}，next_change 为该活动结束的分钟数，
+        计时器可据此跳过活动没有变化的 Agent。
+        """
+        result = {}
+        for name, index in cls._schedule_cache.items():
+            position = index.locate(current_time)
+            if position >= 0:
+                result[name] = (index.activities[position], index.ends[position])
+            else:
+                result[name] = (None, None)
+        return result
+
     async def execute_behavior(self, bot_manager, current_time: int, global_events: list):
         """
         根据传入时间调用行为，优化事件处理逻辑
         :param bot_manager: 对应的 AsyncBotManager 实例
         :param current_time: 当前游戏内时间（分钟）
         """
+        # 其中的各个阶段都记在该 Agent 的轨道上
+        async with profiler.span("execute_behavior", agent=self.name):
+            return await self._execute_behavior(bot_manager, current_time, global_events)
+
+    async def _execute_behavior(self, bot_manager, current_time: int, global_events: list):
         current_act = self.get_current_activity(current_time)
+        scheduled_act = current_act
         print(f"[{self.name}] is {current_act}")
+        self.prefetch_activity_triples(current_time)
         hour = current_time // 60
         minute = current_time % 60
         clock = f"{hour:02d}:{minute:02d}"
@@ -104,17 +268,17 @@ class AgentsActionManager(metaclass=Meta):
             # 睡眠事件特殊处理
             if selected_event['object'] == "sleep" or selected_event['description'] == "sleeping" or self.today_is_chatted == True:
                 # 直接生成基础事件不触发反应
-                subject, object = await get_action_object(self.name, current_act)
-                subject, predicate, object = await get_action_tuple(self.name, current_act, subject, object)
+                perception = await self.get_activity_perception(current_act)
                 
                 await self.memory.store_memory(
                     self.name, current_act, 
-                    self.name, predicate, object
+                    self.name, perception['predicate'], perception['object'],
+                    poignancy=perception['importance']
                 )
                 
                 new_event = {
-                    "subject": subject,
-                    "object": object,
+                    "subject": perception['subject'],
+                    "object": perception['object'],
                     "description": f"{current_act}"
                 }
                 new_events.append(new_event)
@@ -131,17 +295,17 @@ class AgentsActionManager(metaclass=Meta):
                     print(f"[ERROR] Agent {target_agent} 属性不完整")
                     return new_events
                 
-                subject, object = await get_action_object(target_agent.name, selected_event['description'])
-                subject, predicate, object = await get_action_tuple(target_agent.name, selected_event['description'], subject, object)
+                perception = await self.get_activity_perception(selected_event['description'], target_agent.name)
                 
                 await self.memory.store_memory(
                     self.name, selected_event['description'], 
-                    subject, predicate, object
+                    perception['subject'], perception['predicate'], perception['object'],
+                    poignancy=perception['importance']
                 )
                 
                 related_memories = self.memory.search_memory(target_agent.name)  
                 if self.isChatting == False:
-                    self.should_react = self.reflect.decide_to_reaction(
+                    self.should_react = await self.reflect.decide_to_reaction(
                         clock,
                         self,
                         current_action=current_act,
@@ -152,9 +316,9 @@ class AgentsActionManager(metaclass=Meta):
                     if self.should_react:
                         # 生成对话反应
                         self.isChatting = True
-                        self.isTalkingAbout = self.reflect.get_is_talking_about(self, current_act, selected_event, target_agent.name, related_memories)
+                        self.isTalkingAbout = await self.reflect.get_is_talking_about(self, current_act, selected_event, target_agent.name, related_memories)
                         
-                        chat = ReaciToChat().generate_dialogue(
+                        chat = await ReaciToChat().generate_dialogue(
                             clock, 
                             self, 
                             current_act,
@@ -165,13 +329,11 @@ class AgentsActionManager(metaclass=Meta):
                             related_memories
                         )
                         self.should_react = False
-                        target_agent.isChatting = True
-                        target_agent.should_react = True
-                        target_agent.isTalkingAbout = self.isTalkingAbout
-                        bot_manager.bot.chat(chat)
+                        target_agent.receive_chat(self.name, chat, self.isTalkingAbout)
+                        with profiler.span("bridge.chat"):
+                            bot_manager.bot.chat(chat)
                         print(f"[{self.name}]: {chat}")
                         self.chat.append([self.name, chat])
-                        target_agent.chat.append([self.name, chat])
                         current_act = f"{self.name} is talking to {target_agent_name} about {self.isTalkingAbout} said {chat}."
                         new_event = {
                             "subject": self.name,
@@ -182,7 +344,7 @@ class AgentsActionManager(metaclass=Meta):
                         event_processed = True
                 else:
                     if len(self.chat) < 10 and self.should_react == True: # 轮到自己说话
-                        chat = ReaciToChat().generate_dialogue(
+                        chat = await ReaciToChat().generate_dialogue(
                             clock, 
                             self, 
                             current_act,
@@ -193,12 +355,11 @@ class AgentsActionManager(metaclass=Meta):
                             related_memories
                         )
                         self.should_react = False
-                        target_agent.isChatting = True
-                        target_agent.should_react = True
-                        bot_manager.bot.chat(chat)
+                        target_agent.receive_chat(self.name, chat)
+                        with profiler.span("bridge.chat"):
+                            bot_manager.bot.chat(chat)
                         print(f"[{self.name}]: {chat}")
                         self.chat.append([self.name, chat])
-                        target_agent.chat.append([self.name, chat])
                         # 更新当前行为描述
                         current_act = f"{self.name} is talking to {target_agent_name} about {self.isTalkingAbout} said {chat}."
                         new_event = {
@@ -215,69 +376,39 @@ class AgentsActionManager(metaclass=Meta):
                             "description": f"{current_act}"
                         }
                         self.should_react = True
-                        target_agent.should_react = False
+                        target_agent.yield_turn()
                         new_events.append(new_event)
                     else: # 对话结束
-                        self.isChatting = False
-                        self.should_react = False
-                        self.isTalkingAbout = ""
-                        target_agent.isChatting = False
-                        target_agent.should_react = False
-                        target_agent.isTalkingAbout = ""
-                        self.today_is_chatted = True
-                        target_agent.today_is_chatted = True
-                        
-                        self.summary_chat = self.reflect.summarize_chat(self, self.chat, target_agent.name)
-                        target_agent.summary_chat = self.summary_chat
-                        
-                        await self.memory.store_memory(
-                            self.name, self.summary_chat, 
-                            self.name, "Talks to", target_agent.name
-                        )
-                        await target_agent.memory.store_memory(
-                            target_agent.name, self.summary_chat, 
-                            target_agent.name, "Talks to", self.name
-                        )
-                        decide_to_alter_plan = self.reflect.decide_to_alter_plan(self, self.chat, self.summary_chat)
-                        if decide_to_alter_plan:
-                            self.persona = replace_persona_currently(self.persona, self.summary_chat)
-                            self.daily_plan = PlanManager(self.persona, self).expanded_schedule
-                            self._build_schedule_cache()
-                            with open(f"./schedule/{self.name}.json", "w", encoding='utf-8')as f:
-                                f.write(json.dumps(self.schedule, indent=1))
-                        target_decide_to_alter_plan = target_agent.reflect.decide_to_alter_plan(target_agent, self.chat, self.summary_chat)
-                        if target_decide_to_alter_plan:
-                            target_agent.persona = replace_persona_currently(target_agent.persona, self.summary_chat)
-                            target_agent.daily_plan = PlanManager(target_agent.persona, target_agent).expanded_schedule
-                            target_agent._build_schedule_cache()
-                            with open(f"./schedule/{target_agent.name}.json", "w", encoding='utf-8')as f:
-                                f.write(json.dumps(target_agent.schedule, indent=1))
-                        self.chat = []
-                        target_agent.chat = []
+                        chat = self.chat
+                        summary_chat = await self.reflect.summarize_chat(self, chat, target_agent.name)
+                        await self.absorb_conversation(target_agent.name, chat, summary_chat)
+                        await target_agent.absorb_conversation(self.name, chat, summary_chat)
                     event_processed = True
 
         # 统一处理事件存储与位置更新
         if not event_processed:
-            subject, object = await get_action_object(self.name, current_act)
-            subject, predicate, object = await get_action_tuple(
-                self.name, current_act, subject, object
-            )
+            perception = await self.get_activity_perception(current_act)
             await self.memory.store_memory(
                 self.name, current_act, 
-                self.name, predicate, object
+                self.name, perception['predicate'], perception['object'],
+                poignancy=perception['importance']
             )
             
             new_event = {
-                "subject": subject,
-                "object": object,
+                "subject": perception['subject'],
+                "object": perception['object'],
                 "description": f"{current_act}"
             }
             new_events.append(new_event)
 
-        # 位置更新逻辑
-        new_dest, new_loc = await get_agent_location(
-            self.name, self.destination, self.location, current_act
-        )
+        # 位置更新逻辑：仍在执行日程活动时，直接使用合并感知调用给出的目的地
+        destination = None
+        if FUSED_PERCEPTION and current_act == scheduled_act:
+            destination = (await self.get_activity_perception(current_act))['destination']
+        async with profiler.span("location"):
+            new_dest, new_loc = await get_agent_location(
+                self.name, self.destination, self.location, current_act, destination
+            )
         if new_dest != self.destination:
             self.destination = new_dest
             self.location = new_loc
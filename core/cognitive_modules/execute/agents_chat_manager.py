@@ -4,9 +4,9 @@ from tkinter import dialog
 from typing import Dict, Any # type: ignore
 import re
 
-from ollama import chat
 
 from backend_server.LLM_chater import LLMResponse
+from tools.log_writer import prompt_log
 
 manager = LLMResponse()
 model_name = "ASSISTANT"
@@ -193,7 +193,7 @@ async def generate_action(self, environment, dialogue):
     print(action)
     return action
 
-def get_speaker_relationship(self_agent_name: str, other_agent_name: str, obervation: str, relevent_memories: str):
+async def get_speaker_relationship(self_agent_name: str, other_agent_name: str, obervation: str, relevent_memories: str):
     instruction = (
         f"what is the most possible relationship between {self_agent_name} and {other_agent_name} in the"
         f" following observation? Describe in 20 words. Do not embellish if you don't know. Do not return a list.\n"
@@ -201,10 +201,10 @@ def get_speaker_relationship(self_agent_name: str, other_agent_name: str, oberva
         f"Relevant memories: {relevent_memories}\n"
     )
     prompt = system_prompt % instruction
-    return manager.run_prompt(prompt)
+    return await manager.run_prompt(prompt)
 
 class ReaciToChat:
-    def _get_dialogue_prompt(self,
+    async def _get_dialogue_prompt(self,
                         curr_time,
                         agent,
                         self_agent_status: str, 
@@ -213,9 +213,10 @@ class ReaciToChat:
                         chat_topic: str, 
                         chat_history,
                         relevant_memories: str):
-        self.relationship = get_speaker_relationship(agent.name, other_agent_name, observation, relevant_memories)
+        self.relationship = await get_speaker_relationship(agent.name, other_agent_name, observation, relevant_memories)
         if chat_history:
-            chat_history = chat_history[-4:]
+            # 按 CONTEXT_CONFIG 的策略裁剪，避免对话越长提示词越长
+            chat_history = await manager.trim_history(chat_history)
         instuction = (
             f"{agent.persona}\n"
             f"It is {curr_time}.\n"
@@ -233,7 +234,7 @@ class ReaciToChat:
             instuction +=f"What would {agent.name} say hello to {other_agent_name}? Output without explaination in 20 words:\n{agent.name} said:\n"
         return instuction
     
-    def generate_dialogue(self, 
+    async def generate_dialogue(self, 
                           curr_time, 
                           agent, 
                           self_agent_status: str, 
@@ -253,9 +254,7 @@ class ReaciToChat:
                 return match.group(1)
             else:
                 return s
-        prompt = system_prompt % self._get_dialogue_prompt(curr_time, agent, self_agent_status, other_agent_name, observation, chat_topic, chat_history, relevant_memories)
-        print(prompt, file=open("./log/prompt_log01.txt", "a", encoding="utf-8"))
-        result = manager.run_prompt(prompt)
-        print(result, file=open("./log/prompt_log01.txt", "a", encoding="utf-8"))
+        prompt = system_prompt % await self._get_dialogue_prompt(curr_time, agent, self_agent_status, other_agent_name, observation, chat_topic, chat_history, relevant_memories)
+        result = await prompt_log.call("chat.generate_dialogue", prompt, manager.run_prompt(prompt), agent=agent.name)
         dialogue = _clean_up(result)
         return dialogue
\ No newline at end of file
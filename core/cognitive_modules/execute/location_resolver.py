@@ -0,0 +1,153 @@
+# location_resolver.py
+import asyncio
+import json
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from tools.global_methods import find_contained_keyword
+from core.memory_structures.embedding_engine import EmbeddingEngine, embedding_engine
+
+with open("./config/config.json", "r", encoding="utf-8") as f:
+    config = json.load(f)
+RESOLVER_CONFIG = config.get("RESOLVER_CONFIG", {})
+MAP_PATH = RESOLVER_CONFIG.get("MAP_PATH", "./config/map.json")
+CONFIDENCE_THRESHOLD = RESOLVER_CONFIG.get("CONFIDENCE_THRESHOLD", 0.45)
+CONFIDENCE_MARGIN = RESOLVER_CONFIG.get("CONFIDENCE_MARGIN", 0.05)
+DESCRIPTIONS = RESOLVER_CONFIG.get("DESCRIPTIONS", {})
+HOME_SUFFIX = "'s house"
+HOME_KEYWORDS = ("home", "sleep", "bed", "wake up", "shower")
+
+# 回退函数签名：(name, old_destination, activity) -> destination 或 None
+Fallback = Callable[[str, Optional[str], str], Awaitable[Optional[str]]]
+
+
+class LocationResolver:
+    """
+    把活动描述解析为 map.json 中的目的地，按代价从低到高依次尝试：
+    1. 缓存：同一 Agent 的同一活动只解析一次
+    2. 规则：活动文本直接提到了某个目的地，或明显发生在家中
+    3. 分类器：活动向量与各目的地描述向量的余弦相似度，置信度足够时采用
+    4. LLM：以上都无法确定时才调用 fallback
+    """
+    def __init__(self, map_path: str = MAP_PATH, fallback: Optional[Fallback] = None,
+                 engine: EmbeddingEngine = embedding_engine,
+                 threshold: float = CONFIDENCE_THRESHOLD,
+                 margin: float = CONFIDENCE_MARGIN,
+                 descriptions: Optional[Dict[str, str]] = None):
+        with open(map_path, "r", encoding="utf-8") as f:
+            world_points = json.load(f)
+        # 目的地 -> 坐标，替代逐条扫描 world_points["location"]
+        self.coordinates: Dict[str, List[int]] = {
+            destination: location for destination, location in world_points.get("location", [])
+        }
+        self.destinations: List[str] = list(self.coordinates)
+        self.fallback = fallback
+        self.engine = engine
+        self.threshold = threshold
+        self.margin = margin
+        self.descriptions = DESCRIPTIONS if descriptions is None else descriptions
+
+        # 分类器的类别：公共地点各自一类，所有 "xxx's house" 合并为 home 一类，
+        # 命中后再映射到当前 Agent 自己的家
+        self._labels = [d for d in self.destinations if not d.endswith(HOME_SUFFIX)]
+        if len(self._labels) < len(self.destinations):
+            self._labels.append("home")
+        self._prototypes: Optional[np.ndarray] = None
+        self._prototype_lock: Optional[asyncio.Lock] = None
+
+        self._cache: Dict[Tuple[str, str], str] = {}
+
+        # 统计计数
+        self._lookups = 0
+        self._cache_hits = 0
+        self._rule_hits = 0
+        self._classifier_hits = 0
+        self._llm_calls = 0
+        self._unresolved = 0
+
+    def get_coordinates(self, destination: str) -> Optional[List[int]]:
+        return self.coordinates.get(destination)
+
+    def _home_of(self, name: str) -> Optional[str]:
+        home = f"{name}{HOME_SUFFIX}"
+        return home if home in self.coordinates else None
+
+    def _match_rule(self, name: str, activity: str) -> Optional[str]:
+        destination = find_contained_keyword(activity, self.destinations, case_sensitive=False)
+        if destination is not None:
+            return destination
+        text = activity.lower()
+        if any(keyword in text for keyword in HOME_KEYWORDS):
+            return self._home_of(name)
+        return None
+
+    async def _get_prototypes(self) -> np.ndarray:
+        """各类别描述的向量，首次使用时编码一次"""
+        if self._prototypes is None:
+            if self._prototype_lock is None:
+                self._prototype_lock = asyncio.Lock()
+            async with self._prototype_lock:
+                if self._prototypes is None:
+                    texts = [self.descriptions.get(label, f"at the {label}") for label in self._labels]
+                    loop = asyncio.get_running_loop()
+                    self._prototypes = await loop.run_in_executor(None, self.engine.encode, texts)
+        return self._prototypes
+
+    async def _classify(self, name: str, activity: str) -> Optional[str]:
+        if not self._labels:
+            return None
+        prototypes = await self._get_prototypes()
+        query = await self.engine.encode_async(activity)
+        scores = prototypes @ query
+        order = np.argsort(-scores)
+        best = float(scores[order[0]])
+        second = float(scores[order[1]]) if len(order) > 1 else -1.0
+        if best < self.threshold or best - second < self.margin:
+            return None
+        label = self._labels[order[0]]
+        return self._home_of(name) if label == "home" else label
+
+    async def resolve(self, name: str, old_destination: Optional[str], activity: str) -> Optional[str]:
+        """返回活动对应的目的地名称，无法确定时返回 None"""
+        self._lookups += 1
+        key = (name, activity)
+        destination = self._cache.get(key)
+        if destination is not None:
+            self._cache_hits += 1
+            return destination
+
+        destination = self._match_rule(name, activity)
+        if destination is not None:
+            self._rule_hits += 1
+        else:
+            destination = await self._classify(name, activity)
+            if destination is not None:
+                self._classifier_hits += 1
+            elif self.fallback is not None:
+                self._llm_calls += 1
+                destination = await self.fallback(name, old_destination, activity)
+                if destination not in self.coordinates:
+                    destination = None
+
+        if destination is None:
+            self._unresolved += 1
+            return None
+        self._cache[key] = destination
+        return destination
+
+    def clear_cache(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, float]:
+        resolved = self._cache_hits + self._rule_hits + self._classifier_hits
+        return {
+            "lookups": self._lookups,
+            "cache_hits": self._cache_hits,
+            "rule_hits": self._rule_hits,
+            "classifier_hits": self._classifier_hits,
+            "llm_calls": self._llm_calls,
+            # 每次不经 LLM 完成的解析都相当于省下一次调用
+            "llm_calls_avoided": resolved,
+            "unresolved": self._unresolved,
+        }
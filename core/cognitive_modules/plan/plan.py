@@ -1,23 +1,97 @@
 from datetime import datetime # type: ignore
+import asyncio
 import ast # type: ignore
+import json
 import re # type: ignore
 
 from tools.global_methods import *
 from backend_server.LLM_chater import LLMResponse
 llm = LLMResponse()
 
+with open("./config/config.json", "r", encoding="utf-8") as f:
+    config = json.load(f)
+PLAN_CONFIG = config.get("PLAN_CONFIG", {})
+# per_hour: 每个清醒的小时一次 LLM 调用；structured: 整天一次 JSON 调用，失败的小时再逐个补齐
+HOURLY_MODE = PLAN_CONFIG.get("HOURLY_MODE", "per_hour")
+MAX_ACTIVITY_WORDS = PLAN_CONFIG.get("MAX_ACTIVITY_WORDS", 16)
+
+HOUR_STR = ["00:00 AM", "01:00 AM", "02:00 AM", "03:00 AM", "04:00 AM", 
+        "05:00 AM", "06:00 AM", "07:00 AM", "08:00 AM", "09:00 AM", 
+        "10:00 AM", "11:00 AM", "12:00 PM", "01:00 PM", "02:00 PM", 
+        "03:00 PM", "04:00 PM", "05:00 PM", "06:00 PM", "07:00 PM",
+        "08:00 PM", "09:00 PM", "10:00 PM", "11:00 PM"]
+
 class PlanManager:
-    def __init__(self, persona: str, agent):
+    """
+    生成 Agent 的一日计划。所有 LLM 调用均为异步：
+        plan = await PlanManager(persona, agent).generate()
+    """
+    HOURLY_MODES = ("per_hour", "structured")
+
+    def __init__(self, persona: str, agent, hourly_mode: str = HOURLY_MODE):
+        if hourly_mode not in self.HOURLY_MODES:
+            raise ValueError(f"Unknown hourly schedule mode: {hourly_mode}")
+        self.persona = persona
+        self.agent = agent
+        self.hourly_mode = hourly_mode
+        # structured 模式下未通过校验、改为逐小时生成的小时数
+        self.fallback_hours = 0
+        self.wake_up_hour = None
+        self.daily_plan = []
+        self.hourly_schedule = []
+        self.expanded_schedule = []
+
+    async def generate(self, on_partial=None) -> "PlanManager":
+        """
+        生成流水线：逐小时日程一边生成一边流式产出，
+        某个时间块及其后一块确定后，立即并发地拆解该块的子任务。
+        :param on_partial: 可选回调，每生成一个小时调用一次，参数为目前为止的分钟制日程
+        """
+        persona, agent = self.persona, self.agent
         cur_date = datetime.now().strftime("%A %B %d")
-        self.wake_up_hour = self.generate_wake_up_hour(persona)
+        self.wake_up_hour = await self.generate_wake_up_hour(persona)
         print(self.wake_up_hour)
-        self.daily_plan = self.generate_first_daily_plan(agent, persona, self.wake_up_hour)
+        self.daily_plan = await self.generate_first_daily_plan(agent, persona, self.wake_up_hour)
         print(self.daily_plan)
-        self.hourly_schedule = self.generate_hourly_schedule(persona, self.wake_up_hour, self.daily_plan)
-        print(self.hourly_schedule)
-        self.expanded_schedule = self.generate_task_details(persona, self.hourly_schedule, cur_date)
+
+        detail_tasks = {}
+        current_attempt = 0
+        try:
+            async for attempt, partial in self.stream_hourly_schedule(persona, self.wake_up_hour, self.daily_plan):
+                if attempt != current_attempt:
+                    # 多样性重试会丢弃上一轮结果，已启动的拆解任务随之作废
+                    self._cancel_tasks(detail_tasks)
+                    current_attempt = attempt
+                self.hourly_schedule = partial
+                if on_partial is not None:
+                    on_partial(partial)
+                # 第 i 块的提示词需要前后相邻的块，第 i+1 块之后出现新块时第 i+1 块才算确定
+                for index in range(1, len(partial) - 2):
+                    if index not in detail_tasks:
+                        detail_tasks[index] = asyncio.ensure_future(
+                            self._expand_block(persona, partial[:index + 2], index, cur_date)
+                        )
+            print(self.hourly_schedule)
+            for index in range(1, len(self.hourly_schedule)):
+                if index not in detail_tasks:
+                    detail_tasks[index] = asyncio.ensure_future(
+                        self._expand_block(persona, self.hourly_schedule, index, cur_date)
+                    )
+            expanded = await asyncio.gather(*(detail_tasks[index] for index in sorted(detail_tasks)))
+        finally:
+            self._cancel_tasks(detail_tasks)
+
+        self.expanded_schedule = self.hourly_schedule[:1] + [task for tasks in expanded for task in tasks]
         for i, task in enumerate(self.expanded_schedule):
             print(f"[{i}, {task}]\n")
+        return self
+
+    @staticmethod
+    def _cancel_tasks(tasks):
+        for task in tasks.values():
+            if not task.done():
+                task.cancel()
+        tasks.clear()
         
     def _get_wake_up_hour_prompt(self, persona, lifestyle, firstname, cur_date):
         prompt = (
@@ -28,7 +102,7 @@ class PlanManager:
         )
         return prompt
 
-    def generate_wake_up_hour(self, persona):
+    async def generate_wake_up_hour(self, persona):
         """ INPUT: persona
             OUTPUT: wake_up_hour: int
         """
@@ -36,7 +110,7 @@ class PlanManager:
         lifestyle = get_persona_lifestyle(persona)
         cur_date = datetime.now().strftime("%A %B %d")
         prompt = self._get_wake_up_hour_prompt(persona, lifestyle, firstname,cur_date)
-        response = llm.run_prompt(prompt)
+        response = await llm.run_prompt(prompt)
         match = re.search(r"\d+", response)
         wake_up_hour = int(match.group()) if match else None
         return wake_up_hour
@@ -54,12 +128,12 @@ class PlanManager:
         )
         return prompt
 
-    def generate_first_daily_plan(self, agent, persona, wake_up_hour):
+    async def generate_first_daily_plan(self, agent, persona, wake_up_hour):
         firstname = get_persona_firstname(persona)
         lifestyle = get_persona_lifestyle(persona)
         cur_date = datetime.now().strftime("%A %B %d")
         prompt = self._get_daily_plan_prompt(agent, persona, lifestyle, firstname, cur_date, wake_up_hour)
-        response = llm.run_prompt(prompt)
+        response = await llm.run_prompt(prompt)
         # match = re.search(r"\[.*?\]", response)
         # if match:
         #     daily_plan = ast.literal_eval(match.group())
@@ -81,15 +155,21 @@ class PlanManager:
         )
         return prompt
 
-    def generate_hourly_schedule(self, persona, wake_up_hour, daily_plan):
+    async def generate_hourly_schedule(self, persona, wake_up_hour, daily_plan):
         """ INPUT: persona
             OUTPUT: hourly_schedule: list of strings
         """
-        hour_str = ["00:00 AM", "01:00 AM", "02:00 AM", "03:00 AM", "04:00 AM", 
-                "05:00 AM", "06:00 AM", "07:00 AM", "08:00 AM", "09:00 AM", 
-                "10:00 AM", "11:00 AM", "12:00 PM", "01:00 PM", "02:00 PM", 
-                "03:00 PM", "04:00 PM", "05:00 PM", "06:00 PM", "07:00 PM",
-                "08:00 PM", "09:00 PM", "10:00 PM", "11:00 PM"]
+        minute_compressed = []
+        async for _, minute_compressed in self.stream_hourly_schedule(persona, wake_up_hour, daily_plan):
+            pass
+        return minute_compressed
+
+    async def stream_hourly_schedule(self, persona, wake_up_hour, daily_plan):
+        """
+        逐小时生成日程，每得到一个小时的活动就产出一次 (attempt, 目前为止的分钟制日程)。
+        活动种类不足 5 种时整天重来，attempt 随之加一，最多 3 轮。
+        """
+        hour_str = HOUR_STR
         cur_date = datetime.now().strftime("%A %B %d")
         activity = []
         diversity_repeat_count = 3
@@ -97,13 +177,124 @@ class PlanManager:
             activity_set = set(activity)
             if len(activity_set) < 5:
                 activity = []
+                structured = {}
+                if self.hourly_mode == "structured":
+                    structured = await self.generate_structured_hours(persona, daily_plan, cur_date, wake_up_hour)
+                sleeping_hours = wake_up_hour
                 for count, curr_hour_str in enumerate(hour_str):
-                    if wake_up_hour > 0:
+                    if sleeping_hours > 0:
                         activity += ['sleeping']
-                        wake_up_hour -= 1
+                        sleeping_hours -= 1
+                    elif count in structured:
+                        activity.append(structured[count])
                     else:
-                        activity.append(self.run_llm_prompt_generate_hourly_schedule(persona, daily_plan, cur_date, curr_hour_str, activity, hour_str))
-        
+                        if self.hourly_mode == "structured":
+                            self.fallback_hours += 1
+                        activity.append(await self.run_llm_prompt_generate_hourly_schedule(persona, daily_plan, cur_date, curr_hour_str, activity, hour_str))
+                    yield i, self._compress_hourly(activity)
+
+    def _get_structured_schedule_prompt(self, persona, daily_plan, cur_date, wake_up_hour):
+        firstname = get_persona_firstname(persona)
+        wake_up_str = HOUR_STR[min(wake_up_hour, 23)]
+        plan_str = ", ".join(f"{count+1}) {plan}" for count, plan in enumerate(daily_plan))
+        prompt = (
+            f"{persona}\n"
+            f"Current Date: {cur_date}\n\n"
+            f"Here is {firstname}'s plan today in broad-strokes: {plan_str}\n"
+            f"{firstname} sleeps until {wake_up_str}. For every hour from {wake_up_str} to 11:00 PM, "
+            f"describe what {firstname} is doing in at most 8 words.\n"
+            'Return ONLY a JSON object WITHOUT EXPLAINATION, e.g. '
+            '{"schedule": [{"hour": "08:00 AM", "activity": "opening the cafe"}, '
+            '{"hour": "09:00 AM", "activity": "serving customers at the counter"}]}\n'
+        )
+        return prompt
+
+    async def generate_structured_hours(self, persona, daily_plan, cur_date, wake_up_hour):
+        """
+        一次调用生成整天的逐小时日程，返回 {小时(0-23): 活动}。
+        只包含通过校验的清醒小时，缺失的小时由调用方逐个补齐。
+        """
+        prompt = self._get_structured_schedule_prompt(persona, daily_plan, cur_date, wake_up_hour)
+        response = await llm.run_prompt(prompt)
+        return self._parse_structured_schedule(response, wake_up_hour)
+
+    @staticmethod
+    def _parse_hour(value):
+        """把 8 / "8" / "08:00 AM" / "8 pm" / "20:00" 解析为 0-23 的小时，失败返回 None"""
+        if isinstance(value, bool):
+            return None
+        if isinstance(value, int):
+            return value if 0 <= value < 24 else None
+        if not isinstance(value, str):
+            return None
+        match = re.match(r"\s*(\d{1,2})(?::\d{2})?\s*([ap])?\.?m?\.?\s*$", value, flags=re.IGNORECASE)
+        if not match:
+            return None
+        hour = int(match.group(1))
+        suffix = (match.group(2) or "").lower()
+        if suffix:
+            if not 1 <= hour <= 12:
+                return None
+            hour = hour % 12 + (12 if suffix == "p" else 0)
+        return hour if 0 <= hour < 24 else None
+
+    @staticmethod
+    def _clean_activity(value):
+        if not isinstance(value, str):
+            return None
+        act = re.sub(r"\s+", " ", value).strip().rstrip(".").strip()
+        if not act or len(act.split()) > MAX_ACTIVITY_WORDS or re.search(r"[{}\[\]]", act):
+            return None
+        return act
+
+    def _parse_structured_schedule(self, response, wake_up_hour):
+        """
+        校验并修复结构化日程：
+        - 从回复中截取 JSON，兼容 {"schedule": [...]} 与裸列表
+        - 条目可以是单个小时 {"hour", "activity"}，也可以是压缩后的区间 {"start", "end", "activity"}
+        - 丢弃睡眠时段、越界、重复和格式错误的小时
+        """
+        data = None
+        for start_char, end_char in (("{", "}"), ("[", "]")):
+            start, end = response.find(start_char), response.rfind(end_char)
+            if start == -1 or end <= start:
+                continue
+            try:
+                data = json.loads(response[start:end + 1])
+                break
+            except json.JSONDecodeError:
+                continue
+        if isinstance(data, dict):
+            data = data.get("schedule", data.get("activities"))
+        if not isinstance(data, list):
+            return {}
+
+        hours = {}
+        for position, entry in enumerate(data):
+            if isinstance(entry, str):
+                # 纯字符串列表按顺序对应清醒的各个小时
+                covered = [wake_up_hour + position]
+                act = self._clean_activity(entry)
+            elif isinstance(entry, dict):
+                act = self._clean_activity(entry.get("activity"))
+                if "hour" in entry:
+                    covered = [self._parse_hour(entry.get("hour"))]
+                else:
+                    first, last = self._parse_hour(entry.get("start")), self._parse_hour(entry.get("end"))
+                    if last == 0:
+                        last = 24  # 结束于午夜
+                    covered = list(range(first, last)) if first is not None and last is not None else []
+            else:
+                continue
+            if act is None:
+                continue
+            for hour in covered:
+                if hour is not None and wake_up_hour <= hour < 24 and hour not in hours:
+                    hours[hour] = act
+        return hours
+
+    @staticmethod
+    def _compress_hourly(activity):
         # 压缩日程
         hourly_compressed = []
         prev = None
@@ -124,7 +315,7 @@ class PlanManager:
         
         return minute_compressed
         
-    def run_llm_prompt_generate_hourly_schedule(self,
+    async def run_llm_prompt_generate_hourly_schedule(self,
                                                 persona, 
                                                 daily_plan, 
                                                 cur_date, 
@@ -168,7 +359,7 @@ class PlanManager:
             return prompt_input
         
         prompt_input = create_prompt_input(persona, daily_plan, curr_hour_str, activity, hour_str)
-        response = llm.run_prompt(prompt_input)
+        response = await llm.run_prompt(prompt_input)
         hourly_act = response.strip().split(".")[0]
         return response
 
@@ -229,7 +420,8 @@ class PlanManager:
         return prompt
         
         
-    def generate_task_details(self, persona, hourly_schedule, cur_date):
+    async def _expand_block(self, persona, hourly_schedule, index, cur_date):
+        """把第 index 个时间块拆解为 5 分钟粒度的子任务，返回 [[task, duration], ...]"""
         def _clean_up(text):     
             # 提取子任务条目
             pattern = r"\d+\)\s*(.+?)\s*\(duration in minutes:\s*(\d+)"
@@ -246,18 +438,24 @@ class PlanManager:
             tasks[-1] = tuple(last_task)
             return tasks
         
-        index = 1
-        while index < len(hourly_schedule):
-            prompt = self._get_schedule_details_prompt(persona, hourly_schedule, index, cur_date)
-            print(prompt)
-            response = llm.run_prompt(prompt)
-            refined_tasks = _clean_up(response)
-            verified_tasks = _verify_duration(refined_tasks, hourly_schedule[index][1])
-            print(verified_tasks)
-            hourly_schedule = hourly_schedule[:index] + verified_tasks + hourly_schedule[index + 1:]
-            index += len(verified_tasks)
+        prompt = self._get_schedule_details_prompt(persona, hourly_schedule, index, cur_date)
+        print(prompt)
+        response = await llm.run_prompt(prompt)
+        refined_tasks = _clean_up(response)
+        if not refined_tasks:
+            # 解析失败时保留原时间块
+            return [hourly_schedule[index]]
+        verified_tasks = _verify_duration(refined_tasks, hourly_schedule[index][1])
+        print(verified_tasks)
+        return verified_tasks
         
-        return hourly_schedule
+    async def generate_task_details(self, persona, hourly_schedule, cur_date):
+        """各时间块的拆解互不依赖（上下文取自原始的相邻时间块），并发执行"""
+        expanded = await asyncio.gather(*(
+            self._expand_block(persona, hourly_schedule, index, cur_date)
+            for index in range(1, len(hourly_schedule))
+        ))
+        return hourly_schedule[:1] + [task for tasks in expanded for task in tasks]
 
     
         
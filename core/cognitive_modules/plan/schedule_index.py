@@ -0,0 +1,59 @@
+# schedule_index.py
+from bisect import bisect_right
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DAY_MINUTES = 1440
+
+
+class ScheduleIndex:
+    """
+    一日日程的区间索引。
+    日程 [[activity, duration], ...] 转换为有序的起止分钟数组，
+    按时间查询活动为二分查找 O(log n)，批量查询使用 np.searchsorted。
+    """
+    def __init__(self, daily_plan: Sequence[Sequence]):
+        self.activities: List[str] = []
+        starts = []
+        total = 0
+        for activity, duration in daily_plan:
+            starts.append(total)
+            self.activities.append(activity)
+            total += duration
+        self.starts: List[int] = starts
+        self.ends: List[int] = starts[1:] + [total]
+        self.total = total
+        self._starts_array = np.asarray(starts, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.activities)
+
+    def __iter__(self) -> Iterator[Tuple[int, int, str]]:
+        """按时间顺序产出 (start, end, activity)"""
+        return iter(zip(self.starts, self.ends, self.activities))
+
+    def locate(self, current_time: int) -> int:
+        """返回 current_time 所在区间的下标，不在日程范围内返回 -1"""
+        if not 0 <= current_time < self.total:
+            return -1
+        return bisect_right(self.starts, current_time) - 1
+
+    def activity_at(self, current_time: int) -> Optional[str]:
+        index = self.locate(current_time)
+        return self.activities[index] if index >= 0 else None
+
+    def next_change(self, current_time: int) -> Optional[int]:
+        """
+        返回 current_time 之后活动第一次变化的分钟数。
+        结果为 DAY_MINUTES 表示当前活动持续到一天结束，不在日程范围内返回 None。
+        """
+        index = self.locate(current_time)
+        return self.ends[index] if index >= 0 else None
+
+    def activities_at_many(self, times: Sequence[int]) -> List[Optional[str]]:
+        """批量查询多个时间点的活动"""
+        times = np.asarray(times, dtype=np.int64)
+        indices = np.searchsorted(self._starts_array, times, side="right") - 1
+        valid = (times >= 0) & (times < self.total)
+        return [self.activities[i] if ok else None for i, ok in zip(indices.tolist(), valid.tolist())]
@@ -3,6 +3,7 @@ from typing import Dict, List # type: ignore
 import random
 from backend_server.LLM_chater import LLMResponse
 from tools.global_methods import find_yes_no
+from tools.log_writer import prompt_log
 llm = LLMResponse()
 
 class ReflectService:
@@ -31,12 +32,10 @@ class ReflectService:
         )
         return prompt
     
-    def decide_to_reaction(self, curr_time, agent, current_action: str, observed_event: Dict, target_persona: str, related_memories) -> bool:
+    async def decide_to_reaction(self, curr_time, agent, current_action: str, observed_event: Dict, target_persona: str, related_memories) -> bool:
                 # 调用LLM（假设有异步调用接口）
         prompt = self._get_decide_reaction_prompt(curr_time, agent, current_action, observed_event, target_persona, related_memories)
-        print(prompt, file=open("./log/prompt_log01.txt", "a", encoding="utf-8"))
-        response = llm.run_prompt(prompt)
-        print(response, file=open("./log/prompt_log01.txt", "a", encoding="utf-8"))
+        response = await prompt_log.call("reflect.decide_to_reaction", prompt, llm.run_prompt(prompt), agent=agent.name)
         return find_yes_no(response)
     
     def _get_summarize_chat_prompt(self, agent, chat_history, target_persona):
@@ -49,11 +48,9 @@ class ReflectService:
         )
         return prompt
     
-    def summarize_chat(self, agent, chat_history, target_persona) -> str:
+    async def summarize_chat(self, agent, chat_history, target_persona) -> str:
         prompt = self._get_summarize_chat_prompt(agent, chat_history, target_persona)
-        print(prompt, file=open("./log/prompt_log01.txt", "a", encoding="utf-8"))
-        response = llm.run_prompt(prompt)
-        print(response, file=open("./log/prompt_log01.txt", "a", encoding="utf-8"))
+        response = await prompt_log.call("reflect.summarize_chat", prompt, llm.run_prompt(prompt), agent=agent.name)
         summary_chat = response
         return summary_chat
     
@@ -71,11 +68,9 @@ class ReflectService:
         )
         return prompt
     
-    def decide_to_alter_plan(self, agent, chat_history, summary_chat) -> bool:
+    async def decide_to_alter_plan(self, agent, chat_history, summary_chat) -> bool:
         prompt = self._get_decide_alter_plan_prompt(agent, chat_history, summary_chat)
-        print(prompt, file=open("./log/prompt_log01.txt", "a", encoding="utf-8"))
-        response = llm.run_prompt(prompt)
-        print(response, file=open("./log/prompt_log01.txt", "a", encoding="utf-8"))
+        response = await prompt_log.call("reflect.decide_to_alter_plan", prompt, llm.run_prompt(prompt), agent=agent.name)
         print(response)
         return find_yes_no(response)
     
@@ -104,8 +99,8 @@ class ReflectService:
         )
         return prompt
     
-    def get_is_talking_about(self, agent, current_action: str, observed_event: Dict, target_persona: str, related_memories) -> str:
+    async def get_is_talking_about(self, agent, current_action: str, observed_event: Dict, target_persona: str, related_memories) -> str:
         prompt = self._get_is_talking_about_prompt(agent, current_action, observed_event, target_persona, related_memories)
-        response = llm.run_prompt(prompt)
+        response = await llm.run_prompt(prompt)
         topic = response.strip(":")[1]
         return topic
\ No newline at end of file
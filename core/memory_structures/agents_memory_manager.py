@@ -3,46 +3,63 @@ import json
 import re
 import numpy as np
 from datetime import datetime
-from typing import List, Dict
-from sentence_transformers import SentenceTransformer
+from typing import List, Dict, Optional, Tuple
 
 from backend_server.LLM_chater import LLMResponse
+from core.memory_structures.embedding_engine import EmbeddingEngine, embedding_engine
+from core.memory_structures.vector_index import INITIAL_CAPACITY, create_index
+from core.memory_structures.memory_store import MemoryStore
+from tools.profiler import profiler
 
 logger = logging.getLogger(__name__)
 manager = LLMResponse()
 bot_name = "assistant"
 
+with open('./config/config.json', 'r', encoding='utf-8') as f:
+    config = json.load(f)
+MEMORY_CONFIG = config.get("MEMORY_CONFIG", {})
+INDEX_BACKEND = MEMORY_CONFIG.get("INDEX_BACKEND", "exact")
+INDEX_OPTIONS = MEMORY_CONFIG.get("INDEX_OPTIONS", {})
+
 SIMILARITY_THRESHOLD = 0.85  # 相似度阈值
 
 class MemoryRepository:
-    def __init__(self, storage_path: str):
+    def __init__(self, storage_path: str, engine: Optional[EmbeddingEngine] = None):
         self.nodes: Dict[str, dict] = {}
         self._counter = 1
         self.storage_path = storage_path
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        # 所有仓库共用进程级的向量模型
+        self.engine = engine or embedding_engine
         
-        # 存储归一化的嵌入向量矩阵
-        self.embeddings = np.empty((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        # 向量索引持有预分配、容量倍增的归一化嵌入矩阵
+        self.index = create_index(INDEX_BACKEND, self.engine.dimension, **INDEX_OPTIONS)
+        # 与矩阵行一一对应的 node_id
+        self._row_ids: List[str] = []
+        # 各 persona 的二进制存储，以及已落盘的行数
+        self._stores: Dict[str, MemoryStore] = {}
+        self._persisted_rows: Dict[str, int] = {}
         
         # 初始化示例节点
         self.add_node("Sophia Yang", "be friends with", "Ethan Choi", 10.0, "Sophia Yang and Ethan Choi are friends.")
 
+    @property
+    def embeddings(self) -> np.ndarray:
+        """有效行的视图（不复制）"""
+        return self.index.vectors
+
     def _next_id(self) -> str:
         nid = f"node_{self._counter}"
         self._counter += 1
         return nid
 
     def add_node(self, subject: str, predicate: str, obj: str,
-                 poignancy: float, description: str) -> None:
-        """新增记忆节点，自动进行向量相似度去重"""
+                 poignancy: float, description: str,
+                 embedding: Optional[np.ndarray] = None) -> None:
+        """新增记忆节点，自动进行向量相似度去重；可传入预先算好的归一化向量"""
         try:
             # 生成归一化的嵌入向量
-            new_embedding = self.model.encode(
-                description,
-                convert_to_tensor=False,
-                normalize_embeddings=True
-            )
-            new_embedding = new_embedding.astype(np.float32).reshape(1, -1)
+            new_embedding = embedding if embedding is not None else self.engine.encode(description)
+            new_embedding = np.asarray(new_embedding, dtype=np.float32).reshape(1, -1)
 
             # 相似性检查
             if self._check_similarity(new_embedding):
@@ -59,55 +76,127 @@ class MemoryRepository:
                 "poignancy": poignancy,
                 "keywords": [subject.strip(), obj.strip()],
                 "description": description,
-                "embedding": new_embedding.flatten().tolist(),
             }
             
-            # 更新嵌入矩阵
-            self.embeddings = np.vstack([self.embeddings, new_embedding])
+            # 更新嵌入矩阵与索引
+            self.index.add(new_embedding)
+            self._row_ids.append(node_id)
             logger.debug(f"Added new memory: {description}")
 
         except Exception as e:
             logger.error(f"Failed to add node: {str(e)}")
 
     def _check_similarity(self, new_embedding: np.ndarray) -> bool:
-        """检查新嵌入向量与现有记忆的相似度"""
-        if self.embeddings.size == 0:
+        """检查新嵌入向量与现有记忆的相似度：对索引做阈值范围查询"""
+        if len(self.index) == 0:
             return False
 
-        # 快速余弦相似度计算（基于归一化向量）
-        similarities = np.dot(self.embeddings, new_embedding.T).flatten()
-        max_similarity = np.max(similarities)
-        
-        logger.debug(f"Max similarity with existing memories: {max_similarity:.4f}")
-        return max_similarity >= SIMILARITY_THRESHOLD
+        # 余弦相似度（基于归一化向量）不低于阈值的记忆
+        rows, similarities = self.index.range_search(new_embedding, SIMILARITY_THRESHOLD)
+        if rows.size:
+            logger.debug(f"Max similarity with existing memories: {similarities.max():.4f}")
+        return rows.size > 0
 
     def search_nodes_by_keyword(self, query: str, top_k: int = 10) -> List[dict]:
         """基于语义相似度的记忆检索"""
         try:
-            query_embedding = self.model.encode(
-                query,
-                convert_to_tensor=False,
-                normalize_embeddings=True
-            ).astype(np.float32)
-
-            # 使用矩阵运算
-            similarities = np.dot(self.embeddings, query_embedding)
-            sorted_indices = np.argsort(similarities)[::-1][:top_k]
+            query_embedding = self.engine.encode(query)
 
-            return [{
-                "description": list(self.nodes.values())[i]["description"],
-                "keywords": list(self.nodes.values())[i]["keywords"]
-            } for i in sorted_indices if i < len(self.nodes)]
+            # 索引只返回 top_k，无需对全部相似度排序
+            sorted_indices, _ = self.index.search(query_embedding, top_k)
+            return self._rows_to_results(sorted_indices)
 
         except Exception as e:
             logger.error(f"Search failed: {str(e)}")
             return []
 
+    def search_many(self, queries: List[str], top_k: int = 10,
+                    query_embeddings: Optional[np.ndarray] = None) -> List[List[dict]]:
+        """批量语义检索：一次编码、一次矩阵乘法解决多条查询"""
+        try:
+            if not queries:
+                return []
+            if query_embeddings is None:
+                query_embeddings = self.engine.encode(list(queries))
+            rows, _ = self.index.search_many(query_embeddings, top_k)
+            return [self._rows_to_results(r) for r in rows]
+
+        except Exception as e:
+            logger.error(f"Batch search failed: {str(e)}")
+            return [[] for _ in queries]
+
+    def _rows_to_results(self, rows) -> List[dict]:
+        """矩阵行号 -> 记忆，O(1) 查表"""
+        results = []
+        for row in rows:
+            node = self.nodes[self._row_ids[row]]
+            results.append({
+                "description": node["description"],
+                "keywords": node["keywords"]
+            })
+        return results
+
+    def _store(self, name: str) -> MemoryStore:
+        if name not in self._stores:
+            self._stores[name] = MemoryStore(self.storage_path, name, self.engine.dimension)
+        return self._stores[name]
+
+    def persist(self, name: str) -> None:
+        """
+        增量保存到二进制存储：只追加上次保存之后新增的节点。
+        本次运行第一次保存且未从该存储加载时，整体重写一次。
+        """
+        store = self._store(name)
+        persisted = self._persisted_rows.get(name)
+        if persisted is None:
+            store.rewrite([self.nodes[nid] for nid in self._row_ids], self.embeddings)
+        elif persisted < len(self._row_ids):
+            store.append([self.nodes[nid] for nid in self._row_ids[persisted:]],
+                         self.embeddings[persisted:])
+        self._persisted_rows[name] = len(self._row_ids)
+
+    def load(self, name: str) -> None:
+        """
+        从二进制存储加载；不存在时迁移旧版 JSON。
+        向量以只读 memmap 零拷贝映射，节点元数据按需解析。
+        """
+        store = self._store(name)
+        if not store.exists():
+            self.load_from_json(name)
+            if self.nodes:
+                self.persist(name)
+            return
+
+        nodes, vectors = store.open_readonly()
+        self.nodes = nodes
+        self._row_ids = list(nodes.row_ids)
+        n_rows = len(self._row_ids)
+        n_vectors = vectors.shape[0]
+        if n_vectors == n_rows:
+            self.index.attach(vectors)
+        else:
+            # 行数不一致时要重写存储：先复制有效行并释放映射，
+            # Windows 上仍被映射的 emb.f32 不能被替换
+            vectors = np.array(vectors[:n_rows])
+            self.index.attach(vectors)
+            # 崩溃可能导致尾部节点没有向量：一次批量编码补齐
+            if n_vectors < n_rows:
+                missing = self._row_ids[n_vectors:]
+                backfill = self.engine.encode([self.nodes[nid].get("description", "") for nid in missing])
+                for vector in backfill:
+                    self.index.add(vector)
+            # 重写一次，保证之后的追加与日志行对齐
+            store.rewrite([self.nodes[nid] for nid in self._row_ids], self.embeddings)
+
+        if self.nodes:
+            self._counter = max(int(k.split("_")[1]) for k in self.nodes) + 1
+        self._persisted_rows[name] = n_rows
+
     def save_to_json(self, name: str) -> None:
-        """保存时自动过滤重复数据"""
+        """导出为旧版 JSON（含向量）"""
         serialized = {
-            k: {**v, "embedding": v["embedding"]}
-            for k, v in self.nodes.items()
+            nid: {**self.nodes[nid], "embedding": self.embeddings[row].tolist()}
+            for row, nid in enumerate(self._row_ids)
         }
         with open(f"{self.storage_path}/{name}.json", "w") as f:
             json.dump({"nodes": serialized}, f, indent=2)
@@ -119,24 +208,25 @@ class MemoryRepository:
                 data = json.load(f)
 
             self.nodes = data.get("nodes", {})
-            self.embeddings = np.empty((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+            capacity = INITIAL_CAPACITY
+            while capacity < len(self.nodes):
+                capacity *= 2
+            self.index.reset(capacity)
+            self._row_ids = []
             
-            # 批量处理嵌入向量
-            embeddings_list = []
+            # 兼容旧数据格式：缺少向量的节点一次批量编码
+            missing = [node_id for node_id, node in self.nodes.items() if "embedding" not in node]
+            backfill = dict(zip(missing, self.engine.encode(
+                [self.nodes[node_id].get("description", "") for node_id in missing])))
+
+            # 直接写入预分配矩阵，不做 vstack；向量只保存在矩阵中
             for node_id, node in self.nodes.items():
-                # 兼容旧数据格式
-                if "embedding" not in node:
-                    embedding = self.model.encode(
-                        node.get("description", ""),
-                        normalize_embeddings=True
-                    ).astype(np.float32)
-                    node["embedding"] = embedding.tolist()
+                embedding = node.pop("embedding", None)
+                if embedding is None:
+                    embedding = backfill[node_id]
                 
-                embeddings_list.append(node["embedding"])
-            
-            # 一次性构建矩阵
-            if embeddings_list:
-                self.embeddings = np.vstack(embeddings_list)
+                self.index.add(np.asarray(embedding, dtype=np.float32))
+                self._row_ids.append(node_id)
             
             # 更新ID计数器
             if self.nodes:
@@ -165,7 +255,7 @@ class MemoryRepository:
             f"Memory: {memory_content}\nRating: "
         )
         prompt = system_prompt + template
-        score_str = manager.run_prompt(prompt)
+        score_str = await manager.run_prompt(prompt, cache=True)
         logger.debug(f"Raw LLM score: {score_str}")
         match = re.search(r"(\d+)", score_str)
         if match:
@@ -191,21 +281,60 @@ class MemoryRepository:
         return "\n".join(lines)
 
 class MemoryService:
-    def __init__(self):
+    def __init__(self, persona_name: Optional[str] = None):
         self._repo = MemoryRepository("./memory")
+        # 启动时映射该 persona 已有的记忆
+        if persona_name is not None:
+            self._repo.load(persona_name)
 
     def search_memory(self, query: str) -> List[dict]:
-        return self._repo.search_nodes_by_keyword(query)
+        with profiler.span("memory.search"):
+            return self._repo.search_nodes_by_keyword(query)
+
+    def search_memory_many(self, queries: List[str]) -> List[List[dict]]:
+        with profiler.span("memory.search"):
+            return self._repo.search_many(queries)
 
     async def store_memory(self, persona_name: str, content: str,
-                           subject: str, predicate: str, obj: str) -> None:
+                           subject: str, predicate: str, obj: str,
+                           poignancy: Optional[float] = None) -> None:
         """
-        新增一条记忆，自动计算重要性并保存到对应 persona 的 JSON 文件。
+        新增一条记忆并追加到对应 persona 的二进制存储。
+        poignancy 为空时调用 LLM 计算重要性；合并感知调用已给出评分时直接使用。
         """
-        poignancy = await self._repo.score_importance(content)
+        if poignancy is None:
+            async with profiler.span("memory.importance"):
+                poignancy = await self._repo.score_importance(content)
+        # 与其它 Agent 同一时刻的编码请求合并为一次前向计算
+        async with profiler.span("memory.encode"):
+            embedding = await self._repo.engine.encode_async(content)
         self._repo.add_node(subject, predicate, obj,
-                            poignancy, description=content)
-        self._repo.save_to_json(persona_name)
+                            poignancy, description=content,
+                            embedding=embedding)
+        with profiler.span("memory.save"):
+            self._repo.persist(persona_name)
+
+
+def search_memories(requests: List[Tuple[MemoryService, str]], top_k: int = 10) -> List[List[dict]]:
+    """
+    一个 tick 内所有 Agent 的记忆检索：全部查询只编码一次，
+    同一个 MemoryService 的查询合并为一次矩阵乘法。结果与 requests 顺序一致。
+    """
+    if not requests:
+        return []
+    embeddings = embedding_engine.encode([query for _, query in requests])
+    grouped: Dict[int, List[int]] = {}
+    for i, (service, _) in enumerate(requests):
+        grouped.setdefault(id(service), []).append(i)
+
+    results: List[List[dict]] = [[] for _ in requests]
+    for positions in grouped.values():
+        repo = requests[positions[0]][0]._repo
+        found = repo.search_many([requests[i][1] for i in positions], top_k,
+                                 query_embeddings=embeddings[positions])
+        for i, memories in zip(positions, found):
+            results[i] = memories
+    return results
 
 
 # import logging
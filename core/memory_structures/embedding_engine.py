@@ -0,0 +1,153 @@
+# embedding_engine.py
+import asyncio
+import json
+import logging
+import threading
+import time
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+
+from tools.profiler import profiler
+
+logger = logging.getLogger(__name__)
+
+with open('./config/config.json', 'r', encoding='utf-8') as f:
+    config = json.load(f)
+EMBEDDING_CONFIG = config.get("EMBEDDING_CONFIG", {})
+MODEL_NAME = EMBEDDING_CONFIG.get("MODEL_NAME", "all-MiniLM-L6-v2")
+BATCH_WINDOW = EMBEDDING_CONFIG.get("BATCH_WINDOW", 0.05)
+MAX_BATCH_SIZE = EMBEDDING_CONFIG.get("MAX_BATCH_SIZE", 64)
+
+
+class EmbeddingEngine:
+    """
+    进程内共享的句向量模型。
+    - 所有 MemoryRepository 共用同一份模型权重，首次使用时才加载
+    - encode_async 会把同一时间窗口内各 Agent 的请求合并为一次前向计算
+    """
+    def __init__(self, model_name: str = MODEL_NAME,
+                 batch_window: float = BATCH_WINDOW,
+                 max_batch_size: int = MAX_BATCH_SIZE):
+        self.model_name = model_name
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._encode_lock = threading.Lock()
+
+        # 等待合并的请求：(文本, future, 入队时间)
+        self._pending: List[Tuple[str, asyncio.Future, float]] = []
+        self._flush_handle = None
+
+        # 统计计数
+        self._requests = 0
+        self._encoded_texts = 0
+        self._batches = 0
+        self._encode_seconds = 0.0
+        self._wait_seconds = 0.0
+        self._max_batch = 0
+
+    @property
+    def model(self):
+        """懒加载 SentenceTransformer，保证整个进程只加载一次"""
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    start = time.perf_counter()
+                    self._model = SentenceTransformer(self.model_name)
+                    logger.info(f"Loaded embedding model {self.model_name} "
+                                f"in {time.perf_counter() - start:.2f}s")
+        return self._model
+
+    @property
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: Union[str, List[str]]) -> np.ndarray:
+        """
+        同步编码，返回归一化的 float32 向量。
+        传入单个字符串返回一维向量，传入列表返回二维矩阵。
+        """
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+        if not batch:
+            return np.empty((0, self.dimension), dtype=np.float32)
+
+        start = time.perf_counter()
+        with self._encode_lock:
+            vectors = self.model.encode(
+                batch,
+                convert_to_tensor=False,
+                normalize_embeddings=True
+            )
+        elapsed = time.perf_counter() - start
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(batch), -1)
+
+        self._batches += 1
+        self._encoded_texts += len(batch)
+        self._encode_seconds += elapsed
+        self._max_batch = max(self._max_batch, len(batch))
+        return vectors[0] if single else vectors
+
+    async def encode_async(self, text: str) -> np.ndarray:
+        """异步编码单条文本，与同一窗口内的其它请求合并为一个批次"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._requests += 1
+        self._pending.append((text, future, time.perf_counter()))
+
+        if len(self._pending) >= self.max_batch_size:
+            if self._flush_handle is not None:
+                self._flush_handle.cancel()
+            self._flush_handle = None
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._run_batch(batch))
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future, float]]) -> None:
+        # 同一批次内相同文本只编码一次
+        unique_texts = list(dict.fromkeys(text for text, _, _ in batch))
+        loop = asyncio.get_running_loop()
+        try:
+            # 批次由多个 Agent 共享，记在 main 轨道上
+            async with profiler.span("embedding.encode", agent=""):
+                vectors = await loop.run_in_executor(None, self.encode, unique_texts)
+        except Exception as e:
+            logger.error(f"Batch encode failed: {str(e)}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        rows = {text: vectors[i] for i, text in enumerate(unique_texts)}
+        now = time.perf_counter()
+        for text, future, queued_at in batch:
+            self._wait_seconds += now - queued_at
+            if not future.done():
+                future.set_result(rows[text])
+
+    def stats(self) -> Dict[str, float]:
+        """吞吐与延迟统计"""
+        return {
+            "requests": self._requests,
+            "encoded_texts": self._encoded_texts,
+            "batches": self._batches,
+            "max_batch": self._max_batch,
+            "avg_batch": self._encoded_texts / self._batches if self._batches else 0.0,
+            "encode_seconds": self._encode_seconds,
+            "texts_per_second": self._encoded_texts / self._encode_seconds if self._encode_seconds else 0.0,
+            "avg_request_latency": self._wait_seconds / self._requests if self._requests else 0.0,
+        }
+
+
+# 进程级共享实例
+embedding_engine = EmbeddingEngine()
@@ -0,0 +1,251 @@
+# memory_store.py
+import json
+import logging
+import os
+import re
+from collections.abc import MutableMapping
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+with open('./config/config.json', 'r', encoding='utf-8') as f:
+    config = json.load(f)
+COMPACT_EVERY = config.get("MEMORY_CONFIG", {}).get("COMPACT_EVERY", 500)
+
+
+NODE_ID_PATTERN = re.compile(rb'^\{"node_id": "([^"]*)"', re.MULTILINE)
+NODE_PREFIX = b'{"node_id": '
+
+
+def valid_prefix(data: bytes) -> Tuple[List[dict], List[int]]:
+    """
+    日志开头连续的完整、可解析的行，返回节点列表与每行结束（含换行符）的偏移。
+    遇到没有换行符的尾部或无法解析的行（崩溃留下的撕裂行）即停止：之后的行已无法与向量对齐。
+    """
+    nodes, ends = [], []
+    offset = 0
+    while True:
+        end = data.find(b"\n", offset)
+        if end < 0:
+            break
+        try:
+            node = json.loads(data[offset:end])
+        except ValueError:
+            break
+        if not isinstance(node, dict) or "node_id" not in node:
+            break
+        nodes.append(node)
+        offset = end + 1
+        ends.append(offset)
+    return nodes, ends
+
+
+class LazyNodeTable(MutableMapping):
+    """
+    节点元数据的惰性字典：加载时只定位每行的 node_id 与字节范围，
+    访问某个节点时才解析对应的 JSON 行。新写入的节点直接存放在内存中。
+    row_ids 为日志中的行顺序，与向量文件的行一一对应。
+    """
+    def __init__(self, data: bytes, spans: Dict[str, Optional[Tuple[int, int]]],
+                 row_ids: List[str]):
+        self._data = data
+        self._spans = spans
+        self._parsed: Dict[str, dict] = {}
+        self.row_ids = row_ids
+
+    @classmethod
+    def from_log(cls, data: bytes) -> "LazyNodeTable":
+        """
+        扫描完整的日志行；行首不是 node_id 或一行中有多个节点（撕裂行粘连）时逐行解析兜底，
+        兜底时截断在第一个损坏的行
+        """
+        end = data.rfind(b"\n") + 1
+        data = data[:end]
+        matches = list(NODE_ID_PATTERN.finditer(data))
+        lines = data.count(b"\n")
+        if len(matches) == lines and data.count(NODE_PREFIX) == lines:
+            ids = [m.group(1).decode("utf-8") for m in matches]
+            starts = [m.start() for m in matches]
+            bounds = starts[1:] + [end]
+            spans = {nid: (start, stop) for nid, start, stop in zip(ids, starts, bounds)}
+            return cls(data, spans, ids)
+
+        nodes, _ = valid_prefix(data)
+        if len(nodes) < lines:
+            logger.warning(f"Memory log has a corrupt line, ignoring {lines - len(nodes)} trailing lines")
+        table = cls(b"", {}, [])
+        for node in nodes:
+            table[node["node_id"]] = node
+            table.row_ids.append(node["node_id"])
+        return table
+
+    def __getitem__(self, node_id: str) -> dict:
+        node = self._parsed.get(node_id)
+        if node is None:
+            start, stop = self._spans[node_id]
+            node = json.loads(self._data[start:stop])
+            self._parsed[node_id] = node
+        return node
+
+    def __setitem__(self, node_id: str, node: dict) -> None:
+        self._parsed[node_id] = node
+        if node_id not in self._spans:
+            self._spans[node_id] = None
+
+    def __delitem__(self, node_id: str) -> None:
+        del self._spans[node_id]
+        self._parsed.pop(node_id, None)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._spans)
+
+    def __len__(self) -> int:
+        return len(self._spans)
+
+
+class MemoryStore:
+    """
+    单个 persona 的追加式二进制记忆存储：
+    - <name>.nodes.jsonl  节点元数据日志，一行一个节点（不含向量）
+    - <name>.emb.f32      原始 float32 向量，按行追加，与日志行一一对应，可直接 np.memmap
+    每次保存只追加新节点；追加满 COMPACT_EVERY 次后整理一次，
+    丢弃崩溃留下的不完整尾部与重复节点，并原子替换文件。
+    追加前核对两个文件的长度，不一致（上次崩溃）时先截断到最后一个一致的行，
+    保证新写入的日志行与向量行仍然一一对应。
+    """
+    def __init__(self, storage_path: str, name: str, dimension: int,
+                 compact_every: int = COMPACT_EVERY):
+        self.name = name
+        self.dimension = dimension
+        self.compact_every = compact_every
+        self.nodes_path = os.path.join(storage_path, f"{name}.nodes.jsonl")
+        self.embeddings_path = os.path.join(storage_path, f"{name}.emb.f32")
+        self._appends_since_compact = 0
+        self.bytes_written = 0
+        # 已知一致的行数与日志字节数，None 表示尚未核对
+        self._rows: Optional[int] = None
+        self._log_bytes = 0
+        self._finish_rewrite()
+
+    @property
+    def _row_bytes(self) -> int:
+        return self.dimension * 4
+
+    def _file_sizes(self) -> Tuple[int, int]:
+        return tuple(os.path.getsize(p) if os.path.exists(p) else 0
+                     for p in (self.nodes_path, self.embeddings_path))
+
+    def _finish_rewrite(self) -> None:
+        """rewrite 在提交之后、替换完成之前中断时继续替换；未提交的临时文件直接丢弃"""
+        committed = self.nodes_path + ".new"
+        if os.path.exists(committed):
+            if os.path.exists(self.embeddings_path + ".tmp"):
+                os.replace(self.embeddings_path + ".tmp", self.embeddings_path)
+            os.replace(committed, self.nodes_path)
+        for path in (self.nodes_path + ".tmp", self.embeddings_path + ".tmp"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def repair(self) -> None:
+        """把两个文件截断到最后一个日志行与向量行都完整的位置"""
+        data = b""
+        if os.path.exists(self.nodes_path):
+            with open(self.nodes_path, "rb") as f:
+                data = f.read()
+        _, ends = valid_prefix(data)
+        log_size, vector_size = self._file_sizes()
+        rows = min(len(ends), vector_size // self._row_bytes)
+        log_bytes = ends[rows - 1] if rows else 0
+        if log_size != log_bytes or vector_size != rows * self._row_bytes:
+            logger.warning(f"Repairing memory store {self.name}: truncating to {rows} rows")
+            for path, size in ((self.nodes_path, log_bytes), (self.embeddings_path, rows * self._row_bytes)):
+                if os.path.exists(path):
+                    os.truncate(path, size)
+        self._rows = rows
+        self._log_bytes = log_bytes
+
+    def exists(self) -> bool:
+        return os.path.exists(self.nodes_path) and os.path.exists(self.embeddings_path)
+
+    def append(self, nodes: List[dict], vectors: np.ndarray) -> None:
+        """追加若干节点及其向量（行顺序一致）"""
+        if not nodes:
+            return
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(len(nodes), self.dimension)
+        # 崩溃可能留下孤立向量或撕裂的日志行，先截断，否则之后每一行都会错位
+        if self._rows is None or self._file_sizes() != (self._log_bytes, self._rows * self._row_bytes):
+            self.repair()
+        raw = vectors.tobytes()
+        with open(self.embeddings_path, "ab") as f:
+            f.write(raw)
+        lines = "".join(json.dumps(node, ensure_ascii=False) + "\n" for node in nodes).encode("utf-8")
+        with open(self.nodes_path, "ab") as f:
+            f.write(lines)
+        self._rows += len(nodes)
+        self._log_bytes += len(lines)
+        self.bytes_written += len(raw) + len(lines)
+
+        self._appends_since_compact += 1
+        if self._appends_since_compact >= self.compact_every:
+            self.compact()
+
+    def rewrite(self, nodes: List[dict], vectors: np.ndarray) -> None:
+        """
+        用给定内容整体替换存储。两个临时文件写完并落盘后，把日志临时文件改名为 .new 作为提交点，
+        之后中断的替换由下次打开时的 _finish_rewrite 继续完成，两个文件总是成对替换。
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(len(nodes), self.dimension)
+        tmp_nodes = self.nodes_path + ".tmp"
+        tmp_embeddings = self.embeddings_path + ".tmp"
+        raw = vectors.tobytes()
+        lines = "".join(json.dumps(node, ensure_ascii=False) + "\n" for node in nodes).encode("utf-8")
+        for path, payload in ((tmp_embeddings, raw), (tmp_nodes, lines)):
+            with open(path, "wb") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_nodes, self.nodes_path + ".new")
+        self._finish_rewrite()
+        self._rows = len(nodes)
+        self._log_bytes = len(lines)
+        self.bytes_written += len(raw) + len(lines)
+        self._appends_since_compact = 0
+
+    def open_readonly(self) -> Tuple[LazyNodeTable, np.ndarray]:
+        """
+        启动时使用：节点元数据惰性解析，向量以只读 memmap 零拷贝映射。
+        两者行数可能因崩溃而不一致，由调用方对齐。
+        """
+        with open(self.nodes_path, "rb") as f:
+            nodes = LazyNodeTable.from_log(f.read())
+        rows = os.path.getsize(self.embeddings_path) // (self.dimension * 4)
+        if rows == 0:
+            vectors = np.empty((0, self.dimension), dtype=np.float32)
+        else:
+            vectors = np.memmap(self.embeddings_path, dtype=np.float32, mode="r",
+                                shape=(rows, self.dimension))
+        return nodes, vectors
+
+    def load(self) -> Tuple[List[dict], np.ndarray]:
+        """读取全部节点与向量，忽略不完整的尾部记录与损坏行之后的内容"""
+        with open(self.nodes_path, "rb") as f:
+            nodes, _ = valid_prefix(f.read())
+        vectors = np.fromfile(self.embeddings_path, dtype=np.float32)
+        rows = min(len(nodes), vectors.size // self.dimension)
+        vectors = vectors[:rows * self.dimension].reshape(rows, self.dimension)
+        return nodes[:rows], vectors
+
+    def compact(self) -> None:
+        """整理存储：截断不完整记录，同一 node_id 只保留最后一条"""
+        nodes, vectors = self.load()
+        latest = {}
+        for row, node in enumerate(nodes):
+            latest[node["node_id"]] = row
+        keep = sorted(latest.values())
+        self.rewrite([nodes[row] for row in keep], vectors[keep])
+        logger.debug(f"Compacted memory store {self.name}: {len(keep)} nodes")
+
+    def disk_size(self) -> int:
+        return sum(os.path.getsize(p) for p in (self.nodes_path, self.embeddings_path) if os.path.exists(p))
@@ -0,0 +1,235 @@
+# vector_index.py
+import logging
+from typing import Dict, Tuple, Type
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INITIAL_CAPACITY = 64  # 嵌入矩阵初始容量（行）
+
+
+def _top_k_rows(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """对二维相似度矩阵逐行取 top-k（每行按相似度降序）"""
+    top_k = min(top_k, scores.shape[1])
+    if top_k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    if top_k < scores.shape[1]:
+        part = np.argpartition(scores, -top_k, axis=1)[:, -top_k:]
+    else:
+        part = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+    order = np.argsort(np.take_along_axis(scores, part, axis=1), axis=1)[:, ::-1]
+    return np.take_along_axis(part, order, axis=1)
+
+
+def _top_k(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """argpartition 取前 k 个位置，再只对这 k 个排序"""
+    if top_k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if top_k < scores.size:
+        part = np.argpartition(scores, -top_k)[-top_k:]
+    else:
+        part = np.arange(scores.size)
+    return part[np.argsort(scores[part])[::-1]]
+
+
+class ExactIndex:
+    """
+    精确检索：在预分配、容量倍增的 float32 矩阵上做内积（向量均已归一化，即余弦相似度）。
+    行号即插入顺序。
+    """
+    def __init__(self, dimension: int, capacity: int = INITIAL_CAPACITY):
+        self.dimension = dimension
+        self.reset(capacity)
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """有效行的视图（不复制）"""
+        return self._buffer[:self._size]
+
+    def reset(self, capacity: int = INITIAL_CAPACITY) -> None:
+        self._buffer = np.empty((max(capacity, 1), self.dimension), dtype=np.float32)
+        self._size = 0
+
+    def reserve(self, capacity: int) -> None:
+        """预留容量，批量加载前调用可避免多次扩容"""
+        if capacity > self._buffer.shape[0]:
+            grown = np.empty((capacity, self.dimension), dtype=np.float32)
+            grown[:self._size] = self._buffer[:self._size]
+            self._buffer = grown
+
+    def attach(self, vectors: np.ndarray) -> None:
+        """
+        直接以已有矩阵（如只读 memmap）作为存储，不复制。
+        之后第一次 add 时才拷贝到可写缓冲区。
+        """
+        self.reset(1)
+        self._buffer = vectors
+        self._size = vectors.shape[0]
+
+    def add(self, vector: np.ndarray) -> int:
+        """追加一行并返回行号，容量不足时倍增，插入均摊 O(d)"""
+        if self._size == self._buffer.shape[0] or not self._buffer.flags.writeable:
+            self.reserve(max(self._buffer.shape[0], 1) * 2)
+        row = self._size
+        self._buffer[row] = np.asarray(vector, dtype=np.float32).reshape(-1)
+        self._size += 1
+        return row
+
+    def search(self, query: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """返回相似度最高的 top_k 个 (行号, 相似度)，按相似度降序"""
+        scores = self.vectors @ np.asarray(query, dtype=np.float32).reshape(-1)
+        rows = _top_k(scores, top_k)
+        return rows, scores[rows]
+
+    def search_many(self, queries: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """批量检索：一次矩阵乘法算出全部相似度，返回形状为 (len(queries), k) 的行号与相似度"""
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dimension)
+        scores = queries @ self.vectors.T
+        rows = _top_k_rows(scores, top_k)
+        return rows, np.take_along_axis(scores, rows, axis=1)
+
+    def range_search(self, query: np.ndarray, threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+        """返回相似度不低于 threshold 的全部 (行号, 相似度)"""
+        scores = self.vectors @ np.asarray(query, dtype=np.float32).reshape(-1)
+        rows = np.flatnonzero(scores >= threshold)
+        return rows, scores[rows]
+
+
+class IVFIndex(ExactIndex):
+    """
+    近似检索：倒排文件（IVF）索引，完全基于 numpy。
+    - 行数达到 train_threshold 后用 k-means 训练 sqrt(N) 个簇中心
+    - 之后每次 add 只把新向量挂到最近的簇上，行数翻倍时重新训练
+    - 查询只在与 query 最近的 nprobe 个簇里做精确内积
+    训练之前退化为精确检索。
+    """
+    def __init__(self, dimension: int, capacity: int = INITIAL_CAPACITY,
+                 nprobe: int = 8, train_threshold: int = 1024,
+                 kmeans_iters: int = 10, seed: int = 0):
+        self.nprobe = nprobe
+        self.train_threshold = train_threshold
+        self.kmeans_iters = kmeans_iters
+        self._rng = np.random.default_rng(seed)
+        super().__init__(dimension, capacity)
+
+    def reset(self, capacity: int = INITIAL_CAPACITY) -> None:
+        super().reset(capacity)
+        self._centroids = None
+        self._trained_size = 0
+        self._lists = []
+        self._list_sizes = np.empty(0, dtype=np.int64)
+
+    def attach(self, vectors: np.ndarray) -> None:
+        super().attach(vectors)
+        if self._size >= self.train_threshold:
+            self.train()
+
+    @property
+    def trained(self) -> bool:
+        return self._centroids is not None
+
+    def add(self, vector: np.ndarray) -> int:
+        row = super().add(vector)
+        if self.trained and self._size < 2 * self._trained_size:
+            self._assign(np.array([row]))
+        elif self._size >= self.train_threshold:
+            self.train()
+        return row
+
+    def train(self) -> None:
+        """在当前全部向量上训练簇中心并重建倒排表"""
+        n = self._size
+        n_lists = max(1, int(np.sqrt(n)))
+        sample_size = min(n, n_lists * 64)
+        sample = self.vectors[self._rng.choice(n, sample_size, replace=False)]
+
+        centroids = sample[self._rng.choice(sample_size, n_lists, replace=False)].copy()
+        for _ in range(self.kmeans_iters):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=n_lists)
+            nonempty = counts > 0
+            centroids[nonempty] = sums[nonempty]
+            # 球面 k-means：簇中心重新归一化
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            centroids /= np.maximum(norms, 1e-12)
+
+        self._centroids = centroids.astype(np.float32)
+        self._lists = [np.empty(16, dtype=np.int64) for _ in range(n_lists)]
+        self._list_sizes = np.zeros(n_lists, dtype=np.int64)
+        self._trained_size = n
+        self._assign(np.arange(n))
+        logger.debug(f"IVF index trained: {n} vectors, {n_lists} lists")
+
+    def _assign(self, rows: np.ndarray, chunk: int = 65536) -> None:
+        if rows.size == 1:
+            label = int(np.argmax(self._centroids @ self._buffer[rows[0]]))
+            self._append_to_list(label, rows)
+            return
+        for start in range(0, rows.size, chunk):
+            part = rows[start:start + chunk]
+            labels = np.argmax(self._buffer[part] @ self._centroids.T, axis=1)
+            for label in np.unique(labels):
+                self._append_to_list(label, part[labels == label])
+
+    def _append_to_list(self, label: int, members: np.ndarray) -> None:
+        size = self._list_sizes[label]
+        bucket = self._lists[label]
+        if size + members.size > bucket.size:
+            grown = np.empty(max(bucket.size * 2, size + members.size), dtype=np.int64)
+            grown[:size] = bucket[:size]
+            self._lists[label] = bucket = grown
+        bucket[size:size + members.size] = members
+        self._list_sizes[label] = size + members.size
+
+    def _candidates(self, query: np.ndarray) -> np.ndarray:
+        probes = _top_k(self._centroids @ query, min(self.nprobe, len(self._lists)))
+        return np.concatenate([self._lists[p][:self._list_sizes[p]] for p in probes])
+
+    def search(self, query: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        if not self.trained:
+            return super().search(query, top_k)
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        candidates = self._candidates(query)
+        scores = self._buffer[candidates] @ query
+        best = _top_k(scores, top_k)
+        return candidates[best], scores[best]
+
+    def search_many(self, queries: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        if not self.trained:
+            return super().search_many(queries, top_k)
+        # 各 query 探查的簇不同，逐条检索后按最短结果对齐
+        results = [self.search(q, top_k) for q in np.asarray(queries, dtype=np.float32).reshape(-1, self.dimension)]
+        k = min((rows.size for rows, _ in results), default=0)
+        rows = np.array([r[:k] for r, _ in results], dtype=np.int64).reshape(len(results), k)
+        scores = np.array([s[:k] for _, s in results], dtype=np.float32).reshape(len(results), k)
+        return rows, scores
+
+    def range_search(self, query: np.ndarray, threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+        if not self.trained:
+            return super().range_search(query, threshold)
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        candidates = self._candidates(query)
+        scores = self._buffer[candidates] @ query
+        hits = scores >= threshold
+        return candidates[hits], scores[hits]
+
+
+INDEX_BACKENDS: Dict[str, Type[ExactIndex]] = {
+    "exact": ExactIndex,
+    "ivf": IVFIndex,
+}
+
+
+def create_index(backend: str, dimension: int, **kwargs) -> ExactIndex:
+    """按名称创建向量索引，未知名称抛出 ValueError"""
+    try:
+        index_cls = INDEX_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown vector index backend: {backend}") from None
+    return index_cls(dimension, **kwargs)
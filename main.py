@@ -1,25 +1,110 @@
 # main.py
+import argparse
 import asyncio
 import json
-from backend_server.minecraft_bot_manager import AsyncBotManager
+from backend_server.agent_shards import STRAGGLER_TIMEOUT, TRANSPORT, WORKERS, AgentShards
+from backend_server.shard_transport import parse_address
 from backend_server.global_timer import GlobalTimer
+from tools.profiler import METRICS_PORT, profiler
 
-async def main():
+def report_profile(trace_path):
+    """打印各阶段耗时汇总，并导出 Chrome trace"""
+    print(profiler.format_summary())
+    print(profiler.format_summary(by_agent=True))
+    profiler.export_chrome_trace(trace_path)
+    print(f"Chrome trace written to {trace_path}")
+
+async def run_sharded(agent_names, headless, minutes, llm_backend, trace, **shard_options):
+    """本进程只做协调：Agent、记忆与 bot 连接分布在各 worker 进程（可在其他主机）中"""
+    shards = AgentShards(agent_names, headless=headless, llm_backend=llm_backend, **shard_options)
+    try:
+        if headless:
+            from backend_server.headless_world import HeadlessWorld
+            timer = GlobalTimer(agent_names, None, world=HeadlessWorld(), shards=shards,
+                                wall_seconds_per_tick=0, fast_forward=True)
+        else:
+            timer = GlobalTimer(agent_names, None, shards=shards)
+        await timer.start(max_minutes=minutes)
+    finally:
+        shards.close()
+    print(timer.stats())
+    print(shards.stats())
+    if trace:
+        report_profile(trace)
+
+async def main(headless=False, minutes=None, llm_backend=None, trace=None, metrics_port=METRICS_PORT,
+               workers=WORKERS, transport=TRANSPORT, listen=None, straggler_timeout=STRAGGLER_TIMEOUT):
     # 读取配置，获取所有 Agent 名称
     with open('./config/config.json', 'r', encoding='utf-8') as f:
         config = json.load(f)
     agent_names = config.get("AGENTS_NAME", [])
+    if llm_backend is not None:
+        from backend_server.llm_gateway import gateway
+        gateway.set_backend(llm_backend)
+    if metrics_port:
+        # Prometheus 从 http://127.0.0.1:<port>/metrics 抓取各阶段耗时直方图
+        profiler.serve(metrics_port)
+
+    if listen:
+        # 等待其他主机上的 worker 连接：python -m backend_server.agent_shards --connect HOST:PORT
+        await run_sharded(agent_names, headless, minutes, llm_backend, trace, workers=workers,
+                          transport="tcp", address=parse_address(listen), launch=False,
+                          straggler_timeout=straggler_timeout)
+        return
+    if workers > 1:
+        await run_sharded(agent_names, headless, minutes, llm_backend, trace, workers=workers,
+                          transport=transport, straggler_timeout=straggler_timeout)
+        return
+
+    if headless:
+        # 进程内世界替身：不连接服务器，不按真实时间等待
+        from backend_server.headless_world import HeadlessWorld, HeadlessBotManager
+        world = HeadlessWorld()
+        bot_manager = [HeadlessBotManager(name, world) for name in agent_names]
+        timer = GlobalTimer(agent_names, bot_manager, world=world,
+                            wall_seconds_per_tick=0, fast_forward=True)
+        await timer.start(max_minutes=minutes)
+        print(timer.stats())
+        print(world.stats())
+        if trace:
+            report_profile(trace)
+        return
 
+    from backend_server.minecraft_bot_manager import AsyncBotManager
     # 初始化 Minecraft Bot 管理器
     # bot_manager = AsyncBotManager("Ethan Choi", loop=asyncio.get_event_loop())
     bot_manager = [AsyncBotManager(name, loop=asyncio.get_event_loop()) 
            for name in config["AGENTS_NAME"]]
     # 创建并启动全局计时器
     timer = GlobalTimer(agent_names, bot_manager)
-    await timer.start()
+    await timer.start(max_minutes=minutes)
+    if trace:
+        report_profile(trace)
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--headless", action="store_true",
+                        help="不连接 Minecraft 服务器，使用进程内世界替身快速模拟")
+    parser.add_argument("--minutes", type=int, default=None,
+                        help="模拟的游戏内分钟数，默认一直运行")
+    parser.add_argument("--llm-backend", choices=["ollama", "openai", "replay"], default=None,
+                        help="覆盖 LLM_CONFIG.BACKEND，replay 可离线复现")
+    parser.add_argument("--trace", default=None,
+                        help="结束时打印各阶段耗时并把 Chrome trace 写入该路径")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                        help="在该端口提供 Prometheus /metrics")
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help="把 Agent 分到多个进程中运行，覆盖 SHARD_CONFIG.WORKERS")
+    parser.add_argument("--transport", choices=AgentShards.TRANSPORTS, default=TRANSPORT,
+                        help="本机 worker 使用 Pipe 还是 TCP 通信")
+    parser.add_argument("--listen", default=None,
+                        help="在 HOST:PORT 等待 --workers 个其他主机上的 worker 连接")
+    parser.add_argument("--straggler-timeout", type=float, default=STRAGGLER_TIMEOUT,
+                        help="每个 tick 最多等待 worker 的秒数，超时的 worker 不阻塞模拟")
+    args = parser.parse_args()
+    asyncio.run(main(headless=args.headless, minutes=args.minutes, llm_backend=args.llm_backend,
+                     trace=args.trace, metrics_port=args.metrics_port, workers=args.workers,
+                     transport=args.transport, listen=args.listen, straggler_timeout=args.straggler_timeout))
 
 
 # import asyncio
@@ -0,0 +1,167 @@
+# tests/test_memory_store.py
+# 在仓库根目录运行: python -m pytest -q （各模块在导入时读取 ./config/config.json）
+import json
+import os
+
+import numpy as np
+import pytest
+
+from benchmarks.common import RandomEmbeddingEngine
+from core.memory_structures import memory_store
+from core.memory_structures.agents_memory_manager import MemoryRepository
+from core.memory_structures.memory_store import LazyNodeTable, MemoryStore
+
+DIM = 4
+NAME = "Test Agent"
+
+
+def node(i: int) -> dict:
+    return {"node_id": f"node_{i}", "subject": NAME, "predicate": "is", "object": f"thing {i}",
+            "description": f"{NAME} is doing thing {i}."}
+
+
+def vector(i: int) -> np.ndarray:
+    return np.full((1, DIM), i, dtype=np.float32)
+
+
+def assert_aligned(store: MemoryStore, expected: list) -> None:
+    """每个日志行都对应自己的向量"""
+    nodes, vectors = store.load()
+    assert [n["node_id"] for n in nodes] == [f"node_{i}" for i in expected]
+    assert vectors[:, 0].tolist() == [float(i) for i in expected]
+    table, mapped = store.open_readonly()
+    assert table.row_ids == [f"node_{i}" for i in expected]
+    assert mapped.shape[0] == len(expected)
+
+
+def test_orphan_vector_after_crash_before_log_write(tmp_path):
+    store = MemoryStore(str(tmp_path), NAME, DIM)
+    store.append([node(0)], vector(0))
+    # 进程在写完向量、写日志之前退出
+    with open(store.embeddings_path, "ab") as f:
+        f.write(vector(1).tobytes())
+
+    store = MemoryStore(str(tmp_path), NAME, DIM)
+    store.append([node(2)], vector(2))
+    store.append([node(3)], vector(3))
+    assert_aligned(store, [0, 2, 3])
+
+
+def test_torn_log_line_is_not_glued_to_next_append(tmp_path):
+    store = MemoryStore(str(tmp_path), NAME, DIM)
+    store.append([node(0)], vector(0))
+    # 进程在写日志的过程中退出：向量完整，日志行没有换行符
+    with open(store.embeddings_path, "ab") as f:
+        f.write(vector(1).tobytes())
+    with open(store.nodes_path, "ab") as f:
+        f.write(json.dumps(node(1)).encode("utf-8")[:20])
+
+    store = MemoryStore(str(tmp_path), NAME, DIM)
+    store.append([node(2)], vector(2))
+    assert_aligned(store, [0, 2])
+    with open(store.nodes_path, "rb") as f:
+        assert all(json.loads(line) for line in f)
+
+
+def test_corrupt_line_in_the_middle_is_truncated_on_load(tmp_path):
+    # 旧版本留下的粘连行：撕裂的节点 1 与节点 2 在同一行
+    store = MemoryStore(str(tmp_path), NAME, DIM)
+    store.append([node(0)], vector(0))
+    glued = json.dumps(node(1)).encode("utf-8")[:30] + json.dumps(node(2)).encode("utf-8") + b"\n"
+    with open(store.nodes_path, "ab") as f:
+        f.write(glued + json.dumps(node(3)).encode("utf-8") + b"\n")
+    with open(store.embeddings_path, "ab") as f:
+        f.write(np.concatenate([vector(1), vector(2), vector(3)]).tobytes())
+
+    with open(store.nodes_path, "rb") as f:
+        assert LazyNodeTable.from_log(f.read()).row_ids == ["node_0"]
+    store = MemoryStore(str(tmp_path), NAME, DIM)
+    assert store.load()[0] == [node(0)]
+    store.append([node(4)], vector(4))
+    assert_aligned(store, [0, 4])
+
+
+def test_interrupted_rewrite_is_completed_as_a_pair(tmp_path):
+    store = MemoryStore(str(tmp_path), NAME, DIM)
+    store.append([node(0), node(1)], np.concatenate([vector(0), vector(1)]))
+    # rewrite 在提交点之后、替换两个文件之前中断
+    with open(store.embeddings_path + ".tmp", "wb") as f:
+        f.write(vector(5).tobytes())
+    with open(store.nodes_path + ".new", "wb") as f:
+        f.write(json.dumps(node(5)).encode("utf-8") + b"\n")
+
+    store = MemoryStore(str(tmp_path), NAME, DIM)
+    assert_aligned(store, [5])
+
+
+def test_uncommitted_rewrite_is_discarded(tmp_path):
+    store = MemoryStore(str(tmp_path), NAME, DIM)
+    store.append([node(0)], vector(0))
+    with open(store.embeddings_path + ".tmp", "wb") as f:
+        f.write(vector(5).tobytes())
+
+    store = MemoryStore(str(tmp_path), NAME, DIM)
+    store.append([node(1)], vector(1))
+    assert_aligned(store, [0, 1])
+
+
+def test_compact_keeps_latest_node_and_alignment(tmp_path):
+    store = MemoryStore(str(tmp_path), NAME, DIM, compact_every=3)
+    store.append([node(0)], vector(0))
+    store.append([node(1)], vector(1))
+    store.append([node(0)], vector(7))
+    nodes, vectors = store.load()
+    assert [n["node_id"] for n in nodes] == ["node_1", "node_0"]
+    assert vectors[:, 0].tolist() == [1.0, 7.0]
+
+
+@pytest.fixture
+def windows_replace(monkeypatch):
+    """与 Windows 一样，拒绝替换仍被本进程映射的文件"""
+    if not os.path.exists("/proc/self/maps"):
+        pytest.skip("需要 /proc/self/maps 判断文件是否仍被映射")
+    replace = os.replace
+
+    def checked_replace(src, dst):
+        with open("/proc/self/maps", "r") as f:
+            if os.path.realpath(dst) in f.read():
+                raise PermissionError(f"{dst} is still memory-mapped")
+        replace(src, dst)
+    monkeypatch.setattr(memory_store.os, "replace", checked_replace)
+
+
+def persisted_repository(tmp_path, count: int) -> MemoryRepository:
+    engine = RandomEmbeddingEngine(DIM)
+    repo = MemoryRepository(str(tmp_path), engine=engine)
+    for i in range(1, count):
+        repo.add_node(NAME, "is", f"thing {i}", 1.0, f"{NAME} is doing thing {i}.")
+    repo.persist(NAME)
+    return repo
+
+
+@pytest.mark.parametrize("crash", ["orphan_vector", "missing_vector"])
+def test_repository_load_rewrites_misaligned_store_without_mapping(tmp_path, windows_replace, crash):
+    persisted_repository(tmp_path, 3)
+    store = MemoryStore(str(tmp_path), NAME, DIM)
+    if crash == "orphan_vector":
+        with open(store.embeddings_path, "ab") as f:
+            f.write(vector(9).tobytes())
+        expected_rows = 3
+    else:
+        with open(store.nodes_path, "ab") as f:
+            f.write(json.dumps(node(9)).encode("utf-8") + b"\n")
+        expected_rows = 4
+
+    repo = MemoryRepository(str(tmp_path), engine=RandomEmbeddingEngine(DIM))
+    repo.load(NAME)
+    assert len(repo._row_ids) == expected_rows
+    nodes, vectors = MemoryStore(str(tmp_path), NAME, DIM).load()
+    assert len(nodes) == vectors.shape[0] == expected_rows
+    np.testing.assert_allclose(vectors, repo.embeddings)
+
+    # 重写之后的追加仍与日志行对齐
+    repo.add_node(NAME, "is", "new thing", 1.0, f"{NAME} is doing a new thing.")
+    repo.persist(NAME)
+    nodes, vectors = MemoryStore(str(tmp_path), NAME, DIM).load()
+    assert [n["node_id"] for n in nodes] == repo._row_ids
+    assert vectors.shape[0] == expected_rows + 1
@@ -0,0 +1,110 @@
+# tests/test_plan_parsing.py
+# 在仓库根目录运行: python -m pytest -q （各模块在导入时读取 ./config/config.json）
+import asyncio
+import json
+
+import pytest
+
+from core.cognitive_modules.plan import plan
+from core.cognitive_modules.plan.plan import PlanManager
+
+WAKE = 8
+
+
+def parse(data, wake_up_hour: int = WAKE) -> dict:
+    response = data if isinstance(data, str) else json.dumps(data)
+    return PlanManager("", None, hourly_mode="structured")._parse_structured_schedule(response, wake_up_hour)
+
+
+@pytest.mark.parametrize("value, expected", [
+    (8, 8), ("8", 8), ("08:00", 8), ("20:00", 20), ("08:00 AM", 8), ("8 pm", 20), ("8 p.m.", 20),
+    ("12:00 AM", 0), ("12 am", 0), ("12:00 PM", 12), ("12 pm", 12),
+    (24, None), (-1, None), ("24:00", None), ("13 pm", None), ("0 am", None),
+    (True, None), (8.0, None), (None, None), ("noon", None), ("8 o'clock", None),
+])
+def test_parse_hour(value, expected):
+    assert PlanManager._parse_hour(value) == expected
+
+
+def test_schedule_object_and_surrounding_text():
+    response = ('Sure! {"schedule": [{"hour": "08:00 AM", "activity": "opening the cafe."}, '
+                '{"hour": "09:00 AM", "activity": "serving  customers"}]} Have a nice day.')
+    assert parse(response) == {8: "opening the cafe", 9: "serving customers"}
+
+
+def test_bare_list_of_entries():
+    assert parse([{"hour": 8, "activity": "eating breakfast"}, {"hour": "9 am", "activity": "reading"}]) == {
+        8: "eating breakfast", 9: "reading"}
+
+
+def test_bare_list_of_strings_follows_wake_up_hour():
+    assert parse(["eating breakfast", "reading", "walking"], wake_up_hour=21) == {
+        21: "eating breakfast", 22: "reading", 23: "walking"}
+
+
+def test_start_end_range_is_expanded():
+    hours = parse({"schedule": [{"start": "09:00 AM", "end": "12:00 PM", "activity": "working"},
+                                {"start": "12 pm", "end": "1 pm", "activity": "lunch"}]})
+    assert hours == {9: "working", 10: "working", 11: "working", 12: "lunch"}
+
+
+def test_range_ending_at_midnight_covers_last_hour():
+    hours = parse({"schedule": [{"start": "10:00 PM", "end": "12:00 AM", "activity": "watching tv"}]})
+    assert hours == {22: "watching tv", 23: "watching tv"}
+
+
+def test_duplicate_hours_keep_first_entry():
+    hours = parse({"schedule": [{"start": 8, "end": 10, "activity": "working"},
+                                {"hour": "9 am", "activity": "napping"},
+                                {"hour": 10, "activity": "lunch"},
+                                {"hour": 10, "activity": "second lunch"}]})
+    assert hours == {8: "working", 9: "working", 10: "lunch"}
+
+
+def test_out_of_range_and_sleeping_hours_are_dropped():
+    hours = parse({"schedule": [{"hour": "06:00 AM", "activity": "sleeping in"},
+                                {"hour": 24, "activity": "too late"},
+                                {"hour": "13 pm", "activity": "not an hour"},
+                                {"start": 7, "end": 9, "activity": "jogging"},
+                                {"start": 22, "end": 30, "activity": "bad end"}]})
+    assert hours == {8: "jogging"}
+
+
+def test_invalid_activities_and_entries_are_dropped():
+    long_activity = " ".join(["word"] * (plan.MAX_ACTIVITY_WORDS + 1))
+    hours = parse({"schedule": [{"hour": 8, "activity": long_activity},
+                                {"hour": 9, "activity": "{nested}"},
+                                {"hour": 10, "activity": "   "},
+                                {"hour": 11},
+                                42,
+                                {"hour": 12, "activity": "lunch"}]})
+    assert hours == {12: "lunch"}
+
+
+@pytest.mark.parametrize("response", ["no json here", '{"schedule": "busy"}', "{broken", "[1, 2"])
+def test_unusable_response_returns_empty(response):
+    assert parse(response) == {}
+
+
+def test_missing_hours_fall_back_to_per_hour_prompts(monkeypatch):
+    structured = {"schedule": [{"hour": "08:00 PM", "activity": "cooking dinner"},
+                               {"hour": "09:00 PM", "activity": "reading"},
+                               {"hour": "11:00 PM", "activity": "not valid " * 10}]}
+    fallback_calls = []
+
+    async def run_prompt(prompt):
+        return json.dumps(structured)
+
+    async def per_hour(persona, daily_plan, cur_date, curr_hour_str, activity, hour_str):
+        fallback_calls.append(curr_hour_str)
+        return f"winding down at {curr_hour_str}"
+
+    monkeypatch.setattr(plan.llm, "run_prompt", run_prompt)
+    manager = PlanManager("Name: Test Agent", None, hourly_mode="structured")
+    monkeypatch.setattr(manager, "run_llm_prompt_generate_hourly_schedule", per_hour)
+
+    schedule = asyncio.run(manager.generate_hourly_schedule("Name: Test Agent", 20, ["relax"]))
+    assert fallback_calls == ["10:00 PM", "11:00 PM"]
+    assert manager.fallback_hours == 2
+    assert schedule == [["sleeping", 20 * 60], ["cooking dinner", 60], ["reading", 60],
+                        ["winding down at 10:00 PM", 60], ["winding down at 11:00 PM", 60]]
@@ -0,0 +1,116 @@
+# tests/test_rcon_client.py
+# 在仓库根目录运行: python -m pytest -q （各模块在导入时读取 ./config/config.json）
+import socket
+import struct
+import threading
+
+import pytest
+
+from backend_server.rcon_client import RconClient
+
+CHUNK = 4096
+
+
+def packet(request_id: int, packet_type: int, payload: str) -> bytes:
+    body = struct.pack("<ii", request_id, packet_type) + payload.encode("utf-8") + b"\x00\x00"
+    return struct.pack("<i", len(body)) + body
+
+
+class VanillaLikeServer:
+    """
+    模仿原版服务器的 RCON 线程：每次读取最多 1460 字节，读到的不是恰好一个包就断开连接；
+    回复按 4096 字符分包，未知类型的包回复 "Unknown request"。
+    drop_before 中的指令第一次到达时不执行、直接断开连接。
+    """
+    def __init__(self, replies=None, drop_before=()):
+        self.replies = replies or {}
+        self.drop_before = set(drop_before)
+        self.executed = []
+        self.rejected_reads = 0
+        self._listener = socket.create_server(("127.0.0.1", 0))
+        self.port = self._listener.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self._listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _respond(self, conn, request_id: int, text: str):
+        while True:
+            conn.sendall(packet(request_id, 0, text[:CHUNK]))
+            text = text[CHUNK:]
+            if not text:
+                return
+
+    def _serve(self, conn):
+        with conn:
+            while True:
+                data = conn.recv(1460)
+                if not data:
+                    return
+                (length,) = struct.unpack("<i", data[:4])
+                if length != len(data) - 4:
+                    self.rejected_reads += 1
+                    return
+                request_id, packet_type = struct.unpack("<ii", data[4:12])
+                payload = data[12:-2].decode("utf-8")
+                if packet_type == 3:
+                    conn.sendall(packet(request_id, 2, ""))
+                elif packet_type == 2:
+                    if payload in self.drop_before:
+                        self.drop_before.discard(payload)
+                        return
+                    self.executed.append(payload)
+                    self._respond(conn, request_id, self.replies.get(payload, f"ok {payload}"))
+                else:
+                    self._respond(conn, request_id, f"Unknown request {packet_type:x}")
+
+    def close(self):
+        self._listener.close()
+
+
+@pytest.fixture
+def server():
+    servers = []
+
+    def start(**kwargs):
+        servers.append(VanillaLikeServer(**kwargs))
+        return servers[-1]
+    yield start
+    for s in servers:
+        s.close()
+
+
+def test_batch_keeps_one_packet_in_flight(server):
+    srv = server()
+    client = RconClient(port=srv.port, backoff_base=0.01, max_retries=1)
+    futures = client.command_batch(["time set 1000", "say a", "say b", "weather clear"])
+    assert [f.result(5) for f in futures] == ["ok time set 1000", "ok say a", "ok say b", "ok weather clear"]
+    client.close()
+    assert srv.executed == ["time set 1000", "say a", "say b", "weather clear"]
+    assert srv.rejected_reads == 0
+    assert client.stats()["reconnects"] == 0
+
+
+def test_multi_packet_reply_is_reassembled(server):
+    long_reply = "x" * (2 * CHUNK) + "tail"
+    srv = server(replies={"list": long_reply})
+    client = RconClient(port=srv.port, backoff_base=0.01, max_retries=1)
+    futures = client.command_batch(["list", "say after"])
+    assert futures[0].result(5) == long_reply
+    assert futures[1].result(5) == "ok say after"
+    client.close()
+
+
+def test_reconnect_resends_only_unacknowledged_commands(server):
+    srv = server(drop_before={"say b"})
+    client = RconClient(port=srv.port, backoff_base=0.01, max_retries=2)
+    futures = client.command_batch(["say a", "say b", "say c"])
+    assert [f.result(5) for f in futures] == ["ok say a", "ok say b", "ok say c"]
+    client.close()
+    assert srv.executed == ["say a", "say b", "say c"]
+    assert client.stats()["reconnects"] == 1
@@ -0,0 +1,140 @@
+# tests/test_wake_queue.py
+# 在仓库根目录运行: python -m pytest -q （各模块在导入时读取 ./config/config.json）
+from types import SimpleNamespace
+
+import pytest
+
+from backend_server.global_timer import GlobalTimer
+from backend_server.wake_queue import WakeQueue
+from core.cognitive_modules.plan.schedule_index import DAY_MINUTES, ScheduleIndex
+
+TICK = 5
+# 活动结束于 420、467、1007、1440
+FULL_DAY = [["sleeping", 420], ["eating breakfast", 47], ["working", 540], ["relaxing", 433]]
+# 日程只排到 600 分钟
+SHORT_DAY = [["sleeping", 480], ["working", 120]]
+
+
+class FakeAgent:
+    """只提供计时器调度用到的属性"""
+    def __init__(self, name, daily_plan):
+        self.name = name
+        self.daily_plan = daily_plan
+        self.isChatting = False
+        self.should_react = False
+        self.today_is_chatted = False
+        self._index = ScheduleIndex(daily_plan)
+
+    def get_next_change(self, current_time):
+        return self._index.next_change(current_time)
+
+
+def make_timer(*plans):
+    agents = [FakeAgent(f"Agent {i}", plan) for i, plan in enumerate(plans)]
+    shards = SimpleNamespace(proxies=agents)
+    return GlobalTimer([], None, scheduler="event", tick_minutes=TICK, world=object(), shards=shards)
+
+
+def event(subject, description, obj="work"):
+    return {"subject": subject, "predicate": "is", "object": obj, "description": description}
+
+
+def test_earlier_schedule_replaces_later():
+    queue = WakeQueue()
+    queue.schedule("a", 500)
+    queue.schedule("a", 490)
+    queue.schedule("a", 495)
+    assert len(queue) == 1
+    assert queue.next_time() == 490
+    assert queue.pop_due(489) == []
+    assert queue.pop_due(490) == ["a"]
+    assert queue.next_time() is None
+
+
+def test_stale_heap_entries_are_dropped():
+    queue = WakeQueue()
+    queue.schedule("a", 500)
+    queue.schedule("b", 505)
+    queue.schedule("a", 480)
+    assert queue.pop_due(480) == ["a"]
+    # "a" 在 500 的旧条目已失效，不会再次出队
+    assert queue.next_time() == 505
+    assert queue.pop_due(DAY_MINUTES) == ["b"]
+    assert len(queue) == 0
+    assert queue.next_time() is None
+
+
+def test_pop_due_returns_all_due_in_time_order():
+    queue = WakeQueue()
+    for key, time in (("c", 510), ("a", 500), ("b", 505), ("d", 520)):
+        queue.schedule(key, time)
+    assert queue.pop_due(510) == ["a", "b", "c"]
+    assert queue.next_time() == 520
+    # 出队后可以重新预约任意时间
+    queue.schedule("a", 530)
+    assert queue.pop_due(530) == ["d", "a"]
+
+
+@pytest.mark.parametrize("sim_time, expected", [
+    (415, 420),    # 420 结束，本身就在网格上
+    (420, 470),    # 467 结束，对齐到下一个 tick
+    (425, 470),
+    (1005, 1010),  # 距离结束不足一个 tick
+    (465, 470),
+    (470, 1010),   # 1007 结束
+])
+def test_next_boundary_snaps_to_tick_grid(sim_time, expected):
+    timer = make_timer(FULL_DAY)
+    assert timer._next_boundary(timer.agents[0], sim_time) == expected
+
+
+def test_next_boundary_wraps_past_end_of_day():
+    timer = make_timer(FULL_DAY, SHORT_DAY)
+    full, short = timer.agents
+    day = DAY_MINUTES
+    # 最后一个活动持续到一天结束：唤醒在第二天 0 点
+    assert timer._next_boundary(full, day + 1435) == 2 * day
+    assert timer._next_boundary(full, 1300) == day
+    # 超出日程范围视为持续到一天结束
+    assert timer._next_boundary(short, 700) == day
+    assert timer._next_boundary(short, day + 700) == 2 * day
+
+
+def test_due_agents_wake_at_boundary_or_next_tick():
+    timer = make_timer(FULL_DAY, FULL_DAY, FULL_DAY)
+    idle, chatting, reacting = timer.agents
+    chatting.isChatting = True
+    reacting.should_react = True
+    timer._schedule_after_run({a.name for a in timer.agents}, [], 480)
+    assert timer.wake_queue.pop_due(485) == [chatting.name, reacting.name]
+    assert timer.wake_queue.pop_due(1010) == [idle.name]
+
+
+def test_new_event_wakes_other_agents_at_next_tick():
+    timer = make_timer(FULL_DAY, FULL_DAY, FULL_DAY)
+    speaker, listener, busy = timer.agents
+    busy.today_is_chatted = True
+    # listener 之前预约在活动结束时，新事件把它提前到下一跳
+    timer.wake_queue.schedule(listener.name, 1010)
+    timer._schedule_after_run({speaker.name}, [event(speaker.name, "Agent 0 is shouting")], 480)
+    assert timer.wake_queue.pop_due(485) == [listener.name]
+    assert timer.wake_queue.pop_due(1010) == [speaker.name]
+    assert timer.wake_queue.next_time() is None
+
+
+def test_passive_event_does_not_wake_others():
+    timer = make_timer(FULL_DAY, FULL_DAY)
+    sleeper, other = timer.agents
+    events = [event(sleeper.name, "sleeping", obj="bed"), event(sleeper.name, "Agent 0 is in bed", obj="sleep")]
+    timer._schedule_after_run({sleeper.name}, events, 480)
+    assert timer.wake_queue.pop_due(DAY_MINUTES) == [sleeper.name]
+
+
+def test_repeated_event_does_not_wake_others():
+    timer = make_timer(FULL_DAY, FULL_DAY)
+    worker, other = timer.agents
+    timer.last_events[worker.name] = [event(worker.name, "Agent 0 is working")]
+    timer._schedule_after_run({worker.name}, [event(worker.name, "Agent 0 is working")], 480)
+    assert timer.wake_queue.pop_due(DAY_MINUTES) == [worker.name]
+    timer._schedule_after_run({worker.name}, [event(worker.name, "Agent 0 is resting")], 1010)
+    assert timer.wake_queue.pop_due(1015) == [other.name]
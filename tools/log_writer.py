@@ -0,0 +1,206 @@
+# tools/log_writer.py
+import atexit
+import contextvars
+import gzip
+import hashlib
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from typing import Awaitable, Dict, Optional
+
+from backend_server.context_window import estimate_tokens
+from tools.profiler import profiler
+
+with open("./config/config.json", "r", encoding="utf-8") as f:
+    config = json.load(f)
+LOG_CONFIG = config.get("LOG_CONFIG", {})
+PROMPT_LOG_PATH = LOG_CONFIG.get("PROMPT_LOG_PATH", "./log/prompt_log.jsonl")
+SCHEDULE_LOG_PATH = LOG_CONFIG.get("SCHEDULE_LOG_PATH", "./log/schedule_log.jsonl")
+MAX_BYTES = LOG_CONFIG.get("MAX_BYTES", 10 * 1024 * 1024)
+BACKUP_COUNT = LOG_CONFIG.get("BACKUP_COUNT", 5)
+COMPRESS = LOG_CONFIG.get("COMPRESS", True)
+# 生产环境只记录提示词与回复的哈希和长度，不落盘原文
+HASH_ONLY = LOG_CONFIG.get("HASH_ONLY", False)
+QUEUE_SIZE = LOG_CONFIG.get("QUEUE_SIZE", 10000)
+
+# 当前模拟时间（分钟），GlobalTimer 每个 tick 设置一次，随 asyncio 任务的上下文传递给各调用点
+current_tick: contextvars.ContextVar = contextvars.ContextVar("current_tick", default=None)
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+class LogWriter:
+    """
+    后台线程写入的 JSONL 日志：
+    - write / log_prompt 只把记录放入队列，事件循环中不做磁盘 I/O
+    - 文件句柄常驻，后台线程一次取空队列后批量写入
+    - 文件超过 max_bytes 时轮转为 .1、.2 ...，可选 gzip 压缩
+    - hash_only 时提示词与回复只记录哈希与长度
+    队列已满时丢弃新记录并计数，日志不会阻塞模拟。
+    """
+    def __init__(self, path: str, max_bytes: int = MAX_BYTES, backup_count: int = BACKUP_COUNT,
+                 compress: bool = COMPRESS, hash_only: bool = HASH_ONLY, queue_size: int = QUEUE_SIZE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.compress = compress
+        self.hash_only = hash_only
+
+        self._queue: "queue.Queue[Optional[dict]]" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._file = None
+
+        # 统计计数
+        self._written = 0
+        self._dropped = 0
+        self._rotations = 0
+        self._errors = 0
+
+    # ---------------- 对外接口 ----------------
+    def write(self, record: dict) -> None:
+        """提交一条记录，自动补上时间戳与当前 tick"""
+        record.setdefault("ts", round(time.time(), 3))
+        record.setdefault("tick", current_tick.get())
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._dropped += 1
+
+    def log_prompt(self, site: str, prompt: str, response: str, agent: Optional[str] = None,
+                   latency: Optional[float] = None, **fields) -> None:
+        """记录一次 LLM 调用；哈希与 token 数在后台线程中计算"""
+        self.write({"site": site, "agent": agent,
+                    "latency": round(latency, 4) if latency is not None else None,
+                    "prompt": prompt, "response": response, **fields})
+
+    async def call(self, site: str, prompt: str, awaitable: Awaitable[str], agent: Optional[str] = None) -> str:
+        """等待一次 LLM 调用，以调用点为阶段计入 profiler 并记录其耗时，返回原始结果"""
+        async with profiler.span(site, agent):
+            start = time.perf_counter()
+            response = await awaitable
+        self.log_prompt(site, prompt, response, agent=agent, latency=time.perf_counter() - start)
+        return response
+
+    def flush(self) -> None:
+        """阻塞直到队列中已有的记录全部写入磁盘，只在事件循环之外或退出前使用"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        """写完队列中剩余的记录后关闭文件，磁盘卡住时最多等待约 2 * timeout 秒"""
+        if self._thread is not None:
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "written": self._written,
+            "dropped": self._dropped,
+            "rotations": self._rotations,
+            "write_errors": self._errors,
+            "queue_depth": self._queue.qsize(),
+        }
+
+    # ---------------- 后台线程 ----------------
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                    self._thread.start()
+                    # 进程退出前写完队列中剩余的记录
+                    atexit.register(self.close)
+
+    def _run(self) -> None:
+        while True:
+            items = [self._queue.get()]
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in items
+            records = [item for item in items if item is not None]
+            written = self._written
+            try:
+                self._write_lines(records)
+            except (OSError, ValueError, TypeError):
+                # 写入失败的记录计数后丢弃，线程继续处理后续批次，close/flush 不会因此挂起
+                self._errors += len(records) - (self._written - written)
+                self._reset_file()
+            finally:
+                for _ in items:
+                    self._queue.task_done()
+            if stop:
+                self._reset_file()
+                return
+
+    def _reset_file(self) -> None:
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+    def _serialize(self, record: dict) -> bytes:
+        prompt = record.get("prompt")
+        if isinstance(prompt, str):
+            record["prompt_hash"] = text_hash(prompt)
+            record["prompt_tokens"] = estimate_tokens(prompt)
+            if self.hash_only:
+                del record["prompt"]
+                response = record.pop("response", None)
+                if isinstance(response, str):
+                    record["response_hash"] = text_hash(response)
+                    record["response_chars"] = len(response)
+        return (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+
+    def _write_lines(self, records) -> None:
+        for record in records:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self._file = open(self.path, "ab")
+            self._file.write(self._serialize(record))
+            self._written += 1
+            if self.max_bytes and self._file.tell() >= self.max_bytes:
+                self._rotate()
+        if self._file is not None:
+            self._file.flush()
+
+    def _rotate(self) -> None:
+        self._file.close()
+        self._file = None
+        if self.backup_count <= 0:
+            os.remove(self.path)
+            self._rotations += 1
+            return
+        suffix = ".gz" if self.compress else ""
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}{suffix}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}{suffix}")
+        target = f"{self.path}.1{suffix}"
+        if self.compress:
+            with open(self.path, "rb") as source, gzip.open(target, "wb") as destination:
+                shutil.copyfileobj(source, destination)
+            os.remove(self.path)
+        else:
+            os.replace(self.path, target)
+        self._rotations += 1
+
+
+# 进程级共享实例：LLM 提示词与回复、日程变化
+prompt_log = LogWriter(PROMPT_LOG_PATH)
+schedule_log = LogWriter(SCHEDULE_LOG_PATH)
@@ -0,0 +1,259 @@
+# tools/profiler.py
+import bisect
+import contextvars
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+with open("./config/config.json", "r", encoding="utf-8") as f:
+    config = json.load(f)
+PROFILER_CONFIG = config.get("PROFILER_CONFIG", {})
+PROFILER_ENABLED = PROFILER_CONFIG.get("ENABLED", True)
+MAX_EVENTS = PROFILER_CONFIG.get("MAX_EVENTS", 100000)
+# 直方图桶上界（秒），与 Prometheus 的 le 标签一致
+BUCKETS = tuple(PROFILER_CONFIG.get("BUCKETS", [0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]))
+METRICS_PORT = PROFILER_CONFIG.get("METRICS_PORT")
+
+# 当前 span 所属的 Agent，嵌套的 span 未指定 agent 时沿用
+current_agent: contextvars.ContextVar = contextvars.ContextVar("current_agent", default=None)
+
+
+class Histogram:
+    """固定桶的耗时直方图"""
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> float:
+        """按桶估算分位数，返回所在桶的上界"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+
+class Span:
+    """同时支持 with 与 async with；退出时把耗时记入 Profiler"""
+    __slots__ = ("profiler", "stage", "agent", "start", "duration", "_token")
+
+    def __init__(self, profiler: "Profiler", stage: str, agent: Optional[str]):
+        self.profiler = profiler
+        self.stage = stage
+        self.agent = agent
+        self.start = 0.0
+        self.duration = 0.0
+        self._token = None
+
+    def __enter__(self) -> "Span":
+        if self.agent is None:
+            self.agent = current_agent.get()
+        else:
+            self._token = current_agent.set(self.agent)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.duration = time.perf_counter() - self.start
+        if self._token is not None:
+            current_agent.reset(self._token)
+        self.profiler.record(self.stage, self.agent, self.start, self.duration)
+
+    async def __aenter__(self) -> "Span":
+        return self.__enter__()
+
+    async def __aexit__(self, *exc) -> None:
+        self.__exit__(*exc)
+
+
+class _NullSpan:
+    """关闭时使用的空 span，不计时也不分配对象"""
+    start = 0.0
+    duration = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Profiler:
+    """
+    轻量的分阶段耗时统计：
+    - span(stage, agent) 包住一段同步或异步代码，按 (stage, agent) 聚合到直方图
+    - 最近 max_events 个 span 保留原始时间线，可导出为 Chrome trace（chrome://tracing、Perfetto）
+    - prometheus_text() 输出 Prometheus 文本格式，serve() 在后台线程提供 /metrics
+    """
+    def __init__(self, enabled: bool = PROFILER_ENABLED, max_events: int = MAX_EVENTS,
+                 buckets: Tuple[float, ...] = BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self._events = deque(maxlen=max_events)
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+        # span 可能在嵌入模型的线程池中结束
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._server = None
+
+    def span(self, stage: str, agent: Optional[str] = None):
+        return Span(self, stage, agent) if self.enabled else _NULL_SPAN
+
+    def record(self, stage: str, agent: Optional[str], start: float, duration: float) -> None:
+        key = (stage, agent or "")
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(duration)
+            self._events.append((stage, agent or "", start, duration))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._events.clear()
+            self._histograms = {}
+            self._origin = time.perf_counter()
+
+    def snapshot(self) -> dict:
+        """可 pickle 的直方图与时间线，供协调进程合并分片 worker 的统计"""
+        with self._lock:
+            return {
+                "histograms": [(stage, agent, h.counts, h.count, h.sum, h.max)
+                               for (stage, agent), h in self._histograms.items()],
+                "events": list(self._events),
+            }
+
+    def merge(self, snapshot: dict) -> None:
+        """并入其他进程的 snapshot()；perf_counter 为系统单调时钟，同一台机器上的时间线可直接对齐"""
+        with self._lock:
+            for stage, agent, counts, count, total, maximum in snapshot["histograms"]:
+                histogram = self._histograms.get((stage, agent))
+                if histogram is None:
+                    histogram = self._histograms[(stage, agent)] = Histogram(self.buckets)
+                histogram.counts = [a + b for a, b in zip(histogram.counts, counts)]
+                histogram.count += count
+                histogram.sum += total
+                histogram.max = max(histogram.max, maximum)
+            self._events.extend(snapshot["events"])
+
+    # ---------------- 汇总 ----------------
+    def summary(self, by_agent: bool = False) -> List[dict]:
+        """按阶段（可选再按 Agent）汇总，按总耗时降序"""
+        merged: Dict[Tuple[str, str], List[Histogram]] = {}
+        with self._lock:
+            for (stage, agent), histogram in self._histograms.items():
+                merged.setdefault((stage, agent if by_agent else ""), []).append(histogram)
+        rows = []
+        for (stage, agent), histograms in merged.items():
+            combined = Histogram(self.buckets)
+            for histogram in histograms:
+                combined.counts = [a + b for a, b in zip(combined.counts, histogram.counts)]
+                combined.count += histogram.count
+                combined.sum += histogram.sum
+                combined.max = max(combined.max, histogram.max)
+            rows.append({
+                "stage": stage, "agent": agent, "count": combined.count,
+                "total": combined.sum, "mean": combined.sum / combined.count,
+                "p95": combined.quantile(0.95), "max": combined.max,
+            })
+        return sorted(rows, key=lambda row: row["total"], reverse=True)
+
+    def format_summary(self, by_agent: bool = False) -> str:
+        lines = [f"{'stage':<32} {'agent':<14} {'count':>7} {'total s':>9} {'mean ms':>9} {'p95 ms':>9} {'max ms':>9}"]
+        for row in self.summary(by_agent):
+            lines.append(f"{row['stage']:<32} {row['agent']:<14} {row['count']:>7} {row['total']:>9.3f} "
+                         f"{row['mean'] * 1e3:>9.2f} {row['p95'] * 1e3:>9.2f} {row['max'] * 1e3:>9.2f}")
+        return "\n".join(lines)
+
+    # ---------------- 导出 ----------------
+    def chrome_trace(self) -> dict:
+        """Chrome trace event 格式：每个 Agent 一条线程轨道，全局阶段在 main 轨道"""
+        with self._lock:
+            events = list(self._events)
+        tids = {"": 0}
+        trace = []
+        for stage, agent, start, duration in events:
+            if agent not in tids:
+                tids[agent] = len(tids)
+            trace.append({
+                "name": stage, "cat": stage.split(".")[0], "ph": "X", "pid": 1, "tid": tids[agent],
+                "ts": (start - self._origin) * 1e6, "dur": duration * 1e6,
+            })
+        for agent, tid in tids.items():
+            trace.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid,
+                          "args": {"name": agent or "main"}})
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f)
+
+    def prometheus_text(self) -> str:
+        lines = [
+            "# HELP agent_stage_seconds Wall time spent in each cognitive stage.",
+            "# TYPE agent_stage_seconds histogram",
+        ]
+        with self._lock:
+            items = sorted(self._histograms.items())
+            for (stage, agent), histogram in items:
+                labels = f'stage="{stage}",agent="{agent}"'
+                cumulative = 0
+                for bound, count in zip(self.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'agent_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'agent_stage_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f"agent_stage_seconds_sum{{{labels}}} {histogram.sum:.6f}")
+                lines.append(f"agent_stage_seconds_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int = METRICS_PORT, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """在后台线程提供 GET /metrics"""
+        profiler = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = profiler.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True).start()
+        return self._server
+
+
+# 进程级共享实例
+profiler = Profiler()